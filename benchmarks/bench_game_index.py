@@ -0,0 +1,78 @@
+# Micro-benchmark of the executable lookup performed for each bucket event
+# Compares the linear scan over the game list with the GameIndex used during ingest,
+# reporting the throughput (events/sec) for growing catalog sizes and for growing numbers of glob aliases
+#
+# Usage: python benchmarks/bench_game_index.py [EVENTS]
+import random
+import sys
+import time
+
+from gtrack.bucket_manager import GameIndex
+
+CATALOG_SIZES = (10, 100, 500, 1000, 2000, 5000)
+ALIAS_COUNTS = (0, 10, 100, 1000, 5000)
+DISTINCT_APPS = 300
+
+
+# Lookup as performed before the introduction of the index
+def linear_lookup(event_name, game_list):
+    event_name = event_name.strip().lower()
+    if event_name == "":
+        return 0
+
+    for game in game_list:
+        if event_name == game[1]:
+            return game[0]
+
+    return 0
+
+
+# Events reference both tracked games and unrelated applications
+def generate_events(games, num_events):
+    rnd = random.Random(42)
+    apps = [game[1].upper() for game in rnd.sample(games, min(len(games), DISTINCT_APPS // 2))]
+    apps += ["app-" + str(i) + ".exe" for i in range(DISTINCT_APPS - len(apps))]
+    return [rnd.choice(apps) for _ in range(num_events)]
+
+
+def measure(lookup, events):
+    start = time.perf_counter()
+    for app in events:
+        lookup(app)
+
+    return len(events) / (time.perf_counter() - start)
+
+
+def main():
+    num_events = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print("{:>8} {:>16} {:>16} {:>8}".format("games", "linear (ev/s)", "index (ev/s)", "speedup"))
+    for size in CATALOG_SIZES:
+        games = [(i + 1, "game-" + str(i) + ".exe") for i in range(size)]
+        events = generate_events(games, num_events)
+
+        linear_rate = measure(lambda app: linear_lookup(app, games), events)
+        index = GameIndex(games)
+        index_rate = measure(index.lookup, events)
+
+        print("{:>8} {:>16,.0f} {:>16,.0f} {:>7.1f}x".format(size, linear_rate, index_rate, index_rate / linear_rate))
+
+    # Aliases are compiled in a single pattern, evaluated only once for each distinct application
+    games = [(i + 1, "game-" + str(i) + ".exe") for i in range(1000)]
+    events = generate_events(games, num_events)
+
+    print("")
+    print("{:>8} {:>16} {:>16}".format("aliases", "build (ms)", "index (ev/s)"))
+    for count in ALIAS_COUNTS:
+        aliases = [(i % len(games) + 1, "glob", "game-" + str(i) + "_v*.exe") for i in range(count)]
+
+        start = time.perf_counter()
+        index = GameIndex(games, aliases)
+        build_time = time.perf_counter() - start
+        index_rate = measure(index.lookup, events)
+
+        print("{:>8} {:>16,.1f} {:>16,.0f}".format(count, build_time * 1000, index_rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Benchmark of the ingest of synthetic ActivityWatch exports, from 10k to 10M events
+# For every size, exports are produced by generate_buckets.py and ingested into a fresh database through:
+#   - json: read_bucket_data_json on the export, with the games already stored
+#   - scan: the whole scan_data path, reading the game list and then the bucket folder
+# Each run happens in its own process, so that the peak RSS reported belongs to that run only.
+# Results can be saved and compared with the ones of a previous execution, to catch regressions
+#
+# Usage: python benchmarks/bench_ingest.py [--sizes N [N ...]] [--modes MODE [MODE ...]] [--save FILE] [--compare FILE]
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_buckets import generate
+
+DEFAULT_SIZES = (10000, 100000, 1000000, 10000000)
+MODES = ("json", "scan")
+BUCKET_OPTIONS = {"save_thres": 3 * 60, "diff_thres": 30 * 60, "timezone": None}
+REGRESSION_THRESHOLD = 0.10                     # Throughput loss reported as a regression
+
+
+# Peak resident set size of the current process (in MiB)
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Body of the process performing a single run, printing its results as json
+def run_child(mode, folder, db_path):
+    from gtrack.schema_manager import migrate_schema
+    from gtrack.insert_manager import load_game_index, open_data_file, read_bucket_data_json, scan_data
+
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    migrate_schema(connection, cursor)
+
+    games_folder = os.path.join(folder, "games") + os.sep
+    buckets_folder = os.path.join(folder, "buckets") + os.sep
+
+    # The output of the ingest is not relevant for the benchmark
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        if mode == "json":
+            open_data_file(games_folder + "games.csv", 0, False, None, None, connection, cursor)
+            games = load_game_index(cursor)
+
+            start = time.perf_counter()
+            for file_name in sorted(os.listdir(buckets_folder)):
+                with open(buckets_folder + file_name) as input_file:
+                    read_bucket_data_json(input_file, games, BUCKET_OPTIONS, connection, cursor)
+            connection.commit()
+            elapsed = time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            scan_data((games_folder, buckets_folder), BUCKET_OPTIONS, connection, cursor)
+            elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    connection.close()
+    print(json.dumps({"elapsed": elapsed, "rss": peak_rss()}))
+
+
+# Run the benchmark of a mode in a separate process
+def measure(mode, folder, db_path):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, folder, db_path],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest of synthetic ActivityWatch exports")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of events to ingest")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="Ingest paths to measure")
+    parser.add_argument("--games", type=int, default=100, help="Number of games inside the catalog")
+    parser.add_argument("--buckets", type=int, default=1, help="Number of buckets of each host")
+    parser.add_argument("--hosts", type=int, default=1, help="Number of hosts")
+    parser.add_argument("--noise", type=float, default=0.5, help="Ratio of events related to applications which are not games")
+    parser.add_argument("--save", metavar="FILE", help="Save the results as json")
+    parser.add_argument("--compare", metavar="FILE", help="Compare the results with the ones saved by a previous execution")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "FOLDER", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as input_file:
+            previous = json.load(input_file)
+
+    results = {}
+    regressions = 0
+    print("{:>6} {:>10} {:>10} {:>14} {:>12} {:>10}".format("mode", "events", "time (s)", "events/s", "peak RSS", "vs saved"))
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            generate(work_dir, size, args.games, args.buckets, args.hosts, args.noise)
+
+            for mode in args.modes:
+                result = measure(mode, work_dir, os.path.join(work_dir, "data.db"))
+                rate = size / result["elapsed"]
+                key = mode + ":" + str(size)
+                results[key] = {"rate": rate, "rss": result["rss"]}
+
+                change = ""
+                if key in previous:
+                    ratio = rate / previous[key]["rate"] - 1
+                    change = "{:+.1%}".format(ratio)
+                    if ratio < -REGRESSION_THRESHOLD:
+                        change += " !"
+                        regressions += 1
+
+                print("{:>6} {:>10,} {:>10.2f} {:>14,.0f} {:>8.1f} MiB {:>10}".format(mode, size, result["elapsed"], rate, result["rss"], change))
+
+    if args.save:
+        with open(args.save, "w") as output_file:
+            json.dump(results, output_file, indent=4)
+
+    if regressions > 0:
+        print(str(regressions) + " measurements are more than " + "{:.0%}".format(REGRESSION_THRESHOLD) + " slower than the saved ones.")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Benchmark of a bucket scan under different SQLite storage profiles
+# A folder of synthetic bucket files is scanned into a fresh database, once with the SQLite defaults
+# (rollback journal, full synchronization) and once with the storage profile used by gtrack,
+# reporting the time taken and the throughput (events/sec) of each run
+#
+# Usage: python benchmarks/bench_storage.py [EVENTS] [FILES]
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timedelta, timezone
+from gtrack import utils
+from gtrack.gtrack import configure_storage
+from gtrack.schema_manager import migrate_schema
+from gtrack.insert_manager import insert_from_file
+
+NUM_GAMES = 50
+BUCKET_OPTIONS = {"save_thres": utils.SAVE_ACT_THRESHOLD, "diff_thres": utils.DIFF_ACT_THRESHOLD, "timezone": None}
+
+PROFILES = {
+    "sqlite defaults": {"journal_mode": "DELETE", "synchronous": "FULL", "cache_size": -2000, "mmap_size": 0, "temp_store": "DEFAULT"},
+    "gtrack profile": {"journal_mode": utils.DB_JOURNAL_MODE, "synchronous": utils.DB_SYNCHRONOUS, "cache_size": utils.DB_CACHE_SIZE,
+                       "mmap_size": utils.DB_MMAP_SIZE, "temp_store": utils.DB_TEMP_STORE},
+}
+
+
+# Bucket files of a single host covering consecutive periods, with the events of the games mixed with unrelated applications
+def generate_buckets(folder, num_events, num_files):
+    rnd = random.Random(42)
+    apps = ["game-" + str(i) + ".exe" for i in range(NUM_GAMES)] + ["app-" + str(i) + ".exe" for i in range(NUM_GAMES)]
+    timestamp = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    for i in range(num_files):
+        events = []
+        for _ in range(num_events // num_files):
+            duration = rnd.choice((5.0, 30.0, 240.0, 900.0))
+            events.append({"timestamp": timestamp.isoformat(), "duration": duration, "data": {"app": rnd.choice(apps), "title": "window"}})
+            timestamp += timedelta(seconds=duration + rnd.choice((1, 60, 2400)), microseconds=rnd.randrange(1000000))
+
+        # Exports list the newest events first
+        events.reverse()
+        with open(os.path.join(folder, "bucket-" + str(i) + ".json"), "w") as output_file:
+            json.dump({"buckets": {"aw-watcher-window_bench": {"events": events}}}, output_file)
+
+
+# Scan the folder into a new database configured with the given profile
+def measure(folder, profile, db_path):
+    connection = sqlite3.connect(db_path)
+    cursor = connection.cursor()
+    configure_storage(profile, cursor)
+    migrate_schema(connection, cursor)
+
+    cursor.executemany("INSERT INTO Game (display_name, executable_name) VALUES (?, ?)",
+                       [("Game " + str(i), "game-" + str(i) + ".exe") for i in range(NUM_GAMES)])
+    connection.commit()
+
+    pargs = {"insert_filepath": folder, "insert_choice": "bucket", "manifest_flag": True, "jobs": 1}
+    start = time.perf_counter()
+    insert_from_file(pargs, BUCKET_OPTIONS, connection, cursor)
+    elapsed = time.perf_counter() - start
+
+    connection.close()
+    return elapsed
+
+
+def main():
+    num_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    num_files = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        folder = os.path.join(work_dir, "buckets") + os.sep
+        os.mkdir(folder)
+        generate_buckets(folder, num_events, num_files)
+
+        results = []
+        for name in PROFILES:
+            # The output of the scan is not relevant for the benchmark
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, "w")
+            try:
+                elapsed = measure(folder, PROFILES[name], os.path.join(work_dir, name.replace(" ", "_") + ".db"))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+            results.append((name, elapsed))
+
+    print("{:>16} {:>10} {:>14}".format("profile", "time (s)", "events/s"))
+    for name, elapsed in results:
+        print("{:>16} {:>10.2f} {:>14,.0f}".format(name, elapsed, num_events / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Validation and micro-benchmark of the decoding of the event timestamps
+# The timestamps of the given bucket exports (or a synthetic corpus when none is given) are decoded both
+# with parse_event_timestamp and with the strptime-based decoding used before it: results have to be
+# identical, including the text stored inside the database, before the throughput of both is reported
+#
+# Usage: python benchmarks/bench_timestamps.py [BUCKET_FILE ...]
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from gtrack.bucket_manager import EVENT_DATETIME_FORMAT, EVENT_DATETIME_NOMICRO_FORMAT, iter_bucket_events, parse_event_timestamp
+
+SYNTHETIC_EVENTS = 200000
+
+
+# Decoding as performed before the introduction of the fast path
+def legacy_parse(timestamp):
+    try:
+        return datetime.strptime(timestamp, EVENT_DATETIME_FORMAT)
+    except ValueError:
+        return datetime.strptime(timestamp, EVENT_DATETIME_NOMICRO_FORMAT)
+
+
+def recorded_corpus(file_list):
+    corpus = []
+
+    for file_name in file_list:
+        with open(file_name) as input_file:
+            for bucket, event in iter_bucket_events(input_file):
+                corpus.append(event["timestamp"])
+
+    return corpus
+
+
+# Both shapes emitted by ActivityWatch, with a few different offsets and some unusual fractions
+def synthetic_corpus():
+    rnd = random.Random(42)
+    offsets = [timezone.utc, timezone(timedelta(hours=2)), timezone(-timedelta(hours=5, minutes=30))]
+    base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    corpus = []
+
+    for i in range(SYNTHETIC_EVENTS):
+        dt = (base + timedelta(seconds=rnd.randrange(10 ** 8), microseconds=rnd.randrange(10 ** 6))).astimezone(rnd.choice(offsets))
+        shape = rnd.random()
+
+        if shape < 0.7:
+            corpus.append(dt.isoformat())
+        elif shape < 0.95:
+            corpus.append(dt.replace(microsecond=0).isoformat())
+        else:
+            corpus.append(dt.isoformat(timespec="milliseconds"))
+
+    return corpus
+
+
+def measure(parse, corpus):
+    start = time.perf_counter()
+    for timestamp in corpus:
+        parse(timestamp)
+
+    return len(corpus) / (time.perf_counter() - start)
+
+
+def main():
+    corpus = recorded_corpus(sys.argv[1:]) if len(sys.argv) > 1 else synthetic_corpus()
+
+    mismatches = 0
+    for timestamp in corpus:
+        expected = legacy_parse(timestamp)
+        result = parse_event_timestamp(timestamp)
+
+        if result != expected or result.isoformat(" ") != expected.isoformat(" "):
+            mismatches += 1
+            if mismatches <= 10:
+                print("MISMATCH: " + timestamp + " -> " + repr(result) + " instead of " + repr(expected))
+
+    print("Timestamps validated: " + str(len(corpus)) + " (" + str(mismatches) + " mismatches)")
+
+    legacy_rate = measure(legacy_parse, corpus)
+    fast_rate = measure(parse_event_timestamp, corpus)
+    print("{:>10} {:>16,.0f} ts/s".format("strptime", legacy_rate))
+    print("{:>10} {:>16,.0f} ts/s ({:.1f}x)".format("fast path", fast_rate, fast_rate / legacy_rate))
+
+    if mismatches > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
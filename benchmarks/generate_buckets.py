@@ -0,0 +1,145 @@
+# Deterministic generator of synthetic ActivityWatch exports, with the structure of the bucket template
+# Each host gets its own export file, holding its window-watcher buckets: the buckets of a host cover consecutive
+# periods (as happens when the watcher is reinstalled) and list the newest events first, as ActivityWatch does.
+# A .csv with the games referenced by the events is written too, so that the folder can be scanned right away.
+# The same parameters always produce the same files
+#
+# Usage: python benchmarks/generate_buckets.py OUTPUT_FOLDER [-e EVENTS] [-g GAMES] [-b BUCKETS] [--hosts HOSTS] [-n NOISE] [-s SEED]
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+END_DATE = datetime(2030, 1, 1, tzinfo=timezone.utc)
+NOISE_APPS = 200                                # Distinct applications which are not games
+GAME_SWITCH = 0.05                              # Probability of switching to another game
+
+# Duration of the events and gap between the end of an event and the start of the following one (in SECONDS)
+DURATIONS = ((5.0, 10.009, 30.0, 120.0, 240.0, 600.0, 1800.0), (40, 30, 15, 8, 4, 2, 1))
+GAPS = ((0, 1, 5, 60, 600, 2400, 20000), (70, 15, 8, 5, 1.5, 0.4, 0.1))
+
+
+def game_executable(game):
+    return "Game" + str(game) + ".exe"
+
+
+def bucket_name(host, bucket):
+    return "aw-watcher-window" + ("-#" + str(bucket) if bucket > 0 else "") + "_" + host
+
+
+def host_name(host):
+    return "host-" + str(host)
+
+
+# Events of a bucket ending right before the given time, from the newest to the oldest, as (timestamp, duration, app, title)
+# Generating them backwards allows writing them in the order of the exports without keeping them in memory
+def generate_events(rnd, end, num_events, num_games, noise):
+    timestamp = end
+    game = rnd.randrange(num_games)
+
+    for _ in range(num_events):
+        duration = rnd.choices(DURATIONS[0], DURATIONS[1])[0]
+        gap = rnd.choices(GAPS[0], GAPS[1])[0]
+        timestamp -= timedelta(seconds=duration + gap, microseconds=rnd.randrange(1000000))
+
+        # Games are played for a while, before switching to another one
+        if rnd.random() < noise:
+            app = "app-" + str(rnd.randrange(NOISE_APPS)) + ".exe"
+            title = "Window " + str(rnd.randrange(1000))
+        else:
+            if rnd.random() < GAME_SWITCH:
+                game = rnd.randrange(num_games)
+
+            app = game_executable(game)
+            title = "Game " + str(game)
+
+        yield timestamp, duration, app, title
+
+
+# Write the export of a host, streaming the events of its buckets
+# The last bucket holds the most recent period, each previous one ends a day before the following one starts
+def write_export(file_name, rnd, host, bucket_sizes, num_games, noise):
+    timestamp = END_DATE
+
+    with open(file_name, "w", encoding="UTF-8") as output_file:
+        output_file.write('{"buckets": {')
+
+        for bucket in reversed(range(len(bucket_sizes))):
+            if bucket < len(bucket_sizes) - 1:
+                output_file.write(", ")
+
+            output_file.write(json.dumps(bucket_name(host, bucket)) + ': {"events": [')
+            first = True
+            for event_dt, duration, app, title in generate_events(rnd, timestamp, bucket_sizes[bucket], num_games, noise):
+                event = {"duration": duration, "timestamp": event_dt.isoformat(), "data": {"app": app, "title": title}}
+                output_file.write(("" if first else ", ") + json.dumps(event))
+                timestamp = event_dt
+                first = False
+
+            output_file.write("]}")
+            timestamp -= timedelta(days=1)
+
+        output_file.write("}}")
+
+
+# Split the events between the buckets of every host, as evenly as possible
+def split_events(num_events, num_buckets, num_hosts):
+    sizes = []
+    total = num_buckets * num_hosts
+
+    for host in range(num_hosts):
+        host_sizes = []
+        for bucket in range(num_buckets):
+            i = host * num_buckets + bucket
+            host_sizes.append(num_events // total + (1 if i < num_events % total else 0))
+
+        sizes.append(host_sizes)
+
+    return sizes
+
+
+# Generate the exports and the game list inside the folder, returning the paths of the files written
+def generate(folder, num_events, num_games=100, num_buckets=1, num_hosts=1, noise=0.5, seed=42):
+    rnd = random.Random(seed)
+    buckets_folder = os.path.join(folder, "buckets")
+    games_folder = os.path.join(folder, "games")
+    os.makedirs(buckets_folder, exist_ok=True)
+    os.makedirs(games_folder, exist_ok=True)
+
+    # The trailing column is the value of a flag
+    games_file = os.path.join(games_folder, "games.csv")
+    with open(games_file, "w", encoding="UTF-8") as output_file:
+        output_file.write("display_name,executable_name,flag\n")
+        for game in range(num_games):
+            output_file.write("Game " + str(game) + "," + game_executable(game) + "," + ("y" if game % 2 else "n") + "\n")
+
+    export_files = []
+    sizes = split_events(num_events, num_buckets, num_hosts)
+    for host in range(num_hosts):
+        file_name = os.path.join(buckets_folder, "aw-buckets-export_" + host_name(host) + ".json")
+        write_export(file_name, rnd, host_name(host), sizes[host], num_games, noise)
+        export_files.append(file_name)
+
+    return games_file, export_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic ActivityWatch exports for benchmarking the ingest")
+    parser.add_argument("folder", help="Folder where the 'games' and 'buckets' folders are created")
+    parser.add_argument("-e", "--events", type=int, default=100000, help="Total number of events")
+    parser.add_argument("-g", "--games", type=int, default=100, help="Number of games inside the catalog")
+    parser.add_argument("-b", "--buckets", type=int, default=1, help="Number of window-watcher buckets of each host")
+    parser.add_argument("--hosts", type=int, default=1, help="Number of hosts, each one with its own export file")
+    parser.add_argument("-n", "--noise", type=float, default=0.5, help="Ratio of events related to applications which are not games")
+    parser.add_argument("-s", "--seed", type=int, default=42, help="Seed of the generator")
+    args = parser.parse_args()
+
+    games_file, export_files = generate(args.folder, args.events, args.games, args.buckets, args.hosts, args.noise, args.seed)
+    print("Games: " + games_file)
+    for file_name in export_files:
+        print("Export: " + file_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import re
+from tabulate import tabulate
+from gtrack.bucket_manager import compile_alias, normalize_executable
+from gtrack.insert_manager import invalidate_bucket_files, reset_datastore_marks
+
+# Interpretation layer for the ALIAS command
+def config_aliases(parsed_args, connection, cursor):
+    err = None
+
+    if parsed_args["alias_list"]:
+        list_aliases(connection, cursor)
+
+    elif parsed_args["alias_add"]:
+        gid, pattern = parsed_args["alias_add"]
+        if not gid.isdigit():
+            return "ERROR: the game ID must be a number!"
+
+        err = add_alias(int(gid), pattern, parsed_args["alias_kind"], connection, cursor)
+
+    elif parsed_args["alias_rm"] is not None:
+        remove_alias(parsed_args["alias_rm"], connection, cursor)
+
+    return err
+
+
+# Associate an additional executable name, glob or regex to a game
+# Exact names and globs are normalized like the executable names, while regexes are kept as provided
+def add_alias(gid, pattern, kind, connection, cursor):
+    err = None
+    pattern = pattern.strip() if kind == "regex" else normalize_executable(pattern)
+
+    if pattern == "":
+        return "ERROR: the alias cannot be empty!"
+
+    s_query = "SELECT COUNT(*) FROM Game WHERE id = ?"
+    cursor.execute(s_query, (gid, ))
+    if cursor.fetchone()[0] < 1:
+        return "ERROR: no game has been found with ID " + str(gid) + "!"
+
+    # The regex is compiled as done by the game index
+    if kind == "regex":
+        try:
+            compile_alias(kind, pattern)
+
+        except re.error as ree:
+            return "ERROR: the regex '" + pattern + "' is not valid due to: " + str(ree)
+
+    i_query = """ INSERT INTO GameAlias (game_id, kind, pattern)
+                  VALUES (?, ?, ?)
+                  ON CONFLICT(kind, pattern) DO NOTHING """
+
+    cursor.execute(i_query, (gid, kind, pattern))
+    if cursor.rowcount < 1:
+        err = "WARNING: alias '" + pattern + "' could not be added due to being already present"
+    else:
+        # Events of the datastore and of the bucket files already read could match the new alias
+        reset_datastore_marks(cursor)
+        invalidate_bucket_files(cursor)
+
+    connection.commit()
+    return err
+
+
+# List all aliases, together with the game they are associated to
+def list_aliases(connection, cursor):
+
+    s_query = """ SELECT GameAlias.id, Game.id, Game.display_name, GameAlias.kind, GameAlias.pattern
+                  FROM GameAlias, Game
+                  WHERE GameAlias.game_id = Game.id
+                  ORDER BY GameAlias.id """
+
+    cursor.execute(s_query)
+    rows = cursor.fetchall()
+    print(tabulate(rows, headers=["alias_id", "game_id", "name", "kind", "pattern"], tablefmt="fancy_outline"))
+    return
+
+
+# Remove the specified alias
+def remove_alias(alias_id, connection, cursor):
+
+    rm_query = """ DELETE FROM GameAlias
+                   WHERE id = ? """
+
+    cursor.execute(rm_query, (alias_id, ))
+    connection.commit()
+    return
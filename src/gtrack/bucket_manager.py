@@ -0,0 +1,632 @@
+import re
+from fnmatch import translate as glob_translate
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from json import JSONDecoder, JSONDecodeError
+from json import loads as json_loads
+from queue import Full, Queue
+from threading import Event, Thread
+from urllib.parse import quote, urlencode, urlsplit
+
+# Kinds of the aliases which can be associated to a game
+ALIAS_KINDS = ("exact", "glob", "regex")
+
+# Amount of characters read from the bucket file at each refill of the buffer
+READ_CHUNK_SIZE = 64 * 1024
+
+# Indexes of the values stored for each session
+SESSION_END = 0
+SESSION_DATETIME = 1
+SESSION_PLAYTIME = 2
+SESSION_EVENTS = 3
+SESSION_SEED = 4
+
+# Type of the buckets produced by the window watcher of ActivityWatch
+WINDOW_BUCKET_TYPE = "currentwindow"
+
+# Options of the requests performed to an ActivityWatch server
+SERVER_PAGE_LIMIT = 5000                        # Events requested for each page
+SERVER_PREFETCH_PAGES = 4                       # Pages fetched in advance while the previous ones are parsed
+SERVER_TIMEOUT = 30                             # Timeout of each request (in SECONDS)
+SERVER_MIN_WINDOW = timedelta(seconds=1)        # Windows are not split below this size
+SERVER_WINDOW_MARGIN = timedelta(hours=1)       # Margin added to the current time to close the last window
+
+# Largest offset from UTC of a timezone (in SECONDS)
+MAX_UTC_OFFSET = 14 * 3600
+
+# Formats of the timestamps of the events (sometimes the microseconds disappear)
+EVENT_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+EVENT_DATETIME_NOMICRO_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*")
+_DECODER = JSONDecoder()
+_TIMEZONES = {}
+
+
+# Incremental reader of a JSON document
+# Only the portion of the file not yet consumed is kept in memory, allowing to walk the
+# structure of the document without decoding it as a whole
+class JSONStreamReader:
+
+    def __init__(self, input_stream, chunk_size=READ_CHUNK_SIZE):
+        self.input_stream = input_stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    # Read a new chunk from the stream, discarding the already consumed characters
+    # Returns False when the end of the stream has been reached
+    def fill(self):
+        if self.eof:
+            return False
+
+        chunk = self.input_stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    # Returns the next meaningful character without consuming it ("" at the end of the stream)
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self.fill():
+                return ""
+
+    # Consume the next meaningful character, which has to be the expected one
+    def expect(self, char):
+        if self.peek() != char:
+            raise JSONDecodeError("Expecting '" + char + "' delimiter", self.buffer, self.pos)
+
+        self.pos += 1
+
+    # Decode the next complete value of the document
+    # A number followed only by characters that could continue it (e.g. '1.' before the '5' of the next chunk)
+    # could be truncated, so more data is requested before accepting it
+    def value(self):
+        self.peek()
+
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+
+            if self.eof or not isinstance(obj, (int, float)) or _NUMBER_TAIL.match(self.buffer, end).end() < len(self.buffer):
+                self.pos = end
+                return obj
+
+            self.fill()
+
+    # Iterate over the keys of the next object
+    # The caller has to consume the value associated to each key before asking for the next one
+    def object_keys(self):
+        if self.peek() != "{":
+            raise TypeError("expected a json object at position " + str(self.pos))
+
+        self.pos += 1
+        if self.peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise JSONDecodeError("Expecting property name enclosed in double quotes", self.buffer, self.pos)
+
+            self.expect(":")
+            yield key
+
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    # Iterate over the items of the next array, decoding them one at a time
+    def array_items(self):
+        if self.peek() != "[":
+            raise TypeError("expected a json array at position " + str(self.pos))
+
+        self.pos += 1
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+    # Verify that nothing but whitespaces follows the parsed document
+    def end(self):
+        if self.peek() != "":
+            raise JSONDecodeError("Extra data", self.buffer, self.pos)
+
+
+# Decode the timestamp of an event
+# The two shapes emitted by ActivityWatch, 'YYYY-MM-DDTHH:MM:SS.ffffff+HH:MM' and 'YYYY-MM-DDTHH:MM:SS+HH:MM',
+# are decoded by position. Any other shape is left to strptime, choosing the format beforehand
+def parse_event_timestamp(timestamp):
+    length = len(timestamp)
+
+    if length == 32 and timestamp[4:20:3] == "--T::." and timestamp[29] == ":":
+        microsecond = int(timestamp[20:26])
+        offset = timestamp[26:]
+    elif length == 25 and timestamp[4:17:3] == "--T::" and timestamp[22] == ":":
+        microsecond = 0
+        offset = timestamp[19:]
+    elif "." in timestamp:
+        return datetime.strptime(timestamp, EVENT_DATETIME_FORMAT)
+    else:
+        return datetime.strptime(timestamp, EVENT_DATETIME_NOMICRO_FORMAT)
+
+    tz = _TIMEZONES.get(offset)
+    if tz is None:
+        tz = parse_timezone_offset(offset)
+
+    return datetime(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+                    int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19]), microsecond, tz)
+
+
+# Decode a '+HH:MM' offset, remembering the result since buckets use very few of them
+def parse_timezone_offset(offset):
+    if offset[0] not in "+-" or not offset[1:3].isdigit() or not offset[4:6].isdigit():
+        return datetime.strptime(offset, "%z").tzinfo
+
+    delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+    tz = timezone(-delta if offset[0] == "-" else delta)
+    _TIMEZONES[offset] = tz
+    return tz
+
+
+# Lookup table between the applications found inside the buckets and the stored games
+# Executable names are indexed once, normalized, so that each event costs a single dictionary access.
+# Aliases given as globs or regexes are compiled once, each one on its own so that the groups of a regex keep their
+# meaning, and they are tried in order only for the names missing from the dictionary.
+# The result for every application string is also remembered, since buckets repeat the same few names
+class GameIndex:
+
+    def __init__(self, games, aliases=()):
+        self.executables = {}
+        self.apps = {}
+        self.patterns = []        # (compiled pattern, game id), in the order the aliases were defined
+
+        # In case of duplicates, the first game retrieved keeps the executable name
+        for game in games:
+            self.executables.setdefault(normalize_executable(game[1]), game[0])
+
+        # Aliases are given as (game_id, kind, pattern): exact names never override the executable names
+        for game_id, kind, pattern in aliases:
+            if kind == "exact":
+                self.executables.setdefault(normalize_executable(pattern), game_id)
+            else:
+                self.patterns.append((compile_alias(kind, pattern), game_id))
+
+    def __len__(self):
+        return len(self.executables) + len(self.patterns)
+
+    # Returns 0 if the application is not related to any game, otherwise returns the game id
+    def lookup(self, app_name):
+        try:
+            return self.apps[app_name]
+        except KeyError:
+            name = normalize_executable(app_name)
+            game_id = self.executables.get(name, 0)
+
+            # The first alias defined wins
+            if game_id == 0 and name != "":
+                for pattern, pattern_game in self.patterns:
+                    if pattern.fullmatch(name) is not None:
+                        game_id = pattern_game
+                        break
+
+            self.apps[app_name] = game_id
+            return game_id
+
+
+# Compiled pattern of a glob or regex alias, matched against the normalized executable names
+# Raises re.error when the regex is not valid
+def compile_alias(kind, pattern):
+    expression = glob_translate(normalize_executable(pattern)) if kind == "glob" else pattern
+    return re.compile(expression, re.IGNORECASE)
+
+
+# Normalization applied to executable names before comparing them
+def normalize_executable(name):
+    return name.strip().lower()
+
+
+# Walk the 'buckets -> <id> -> events' structure of an ActivityWatch export
+# Yields a (bucket_id, event) pair for every event, without loading the whole file in memory
+def iter_bucket_events(input_stream):
+    reader = JSONStreamReader(input_stream)
+    has_buckets = False
+
+    for key in reader.object_keys():
+        if key != "buckets":
+            reader.value()
+            continue
+
+        has_buckets = True
+        for bucket_id in reader.object_keys():
+            has_events = False
+
+            for bucket_key in reader.object_keys():
+                if bucket_key != "events":
+                    reader.value()
+                    continue
+
+                has_events = True
+                for event in reader.array_items():
+                    yield bucket_id, event
+
+            if not has_events:
+                raise KeyError("events")
+
+    reader.end()
+    if not has_buckets:
+        raise KeyError("buckets")
+
+
+# Reader of the window-watcher events stored inside the SQLite datastore of an ActivityWatch server
+# Both the schema of aw-server (peewee) and the one of aw-server-rust are supported. For each bucket, only the
+# events starting from its lower bound (epoch seconds) are retrieved, through the index on the timestamps
+class DatastoreReader:
+
+    def __init__(self, connection, lower_bounds=None):
+        self.connection = connection
+        self.lower_bounds = lower_bounds if lower_bounds is not None else {}
+        self.bucket_marks = {}    # bucket_id -> start of the latest event read (epoch seconds)
+
+        cursor = connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = set(row[0] for row in cursor.fetchall())
+
+        if "bucketmodel" in tables and "eventmodel" in tables:
+            self.schema = "peewee"
+        elif "buckets" in tables and "events" in tables:
+            self.schema = "rust"
+        else:
+            raise KeyError("buckets")
+
+    # Iterate over the window-watcher buckets, as (bucket_row, bucket_id) pairs
+    def buckets(self):
+        if self.schema == "peewee":
+            b_query = "SELECT key, id FROM bucketmodel WHERE type = ? ORDER BY id"
+        else:
+            b_query = "SELECT id, name FROM buckets WHERE type = ? ORDER BY name"
+
+        cursor = self.connection.cursor()
+        cursor.execute(b_query, (WINDOW_BUCKET_TYPE, ))
+        return cursor.fetchall()
+
+    # Yields a (bucket_id, event) pair for every event, with the same structure used by the exports
+    def events(self):
+        for bucket_row, bucket_id in self.buckets():
+            lower_bound = self.lower_bounds.get(bucket_id)
+
+            if self.schema == "peewee":
+                rows = self.peewee_events(bucket_row, bucket_id, lower_bound)
+            else:
+                rows = self.rust_events(bucket_row, bucket_id, lower_bound)
+
+            for timestamp, duration, app in rows:
+                yield bucket_id, {"timestamp": timestamp, "duration": duration, "data": {"app": app}}
+
+    # Events of aw-server: timestamps are stored as UTC text, so the bound is a text comparison
+    def peewee_events(self, bucket_row, bucket_id, lower_bound):
+        e_query = """ SELECT timestamp, duration, IFNULL(json_extract(datastr, '$.app'), '')
+                      FROM eventmodel
+                      WHERE bucket_id = ? AND timestamp >= ?
+                      ORDER BY timestamp ASC """
+
+        # Truncated to the second, so that the latest event already read is retrieved again
+        bound = ""
+        if lower_bound is not None:
+            bound = datetime.fromtimestamp(int(lower_bound), timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+        cursor = self.connection.cursor()
+        cursor.execute(e_query, (bucket_row, bound))
+
+        timestamp = None
+        for timestamp, duration, app in cursor:
+            timestamp = timestamp[:10] + "T" + timestamp[11:]
+            yield timestamp, float(duration), app
+
+        if timestamp is not None:
+            self.bucket_marks[bucket_id] = parse_event_timestamp(timestamp).timestamp()
+
+    # Events of aw-server-rust: start and end are stored as nanoseconds since the epoch
+    def rust_events(self, bucket_row, bucket_id, lower_bound):
+        e_query = """ SELECT starttime, endtime, IFNULL(json_extract(data, '$.app'), '')
+                      FROM events
+                      WHERE bucketrow = ? AND starttime >= ?
+                      ORDER BY starttime ASC """
+
+        bound = 0 if lower_bound is None else int(lower_bound) * 10 ** 9
+        cursor = self.connection.cursor()
+        cursor.execute(e_query, (bucket_row, bound))
+
+        start = None
+        for start, end, app in cursor:
+            seconds, nanoseconds = divmod(start, 10 ** 9)
+            event_dt = datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=nanoseconds // 1000)
+            yield event_dt.isoformat(), (end - start) / 10 ** 9, app
+
+        if start is not None:
+            self.bucket_marks[bucket_id] = start / 10 ** 9
+
+# Reader of the window-watcher events exposed by an aw-server compatible REST API
+# Events are requested bucket by bucket through '/api/0/buckets/<id>/events', paginating by time window:
+# a window whose page reaches the limit is split in two halves, so empty periods cost a single request.
+# Pages are fetched by a separate thread over a single keep-alive connection, while the caller parses them
+class ServerReader:
+
+    def __init__(self, url, lower_bounds=None, page_limit=SERVER_PAGE_LIMIT, prefetch=SERVER_PREFETCH_PAGES):
+        parsed_url = urlsplit(url)
+        if parsed_url.scheme not in ("http", "https") or not parsed_url.netloc:
+            raise ValueError("invalid server url '" + url + "'")
+
+        self.connection_class = HTTPSConnection if parsed_url.scheme == "https" else HTTPConnection
+        self.host = parsed_url.netloc
+        self.base_path = parsed_url.path.rstrip("/")
+        self.lower_bounds = lower_bounds if lower_bounds is not None else {}
+        self.page_limit = page_limit
+        self.prefetch = prefetch
+        self.bucket_marks = {}    # bucket_id -> start of the latest event read (epoch seconds)
+        self.requests = 0
+        self.bytes_read = 0
+
+    # Perform a GET request, returning the decoded body of the response
+    def request(self, connection, path, params=None):
+        if params:
+            path += "?" + urlencode(params)
+
+        connection.request("GET", self.base_path + path, headers={"Accept": "application/json"})
+        response = connection.getresponse()
+        body = response.read()
+        self.requests += 1
+        self.bytes_read += len(body)
+
+        if response.status != 200:
+            raise HTTPException("request " + path + " failed with status " + str(response.status))
+
+        return json_loads(body)
+
+    # Identifiers of the window-watcher buckets exposed by the server
+    def buckets(self, connection):
+        data = self.request(connection, "/api/0/buckets/")
+        return sorted(bucket_id for bucket_id in data if data[bucket_id].get("type") == WINDOW_BUCKET_TYPE)
+
+    # Yields (bucket_id, events) pages, with the events of each bucket in chronological order
+    def pages(self, connection):
+        end = datetime.now(timezone.utc) + SERVER_WINDOW_MARGIN
+
+        for bucket_id in self.buckets(connection):
+            path = "/api/0/buckets/" + quote(bucket_id, safe="") + "/events"
+            lower_bound = self.lower_bounds.get(bucket_id)
+            start = datetime.fromtimestamp(int(lower_bound) if lower_bound is not None else 0, timezone.utc)
+
+            # Windows are kept as a stack, with the earliest one on top
+            windows = [(start, end)]
+            while windows:
+                w_start, w_end = windows.pop()
+                page = self.request(connection, path, {"start": w_start.isoformat(), "end": w_end.isoformat(), "limit": self.page_limit})
+
+                if len(page) >= self.page_limit and (w_end - w_start) > SERVER_MIN_WINDOW:
+                    middle = w_start + (w_end - w_start) / 2
+                    windows.append((middle, w_end))
+                    windows.append((w_start, middle))
+                    continue
+
+                # Events overlapping two windows are kept only by the one containing their start
+                events = []
+                for event in reversed(page):
+                    if w_start <= parse_event_timestamp(event["timestamp"]) < w_end:
+                        events.append(event)
+
+                if events:
+                    yield bucket_id, events
+
+    # Yields a (bucket_id, event) pair for every event, with the same structure used by the exports
+    def events(self):
+        pages = Queue(maxsize=self.prefetch)
+        stop = Event()
+        fetcher = Thread(target=self.fetch_pages, args=(pages, stop), daemon=True)
+        fetcher.start()
+
+        try:
+            while True:
+                item = pages.get()
+                if item is None:
+                    return
+
+                if isinstance(item, Exception):
+                    raise item
+
+                bucket_id, events = item
+                for event in events:
+                    yield bucket_id, event
+
+                self.bucket_marks[bucket_id] = parse_event_timestamp(events[-1]["timestamp"]).timestamp()
+
+        finally:
+            stop.set()
+            fetcher.join()
+
+    # Body of the fetching thread: pages are handed over through the queue, followed by None at the end.
+    # Errors are handed over too, to be raised by the consumer
+    def fetch_pages(self, pages, stop):
+        connection = self.connection_class(self.host, timeout=SERVER_TIMEOUT)
+
+        try:
+            for page in self.pages(connection):
+                if not self.hand_over(pages, stop, page):
+                    return
+
+            self.hand_over(pages, stop, None)
+
+        except (OSError, HTTPException, ValueError, KeyError, TypeError) as e:
+            self.hand_over(pages, stop, e)
+
+        finally:
+            connection.close()
+
+    # Put an item in the queue, giving up if the consumer stopped reading
+    def hand_over(self, pages, stop, item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+        return False
+
+
+# Groups events into gaming sessions as they are received
+# Events of the same game are part of the same session when the time between the end of an event and
+# the start of the following one does not exceed the threshold. Only the sessions are kept in memory,
+# so the arrival order of the events does not matter and the required memory does not depend on their number.
+# The last session stored for each game can be provided as a seed, to let the new events extend it
+class Sessionizer:
+
+    def __init__(self, diff_threshold, open_sessions=None):
+        self.threshold = diff_threshold.total_seconds() if isinstance(diff_threshold, timedelta) else float(diff_threshold)
+        self.events = 0
+        self.starts = {}      # game_id -> ordered list of session start timestamps
+        self.sessions = {}    # game_id -> list of sessions, in the same order of the starts
+
+        # Ingest bookkeeping, filled while the bucket is parsed
+        self.seen = 0         # Events read from the buckets, relevant or not
+        self.skipped = 0      # Events already ingested by a previous run
+        self.parse_time = 0.0
+        self.sessionize_time = 0.0
+        self.watermarks = {}  # (bucket_id, game_id) -> (start, duration) of the latest event added
+        self.earliest = {}    # (bucket_id, game_id) -> start of the earliest event added
+
+        if open_sessions:
+            for game_id in open_sessions:
+                session_dt, end, playtime, events = open_sessions[game_id]
+                self.starts[game_id] = [session_dt.timestamp()]
+                self.sessions[game_id] = [[end, session_dt, playtime, events, (session_dt, playtime, events)]]
+
+    # Add a relevant event to the sessions of its game
+    def add(self, game_id, event_dt, playtime):
+        start = event_dt.timestamp()
+        self.events += 1
+        self.add_session(game_id, event_dt, start, start + playtime, playtime, 1)
+
+    # Add a group of events, already joined into a session, to the sessions of its game
+    # A single event is a session of its own, so the events and the sessions are merged by the same rules
+    def add_session(self, game_id, session_dt, start, end, playtime, events):
+        threshold = self.threshold
+
+        starts = self.starts.get(game_id)
+        if starts is None:
+            self.starts[game_id] = [start]
+            self.sessions[game_id] = [[end, session_dt, playtime, events, None]]
+            return
+
+        sessions = self.sessions[game_id]
+        i = bisect_right(starts, start)
+        prev_merge = i > 0 and (start - sessions[i - 1][SESSION_END]) <= threshold
+        next_merge = i < len(starts) and (starts[i] - end) <= threshold
+
+        if prev_merge:
+            i -= 1
+            session = sessions[i]
+            session[SESSION_END] = max(session[SESSION_END], end)
+            session[SESSION_PLAYTIME] += playtime
+            session[SESSION_EVENTS] += events
+
+        elif next_merge:
+            # The new session anticipates the start of the following session
+            session = sessions[i]
+            starts[i] = start
+            session[SESSION_END] = max(session[SESSION_END], end)
+            session[SESSION_DATETIME] = session_dt
+            session[SESSION_PLAYTIME] += playtime
+            session[SESSION_EVENTS] += events
+
+        else:
+            starts.insert(i, start)
+            sessions.insert(i, [end, session_dt, playtime, events, None])
+            return
+
+        # The updated session could now reach the following ones
+        while i + 1 < len(starts) and (starts[i + 1] - sessions[i][SESSION_END]) <= threshold:
+            following = sessions.pop(i + 1)
+            starts.pop(i + 1)
+            session = sessions[i]
+            session[SESSION_END] = max(session[SESSION_END], following[SESSION_END])
+            session[SESSION_PLAYTIME] += following[SESSION_PLAYTIME]
+            session[SESSION_EVENTS] += following[SESSION_EVENTS]
+            if following[SESSION_SEED] is not None:
+                session[SESSION_SEED] = following[SESSION_SEED]
+
+    # Keep track of the latest event added for each bucket and game
+    def update_watermark(self, bucket_id, game_id, start, playtime):
+        key = (bucket_id, game_id)
+        watermark = self.watermarks.get(key)
+
+        if watermark is None or start > watermark[0] or (start == watermark[0] and playtime > watermark[1]):
+            self.watermarks[key] = (start, playtime)
+
+        earliest = self.earliest.get(key)
+        if earliest is None or start < earliest:
+            self.earliest[key] = start
+
+    # Add the sessions collected by another sessionizer, over a different part of the events
+    # The sessions of the two sides continuing into each other are joined, as if their events were added here
+    def merge(self, other):
+        for game_id in other.sessions:
+            for session in other.sessions[game_id]:
+                self.add_session(game_id, session[SESSION_DATETIME], session[SESSION_DATETIME].timestamp(), session[SESSION_END],
+                                 session[SESSION_PLAYTIME], session[SESSION_EVENTS])
+
+        for (bucket_id, game_id), (start, playtime) in other.watermarks.items():
+            self.update_watermark(bucket_id, game_id, start, playtime)
+        for key, start in other.earliest.items():
+            if key not in self.earliest or start < self.earliest[key]:
+                self.earliest[key] = start
+
+        self.events += other.events
+        self.seen += other.seen
+        self.skipped += other.skipped
+        self.parse_time += other.parse_time
+        self.sessionize_time += other.sessionize_time
+
+    # Iterate over the collected sessions, ordered by game and starting time
+    # Yields (game_id, start_datetime, playtime, number_of_events, seed) tuples, where the seed is the
+    # (start_datetime, playtime, number_of_events) of the stored session the current one extends, if any
+    def iter_sessions(self):
+        for game_id in sorted(self.sessions):
+            for session in self.sessions[game_id]:
+                yield game_id, session[SESSION_DATETIME], session[SESSION_PLAYTIME], session[SESSION_EVENTS], session[SESSION_SEED]
+
+    # Latest session of each game, as (start_datetime, end, playtime, number_of_events)
+    def last_sessions(self):
+        res = {}
+
+        for game_id in self.sessions:
+            session = self.sessions[game_id][-1]
+            res[game_id] = (session[SESSION_DATETIME], session[SESSION_END], session[SESSION_PLAYTIME], session[SESSION_EVENTS])
+
+        return res
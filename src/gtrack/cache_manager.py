@@ -0,0 +1,113 @@
+import hashlib
+import json
+import time
+from gtrack import utils
+
+# Cache of the rows returned by the print and plot queries
+# Results are identified by the text of the query, with its whitespace normalized, together with its arguments.
+# They are valid for a single generation of the data: every change to the games, their flags or their activities
+# increments the generation stored inside the Setting table, so the results of the previous ones are never read again
+
+
+# Signal that the stored data changed, discarding every cached result
+# Must be called inside the same transaction of the change
+def bump_generation(cursor):
+
+    u_query = """ UPDATE Setting
+                  SET value = CAST(value AS INTEGER) + 1
+                  WHERE name = 'data_generation' """
+
+    cursor.execute(u_query)
+
+
+# Rows returned by the query, read from the cache when a result of the current generation is stored
+# Otherwise PREPARE is called (when provided) before executing the query, and the rows are stored inside the cache.
+# The least recently used results are evicted once their total size exceeds CACHE_SIZE bytes, 0 disables the cache.
+# The time of use of a result is only tracked with a precision of DB_QUERY_CACHE_TOUCH seconds
+def fetch_rows(query, args, cache_size, connection, cursor, prepare=None):
+    return list(iter_rows(query, args, cache_size, connection, cursor, prepare))
+
+
+# Same as fetch_rows, with the rows read from the cursor in batches of BATCH_SIZE and returned as soon as they are read
+# Rows are serialized for the cache batch by batch, stopping once they cannot fit inside it anymore. Nothing is stored
+# when the rows are not all consumed
+def iter_rows(query, args, cache_size, connection, cursor, prepare=None, batch_size=utils.DB_FETCH_BATCH_SIZE):
+    key = None
+    generation = None
+
+    if cache_size > 0:
+        key = query_key(query, args)
+        cursor.execute("SELECT value FROM Setting WHERE name = 'data_generation'")
+        generation = int(cursor.fetchone()[0])
+
+        s_query = """ SELECT rows, last_used
+                      FROM QueryCache
+                      WHERE key = ? AND generation = ? """
+
+        cursor.execute(s_query, (key, generation))
+        row = cursor.fetchone()
+        if row is not None:
+            # Hits stay read-only: the time of use only matters for the eviction, so it is refreshed once it gets old
+            now = time.time()
+            if now - row[1] >= utils.DB_QUERY_CACHE_TOUCH:
+                cursor.execute("UPDATE QueryCache SET last_used = ? WHERE key = ?", (now, key))
+                connection.commit()
+
+            for r in json.loads(row[0]):
+                yield tuple(r)
+
+            return
+
+    if prepare is not None:
+        prepare()
+
+    cursor.execute(query, args)
+    parts = [] if cache_size > 0 else None
+    size = 2
+
+    batch = cursor.fetchmany(batch_size)
+    while batch:
+        if parts is not None:
+            parts.append(json.dumps(batch)[1:-1])
+            size += len(parts[-1]) + 1
+            if size > cache_size:
+                parts = None
+
+        yield from batch
+        batch = cursor.fetchmany(batch_size)
+
+    if cache_size > 0:
+        store_rows(key, generation, None if parts is None else "[" + ",".join(parts) + "]", cache_size, connection, cursor)
+
+
+# Store the rows of a query, serialized as a JSON array (DATA), evicting the results of the previous generations and the
+# least recently used ones. DATA is None when the rows are larger than the whole cache
+def store_rows(key, generation, data, cache_size, connection, cursor):
+
+    rm_old_query = """ DELETE FROM QueryCache
+                       WHERE generation <> ? """
+
+    i_query = """ INSERT INTO QueryCache (key, generation, rows, size, last_used)
+                  VALUES (?, ?, ?, ?, ?)
+                  ON CONFLICT(key) DO UPDATE SET generation = excluded.generation, rows = excluded.rows,
+                                                 size = excluded.size, last_used = excluded.last_used """
+
+    # Results are kept from the most recently used one, until their total size reaches the limit
+    rm_lru_query = """ DELETE FROM QueryCache
+                       WHERE key IN (SELECT key
+                                     FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total
+                                           FROM QueryCache)
+                                     WHERE total > ?) """
+
+    cursor.execute(rm_old_query, (generation, ))
+    if data is not None and len(data) <= cache_size:
+        cursor.execute(i_query, (key, generation, data, len(data), time.time()))
+        cursor.execute(rm_lru_query, (cache_size, ))
+
+    connection.commit()
+
+
+# Identifier of a query: the same query, whatever its formatting, with the same arguments produces the same key
+def query_key(query, args):
+    normalized = " ".join(query.split())
+    return hashlib.sha256(json.dumps([normalized, list(args)], default=str).encode()).hexdigest()
@@ -1,5 +1,7 @@
 import configparser
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from gtrack import utils
+from gtrack.bucket_manager import SERVER_PAGE_LIMIT
 
 # Read configuration file
 def read_config_file():
@@ -12,6 +14,7 @@ def read_config_file():
     bucket_options = {}
     bucket_options["save_thres"] = utils.SAVE_ACT_THRESHOLD
     bucket_options["diff_thres"] = utils.DIFF_ACT_THRESHOLD
+    bucket_options["timezone"] = None
 
     pot_options = {}
     pot_options["bar"] = utils.BAR_FONT_SIZE
@@ -19,6 +22,22 @@ def read_config_file():
     pot_options["xlabel"] = utils.TITLE_FONT_SIZE
     pot_options["ytitle"] = utils.LABEL_FONT_SIZE
     pot_options["ylabel"] = utils.TITLE_FONT_SIZE
+
+    storage_options = {}
+    storage_options["journal_mode"] = utils.DB_JOURNAL_MODE
+    storage_options["synchronous"] = utils.DB_SYNCHRONOUS
+    storage_options["cache_size"] = utils.DB_CACHE_SIZE
+    storage_options["mmap_size"] = utils.DB_MMAP_SIZE
+    storage_options["temp_store"] = utils.DB_TEMP_STORE
+    storage_options["ingest_log"] = utils.DB_INGEST_LOG
+    storage_options["cached_statements"] = utils.DB_CACHED_STATEMENTS
+    storage_options["query_cache_size"] = utils.DB_QUERY_CACHE_SIZE
+    storage_options["timezone"] = utils.DB_TIMEZONE
+
+    server_options = {}
+    server_options["url"] = None
+    server_options["page_limit"] = SERVER_PAGE_LIMIT
+
     mean_over_time_options = {}
     mean_over_time_options["xlabel"] = utils.TITLE_FONT_SIZE
     mean_over_time_options["ytitle"] = utils.LABEL_FONT_SIZE
@@ -36,12 +55,36 @@ def read_config_file():
             path_data_game = str(paths["path_data_game"]) if "path_data_game" in paths else None
             path_data_bucket = str(paths["path_data_bucket"]) if "path_data_bucket" in paths else None
 
+        if "database" in config:
+            doptions = config["database"]
+
+            storage_options["journal_mode"] = str(doptions["journal_mode"]).strip().upper() if "journal_mode" in doptions else utils.DB_JOURNAL_MODE
+            storage_options["synchronous"] = str(doptions["synchronous"]).strip().upper() if "synchronous" in doptions else utils.DB_SYNCHRONOUS
+            storage_options["cache_size"] = int(doptions["cache_size"]) if "cache_size" in doptions else utils.DB_CACHE_SIZE
+            storage_options["mmap_size"] = int(doptions["mmap_size"]) if "mmap_size" in doptions else utils.DB_MMAP_SIZE
+            storage_options["temp_store"] = str(doptions["temp_store"]).strip().upper() if "temp_store" in doptions else utils.DB_TEMP_STORE
+            storage_options["ingest_log"] = doptions.getboolean("ingest_log") if "ingest_log" in doptions else utils.DB_INGEST_LOG
+            storage_options["cached_statements"] = int(doptions["cached_statements"]) if "cached_statements" in doptions else utils.DB_CACHED_STATEMENTS
+            storage_options["query_cache_size"] = int(doptions["query_cache_size"]) if "query_cache_size" in doptions else utils.DB_QUERY_CACHE_SIZE
+            storage_options["timezone"] = str(doptions["timezone"]).strip() if "timezone" in doptions else utils.DB_TIMEZONE
+
+            # The activities are assigned to the local days of the timezone while being stored
+            bucket_options["timezone"] = read_timezone(storage_options["timezone"])
+            if bucket_options["timezone"] is None:
+                storage_options["timezone"] = utils.DB_TIMEZONE
+
         if "bucket_options" in config:
             boptions = config["bucket_options"]
 
             bucket_options["save_thres"] = int(boptions["save_threshold"]) if "save_threshold" in boptions else utils.SAVE_ACT_THRESHOLD
             bucket_options["diff_thres"]  = int(boptions["diff_threshold"]) if "diff_threshold" in boptions else utils.DIFF_ACT_THRESHOLD
 
+        if "activitywatch" in config:
+            aoptions = config["activitywatch"]
+
+            server_options["url"] = str(aoptions["server_url"]) if "server_url" in aoptions else None
+            server_options["page_limit"] = int(aoptions["page_limit"]) if "page_limit" in aoptions else SERVER_PAGE_LIMIT
+
         if "filters" in config:
             flags = config["filters"]
             flag_list = str(flags["flag_list"]) if "flag_list" in flags else None
@@ -64,15 +107,31 @@ def read_config_file():
 
         res["Paths"] = (path_db, path_data_game, path_data_bucket)
         res["Filters"] = (flag_list, )
+        res["Storage"] = storage_options
         res["BucketOptions"] = bucket_options
+        res["Server"] = server_options
         res["PoT"] = pot_options
         res["MHoT"] = mean_over_time_options
 
     except OSError:
         res["Paths"] = (path_db, None, None)
         res["Filters"] = (None, )
+        res["Storage"] = storage_options
         res["BucketOptions"] = bucket_options
+        res["Server"] = server_options
         res["PoT"] = pot_options
         res["MHoT"] = mean_over_time_options
 
-    return res
\ No newline at end of file
+    return res
+
+
+# Timezone identified by its IANA name (e.g. 'Europe/Rome'), None for the one of the system
+def read_timezone(timezone_name):
+    if timezone_name == "":
+        return None
+
+    try:
+        return ZoneInfo(timezone_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print("WARNING: timezone '" + timezone_name + "' is not supported! The one of the system will be used.")
+        return None
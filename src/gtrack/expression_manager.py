@@ -0,0 +1,230 @@
+import re
+
+# Compiler of the filter expressions over the flag IDs (e.g. "1 AND NOT (2 OR 3)")
+# Expressions are parsed into a tree of tuples:
+#   ("flag", ID)                    true for the games having the flag set
+#   ("not", NODE)                   on a flag, true for the games having the flag not set
+#   ("and", (NODE, NODE, ...))
+#   ("or", (NODE, NODE, ...))
+#   ("const", True | False)
+# Trees are then normalized, so that equivalent expressions share the same key, and evaluated over bitsets of game IDs.
+# As with the queries over the HasFlag table, a game with no value for a flag satisfies neither the flag nor its negation
+
+OPERATORS = ("NOT", "AND", "OR")
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+)|(\w+)|(\S))")
+
+
+# Split the expression into flag IDs, operators and parentheses
+def tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        number, word, symbol = match.groups()
+
+        if number is not None:
+            tokens.append(("flag", int(number), match.start(1)))
+        elif word is not None:
+            tokens.append((word.upper(), word, match.start(2)))
+        else:
+            tokens.append((symbol, symbol, match.start(3)))
+
+        position = match.end()
+
+    return tokens
+
+
+# Parser of the expression, following the precedence NOT > AND > OR
+# Only the operators received are accepted, the others are reported as errors
+class FilterParser:
+
+    def __init__(self, expression, operators=OPERATORS):
+        self.tokens = tokenize(expression)
+        self.operators = operators
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("empty expression")
+
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            self.fail("unexpected '" + str(self.tokens[self.position][1]) + "'")
+
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.accept("OR"):
+            nodes.append(self.parse_and())
+
+        return nodes[0] if len(nodes) == 1 else ("or", tuple(nodes))
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept("AND"):
+            nodes.append(self.parse_not())
+
+        return nodes[0] if len(nodes) == 1 else ("and", tuple(nodes))
+
+    def parse_not(self):
+        if self.accept("NOT"):
+            return ("not", self.parse_not())
+
+        if self.accept("("):
+            node = self.parse_or()
+            if not self.accept(")"):
+                self.fail("expected ')'")
+
+            return node
+
+        if self.position < len(self.tokens) and self.tokens[self.position][0] == "flag":
+            self.position += 1
+            return ("flag", self.tokens[self.position - 1][1])
+
+        self.fail("expected a flag ID")
+
+    # Consume the next token when it is of the requested kind
+    def accept(self, kind):
+        if self.position >= len(self.tokens) or self.tokens[self.position][0] != kind:
+            return False
+
+        if kind in OPERATORS and kind not in self.operators:
+            self.fail("operator " + kind + " is not supported")
+
+        self.position += 1
+        return True
+
+    def fail(self, message):
+        if self.position < len(self.tokens):
+            raise ValueError(message + " (at char " + str(self.tokens[self.position][2]) + ")")
+
+        raise ValueError(message + " (at end of expression)")
+
+
+# Parse and normalize an expression, raising ValueError when it is not valid
+def parse_filter(expression, operators=OPERATORS):
+    return normalize(FilterParser(expression, operators).parse())
+
+
+# Rewrite the tree with negations applied to flags only (De Morgan), nested ANDs and ORs flattened,
+# duplicated or contradicting terms removed and the terms sorted, so that equivalent expressions produce the same tree
+def normalize(node, negate=False):
+    kind = node[0]
+
+    if kind == "flag":
+        return ("not", node) if negate else node
+
+    if kind == "const":
+        return ("const", node[1] != negate)
+
+    if kind == "not":
+        return normalize(node[1], not negate)
+
+    # A negated AND becomes an OR of the negated terms, and vice versa
+    if negate:
+        kind = "or" if kind == "and" else "and"
+
+    terms = {}
+    for child in node[1]:
+        child = normalize(child, negate)
+
+        if child[0] == kind:
+            for term in child[1]:
+                terms[filter_key(term)] = term
+        else:
+            terms[filter_key(child)] = child
+
+    # Neutral and absorbing constants: TRUE for AND, FALSE for OR
+    neutral = ("const", kind == "and")
+    absorbing = ("const", kind != "and")
+    terms.pop(filter_key(neutral), None)
+    if filter_key(absorbing) in terms:
+        return absorbing
+
+    # A flag together with its negation is never satisfied, while the games satisfying one of the two are only
+    # the ones having a value for the flag
+    if kind == "and":
+        for key in terms:
+            if "!" + key in terms:
+                return absorbing
+
+    if not terms:
+        return neutral
+
+    if len(terms) == 1:
+        return next(iter(terms.values()))
+
+    return (kind, tuple(terms[key] for key in sorted(terms)))
+
+
+# Textual form of a normalized tree, used to identify it
+def filter_key(node):
+    kind = node[0]
+
+    if kind == "flag":
+        return str(node[1])
+    if kind == "not":
+        return "!" + filter_key(node[1])
+    if kind == "const":
+        return "T" if node[1] else "F"
+
+    return "(" + ("&" if kind == "and" else "|").join(filter_key(child) for child in node[1]) + ")"
+
+
+# Flags referenced by the tree, as (ID, value) pairs: the value is 0 for the negated flags of a normalized tree
+def filter_flags(node):
+    if node[0] == "flag":
+        return {(node[1], 1)}
+    if node[0] == "not":
+        return {(flag_id, 1 - value) for flag_id, value in filter_flags(node[1])}
+    if node[0] == "const":
+        return set()
+
+    return set().union(*[filter_flags(child) for child in node[1]])
+
+
+# Evaluate the tree over the bitsets of the games having each flag set (ID, 1) or not set (ID, 0)
+# Bitsets are integers, with the bit N set when the game with ID N belongs to the set
+def evaluate_filter(node, bitsets, universe):
+    kind = node[0]
+
+    if kind == "flag":
+        return bitsets.get((node[1], 1), 0)
+    if kind == "not":
+        if node[1][0] == "flag":
+            return bitsets.get((node[1][1], 0), 0)
+
+        return evaluate_filter(normalize(node), bitsets, universe)
+    if kind == "const":
+        return universe if node[1] else 0
+
+    res = evaluate_filter(node[1][0], bitsets, universe)
+    for child in node[1][1:]:
+        if kind == "and":
+            res &= evaluate_filter(child, bitsets, universe)
+        else:
+            res |= evaluate_filter(child, bitsets, universe)
+
+    return res
+
+
+# Bitset of the IDs received
+def make_bitset(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+
+    buffer = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+
+    return int.from_bytes(buffer, "little")
+
+
+# IDs contained inside the bitset, in increasing order
+def bitset_ids(bitset):
+    bits = bin(bitset)[:1:-1]
+    return [i for i in range(len(bits)) if bits[i] == "1"]
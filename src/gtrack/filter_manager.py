@@ -1,4 +1,13 @@
 from tabulate import tabulate
+from gtrack import utils
+from gtrack.cache_manager import bump_generation
+from gtrack.expression_manager import filter_key, filter_flags, evaluate_filter, make_bitset, bitset_ids
+
+# Expressions whose games have been stored inside the FilterGames temporary table
+_filter_tables = set()
+# Expressions used by the filter conditions, by key, whose games have to be stored before executing the queries
+_filter_pending = {}
+
 
 # Interpretation layer for the CONFIG command
 def config_flags(parsed_args, connection, cursor):
@@ -17,36 +26,34 @@ def config_flags(parsed_args, connection, cursor):
 
 
 # Add a new option flag in the Flag table and associates every game with it
+# Every game is associated through a single statement, whatever the size of the Game table
 def add_flag(flag_name, connection, cursor):
     err = None
-    game_list = []
     
     # Check that the new option isn't a duplicate
-    duplicates_query = "SELECT * FROM Flag WHERE name = ?"
+    duplicates_query = "SELECT COUNT(*) FROM Flag WHERE name = ?"
     query_data = (flag_name, )
     cursor.execute(duplicates_query, query_data)
 
-    if len(cursor.fetchall()) >= 1:
+    if cursor.fetchone()[0] >= 1:
         err = "WARNING: flag " + str(flag_name) + " could not be added due to being already present"
     else:
         # Insert option flag
-        insert_query = "INSERT INTO Flag (name) VALUES (?)"
-        cursor.execute(insert_query, query_data)
-        
-        insert_query = "SELECT id FROM Flag WHERE name = ?"
+        insert_query = "INSERT INTO Flag (name) VALUES (?) RETURNING id"
         cursor.execute(insert_query, query_data)
-        flag_id = cursor.fetchall()[0][0]
+        flag_id = cursor.fetchone()[0]
         
         # Associate to every game with a false starting value
-        game_query = "SELECT id FROM Game"
-        cursor.execute(game_query)
-        game_list = cursor.fetchall()
-        
-        associate_query = "INSERT INTO HasFlag (game_id, flag_id, value) VALUES (?, ?, ?)"
-        for game in game_list:
-            associate_data = (game[0], flag_id, 0, )
-            cursor.execute(associate_query, associate_data)            
+        associate_query = """ INSERT INTO HasFlag (game_id, flag_id, value)
+                              SELECT id, ?, 0
+                              FROM Game """
+
+        cursor.execute(associate_query, (flag_id, ))
 
+        # Game files have to be read again on the next scan to retrieve the values of the new flag
+        # The negation of the new flag now selects every game
+        invalidate_game_files(cursor)
+        invalidate_filters(cursor)
         connection.commit()
 
     return err
@@ -76,7 +83,141 @@ def remove_flag(flag_id, connection, cursor):
     
     cursor.execute(rm_query_hf, data)
     cursor.execute(rm_query_flag, data)
+    update_flag_masks(cursor)
+    invalidate_game_files(cursor)
+    connection.commit()
+    return
+
+
+# Store the values of the flags of the games as a bitmask, used to filter them without joining the HasFlag table
+# Must be called every time the HasFlag table changes, for a single game (GID) or for all of them
+def update_flag_masks(cursor, gid=None):
+
+    u_query = """ UPDATE Game
+                  SET flags = (SELECT IFNULL(SUM(1 << (HasFlag.flag_id - 1)), 0)
+                               FROM HasFlag
+                               WHERE HasFlag.game_id = Game.id AND HasFlag.value = 1 AND HasFlag.flag_id BETWEEN 1 AND ?) """
+
+    if gid is None:
+        cursor.execute(u_query, (utils.FLAG_MASK_BITS, ))
+    else:
+        cursor.execute(u_query + "WHERE id = ?", (utils.FLAG_MASK_BITS, gid))
+
+    invalidate_filters(cursor)
+
+
+# Discard the games selected by the filter expressions evaluated so far
+# Must be called every time the flags of the games or the games themselves change
+def invalidate_filters(cursor):
+
+    u_query = """ UPDATE Setting
+                  SET value = CAST(value AS INTEGER) + 1
+                  WHERE name = 'flags_version' """
+
+    cursor.execute(u_query)
+    bump_generation(cursor)
+    _filter_tables.clear()
+
+
+# Condition selecting the games that satisfy a filter expression (see expression_manager), together with its arguments
+# The games are stored inside a temporary table by load_filter_games, so the queries only look up their IDs.
+# The expression is bound as an argument, leaving the text of the condition the same for every filter
+def filter_condition(expression):
+    key = filter_key(expression)
+    _filter_pending[key] = expression
+
+    return ["Game.id IN (SELECT id FROM temp.FilterGames WHERE expression = ?)", (key, )]
+
+
+# Store the games of the filter conditions created so far inside the FilterGames temporary table
+# Must be called before executing a query containing them, and it is skipped when the result of the query is cached
+def load_filter_games(connection, cursor):
+
+    c_query = """ CREATE TEMP TABLE IF NOT EXISTS FilterGames (
+                      expression TEXT NOT NULL,
+                      id INT NOT NULL,
+                      PRIMARY KEY (expression, id)
+                  ) WITHOUT ROWID """
+
+    for key, expression in _filter_pending.items():
+        if key not in _filter_tables:
+            cursor.execute(c_query)
+            cursor.execute("DELETE FROM temp.FilterGames WHERE expression = ?", (key, ))
+            cursor.executemany("INSERT INTO temp.FilterGames (expression, id) VALUES (?, ?)", [(key, gid) for gid in filter_games(expression, connection, cursor)])
+            _filter_tables.add(key)
+
+    _filter_pending.clear()
+
+
+# IDs of the games that satisfy a filter expression, in increasing order
+# The result is cached inside the FilterCache table together with the flags version it has been computed from,
+# repeating the same expression (or an equivalent one) costs a single lookup until the flags change
+def filter_games(expression, connection, cursor):
+    key = filter_key(expression)
+
+    cursor.execute("SELECT value FROM Setting WHERE name = 'flags_version'")
+    version = int(cursor.fetchone()[0])
+
+    s_query = """ SELECT games
+                  FROM FilterCache
+                  WHERE expression = ? AND version = ? """
+
+    cursor.execute(s_query, (key, version))
+    row = cursor.fetchone()
+    if row is not None:
+        return bitset_ids(int.from_bytes(row[0], "little"))
+
+    bitsets, universe = load_flag_bitsets(filter_flags(expression), cursor)
+    games = evaluate_filter(expression, bitsets, universe)
+
+    # Results of the previous versions are not valid anymore
+    rm_query = """ DELETE FROM FilterCache
+                   WHERE version <> ? """
+
+    i_query = """ INSERT INTO FilterCache (expression, version, games)
+                  VALUES (?, ?, ?)
+                  ON CONFLICT(expression) DO UPDATE SET version = excluded.version, games = excluded.games """
+
+    cursor.execute(rm_query, (version, ))
+    cursor.execute(i_query, (key, version, games.to_bytes((games.bit_length() + 7) // 8, "little")))
     connection.commit()
+    return bitset_ids(games)
+
+
+# Bitsets of the games having each of the requested flags set (ID, 1) or not set (ID, 0), together with the bitset of all games
+# Set flags inside the bitmask are read through a single scan of the Game table, the other values from the HasFlag table
+def load_flag_bitsets(flags, cursor):
+    games = {flag: [] for flag in flags}
+    masked = [(flag, 1 << (flag[0] - 1)) for flag in flags if flag[1] == 1 and 1 <= flag[0] <= utils.FLAG_MASK_BITS]
+    all_games = []
+
+    cursor.execute("SELECT id, flags FROM Game")
+    for gid, game_flags in cursor.fetchall():
+        all_games.append(gid)
+        for flag, bit in masked:
+            if game_flags & bit:
+                games[flag].append(gid)
+
+    s_query = """ SELECT game_id
+                  FROM HasFlag
+                  WHERE flag_id = ? AND value = ? """
+
+    for flag_id, value in flags:
+        if value == 0 or not 1 <= flag_id <= utils.FLAG_MASK_BITS:
+            cursor.execute(s_query, (flag_id, value))
+            games[(flag_id, value)] = [row[0] for row in cursor.fetchall()]
+
+    return {flag: make_bitset(games[flag]) for flag in flags}, make_bitset(all_games)
+
+
+# Remove the game files from the ingest manifest
+# Flag values inside .csv files are positional, so they have to be interpreted again when the flag list changes
+def invalidate_game_files(cursor):
+
+    rm_query = """DELETE FROM IngestManifest
+                  WHERE kind = 'game' """
+
+    cursor.execute(rm_query)
     return
 
 
@@ -86,10 +227,15 @@ def scan_flags(filters, connection, cursor):
     if filters is not None:
         flag_list = filters.split(",")
 
+        # Flags already present are skipped without querying them one by one
+        cursor.execute("SELECT name FROM Flag")
+        present = set(row[0] for row in cursor.fetchall())
+
         print("Scanning flag list: " + str(flag_list))
         for flag in flag_list:
-            if flag.strip() != "":
+            if flag.strip() != "" and flag.strip() not in present:
                 add_flag(flag.strip(), connection, cursor)
+                present.add(flag.strip())
 
         print("Insertion complete!\n")
 
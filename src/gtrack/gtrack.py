@@ -4,11 +4,15 @@ import sqlite3
 
 from datetime import datetime
 from gtrack import utils
+from gtrack.alias_manager import config_aliases
 from gtrack.config_manager import read_config_file
 from gtrack.filter_manager import config_flags, scan_flags
 from gtrack.insert_manager import insert_data, scan_data, remove_data
 from gtrack.plot_manager import plot_data
 from gtrack.print_manager import print_data
+from gtrack.schema_manager import migrate_schema, rebuild_daily_playtime, update_local_days
+from gtrack.stats_manager import print_stats, start_run, write_ingest_log
+from gtrack.watch_manager import watch_data
 
 # Main program
 def main():
@@ -21,21 +25,30 @@ def main():
     configs = read_config_file()
     dbpath = configs["Paths"]
     filters = configs["Filters"]
+    storage_options = configs["Storage"]
     bucket_options = configs["BucketOptions"]
+    server_options = configs["Server"]
     plot_options["PoT"] = configs["PoT"]
     plot_options["MHoT"] = configs["MHoT"]
 
     # Connect to the sqlite3 database and check for the existance of the tables
     # When the database is not found in the indicated directory, it is created
     try:
-        connection = sqlite3.connect(dbpath[0])
+        connection = sqlite3.connect(dbpath[0], cached_statements=storage_options["cached_statements"])
         cursor = connection.cursor()
+        configure_storage(storage_options, cursor)
 
     except sqlite3.Error as e:
         print("ERROR: connection to the database could not be established due to " + str(e))
         exit(-1)
 
-    create_tables(cursor)
+    # Create the tables, or upgrade the ones of a database created by a previous version
+    res = migrate_schema(connection, cursor)
+    if res is not None:
+        print(res)
+        exit(-1)
+
+    update_local_days(storage_options["timezone"], bucket_options["timezone"], connection, cursor)
     
     # Parse arguments received by the program
     parsed_args = parse_arguments(sys.argv[1:])
@@ -47,23 +60,43 @@ def main():
             exit(-1)
     
     elif parsed_args["mode"] == utils.ProgramModes.INSERT.value:
+        run = start_run(parsed_args["mode"])
         res = insert_data(parsed_args, bucket_options, connection, cursor)
+        report_run(run, parsed_args, storage_options, connection, cursor)
+        if res is not None:
+            print(res)
+            exit(-1)
+
+    elif parsed_args["mode"] == utils.ProgramModes.ALIAS.value:
+        res = config_aliases(parsed_args, connection, cursor)
         if res is not None:
             print(res)
             exit(-1)
 
     elif parsed_args["mode"] == utils.ProgramModes.PLOT.value:
-        plot_data(parsed_args, plot_options, connection, cursor)
+        plot_data(parsed_args, plot_options, storage_options, connection, cursor)
     
     elif parsed_args["mode"] == utils.ProgramModes.PRINT.value:
-        print_data(parsed_args, connection, cursor)
+        print_data(parsed_args, storage_options, connection, cursor)
 
     elif parsed_args["mode"] == utils.ProgramModes.REMOVE.value:
         remove_data(parsed_args["GID"], connection, cursor)
 
+    elif parsed_args["mode"] == utils.ProgramModes.REBUILD.value:
+        rebuild_daily_playtime(connection, cursor)
+        print("Rebuild complete!")
+
     elif parsed_args["mode"] == utils.ProgramModes.SCAN.value:
         scan_flags(filters[0], connection, cursor)
-        res = scan_data((dbpath[1], dbpath[2]), bucket_options, connection, cursor)
+        run = start_run(parsed_args["mode"])
+        res = scan_data((dbpath[1], dbpath[2]), bucket_options, connection, cursor, parsed_args["jobs"], server_options)
+        report_run(run, parsed_args, storage_options, connection, cursor)
+
+        # Keep ingesting the exports added to the bucket folder, reporting each cycle as a run of its own
+        if res is None and parsed_args["scan_follow"]:
+            res = watch_data(dbpath[2], bucket_options, connection, cursor, parsed_args["scan_interval"],
+                             report=lambda cycle_run: report_run(cycle_run, parsed_args, storage_options, connection, cursor))
+
         if res is not None:
             print(res)
             exit(-1)
@@ -72,41 +105,39 @@ def main():
     connection.close()
 
 
-# Creates the tables 'game' and 'activity' inside the database if they aren't alread present
-def create_tables(cursor):
+# Report the statistics of an INSERT or SCAN execution, printing them when requested and storing them
+# inside the IngestLog table when enabled by the configuration file
+def report_run(run, parsed_args, storage_options, connection, cursor):
+    run.finish()
 
-    query_game = """ CREATE TABLE IF NOT EXISTS Game (
-                        id INTEGER PRIMARY KEY,
-                        display_name VARCHAR(50) NOT NULL,
-                        executable_name VARCHAR(50) NOT NULL
-                ) """
-    
-    query_flags = """ CREATE TABLE IF NOT EXISTS Flag (
-                        id INTEGER PRIMARY KEY,
-                        name VARCHAR(50) NOT NULL
-                ) """
-    
-    query_rel_flags= """ CREATE TABLE IF NOT EXISTS HasFlag (
-                            game_id INT NOT NULL,
-                            flag_id INT NOT NULL,
-                            value INT NOT NULL,
-                            PRIMARY KEY (game_id, flag_id)
-                            FOREIGN KEY (game_id) REFERENCES Game(id),
-                            FOREIGN KEY (flag_id) REFERENCES Flag(id)
-                    ) """
-    
-    query_activity = """ CREATE TABLE IF NOT EXISTS Activity (
-                            game_id INT NOT NULL,
-                            date DATETIME NOT NULL,
-                            playtime FLOAT NOT NULL,
-                            PRIMARY KEY (game_id, date),
-                            FOREIGN KEY (game_id) REFERENCES Game(id)
-                    ) """
-    
-    cursor.execute(query_game)
-    cursor.execute(query_flags)
-    cursor.execute(query_rel_flags)
-    cursor.execute(query_activity)
+    if parsed_args["stats"] is not None:
+        print_stats(run, parsed_args["stats"])
+
+    if storage_options["ingest_log"] and run.files:
+        write_ingest_log(run, connection, cursor)
+
+
+# Apply the storage profile indicated inside the configuration file to the connection
+# PRAGMA statements cannot be parameterized, so only the accepted values are applied
+def configure_storage(storage_options, cursor):
+
+    if storage_options["journal_mode"] in utils.DB_JOURNAL_MODES:
+        cursor.execute("PRAGMA journal_mode = " + storage_options["journal_mode"])
+    else:
+        print("WARNING: journal mode '" + storage_options["journal_mode"] + "' is not supported! The default one will be used.")
+
+    if storage_options["synchronous"] in utils.DB_SYNCHRONOUS_LEVELS:
+        cursor.execute("PRAGMA synchronous = " + storage_options["synchronous"])
+    else:
+        print("WARNING: synchronous level '" + storage_options["synchronous"] + "' is not supported! The default one will be used.")
+
+    if storage_options["temp_store"] in utils.DB_TEMP_STORES:
+        cursor.execute("PRAGMA temp_store = " + storage_options["temp_store"])
+    else:
+        print("WARNING: temp store '" + storage_options["temp_store"] + "' is not supported! The default one will be used.")
+
+    cursor.execute("PRAGMA cache_size = " + str(int(storage_options["cache_size"])))
+    cursor.execute("PRAGMA mmap_size = " + str(max(0, int(storage_options["mmap_size"]))))
 
 
 # Parses the arguments received by the program
@@ -118,13 +149,15 @@ def parse_arguments(params):
     subparser = parser.add_subparsers(dest="mode", required=True, help="'subcommand' help")
 
     # Insert options
-    insert_usage = app_name + " insert -t TYPE [-h] (-f FILE  [--create-template | --no-header] | -m)"
+    insert_usage = app_name + " insert -t TYPE [-h] (-f FILE  [--create-template | --no-header] [-j JOBS] | -m)"
     parser_ins = subparser.add_parser(utils.ProgramModes.INSERT.value, usage=insert_usage, help="Provide new games or buckets to add to the database from command-line or .csv/.json files")
     exclusive_group = parser_ins.add_mutually_exclusive_group(required=True)
     parser_ins.add_argument("--create-template", dest="template_flag", action="store_true", help="Create a template for custom insertion of the selected TYPE")
     exclusive_group.add_argument("-f", "--file", dest="insert_filepath", metavar="FILE", help="File to read from or directory containing source files")
     exclusive_group.add_argument("-m", "--manual", dest="insert_manual_flag", action="store_true", help="Manual insertion of game's data")
+    parser_ins.add_argument("-j", "--jobs", dest="jobs", metavar="JOBS", type=int, default=1, help="Number of processes used to parse the buckets of a directory")
     parser_ins.add_argument("--no-header", dest="header_flag", action="store_true", help="Don't skip any line while parsing the .csv file")
+    parser_ins.add_argument("--stats", dest="stats", metavar="FORMAT", type=str.lower, choices=["text", "json"], help="Print the statistics of the ingest of each file and of the whole run ['text' | 'json']")
     parser_ins.add_argument("-t", "--type", dest="insert_choice", metavar="TYPE", type=str.lower, choices=["game", "bucket"], help="Data type to insert between ['game' | 'bucket']", required=True)
 
     # Filter options
@@ -134,6 +167,17 @@ def parse_arguments(params):
     exclusive_config_group.add_argument("--list", dest="filter_list", action="store_true", help="List all flags")
     exclusive_config_group.add_argument("--rm", dest="filter_rm", metavar="FLAG_ID", type=int, help="Remove a flag based on its ID")
 
+    # Alias options
+    parser_alias = subparser.add_parser(utils.ProgramModes.ALIAS.value, help="Configure additional executable names, globs or regexes identifying the games inside the buckets")
+    exclusive_alias_group = parser_alias.add_mutually_exclusive_group(required=True)
+    exclusive_alias_group.add_argument("--add", dest="alias_add", metavar=("GID", "PATTERN"), nargs=2, help="Add an alias to the game with the specified ID")
+    exclusive_alias_group.add_argument("--list", dest="alias_list", action="store_true", help="List all aliases")
+    exclusive_alias_group.add_argument("--rm", dest="alias_rm", metavar="ALIAS_ID", type=int, help="Remove an alias based on its ID")
+    parser_alias.add_argument("-k", "--kind", dest="alias_kind", metavar="KIND", type=str.lower, choices=["exact", "glob", "regex"], default="exact", help="How the alias is matched against the applications ['exact' (default) | 'glob' | 'regex']")
+
+    # Rebuild options
+    subparser.add_parser(utils.ProgramModes.REBUILD.value, help="Compute again the daily playtime of every game from the stored activities")
+
     # Plot options
     plot_usage = app_name + " plot -t TYPE [-h] [-s PATH] [-cf FILTER_BASE_EXPR] [-f [FILTER_EXPR ...]] [-t | -d SDATE [EDATE]]"
     parser_plot = subparser.add_parser(utils.ProgramModes.PLOT.value, usage=plot_usage, help="Plot the recorded data")
@@ -144,7 +188,7 @@ def parse_arguments(params):
     parser_plot.add_argument("-tot", "--total", dest="plot_total", action="store_true", help="Plot the overall recorded information")
 
     # Print options
-    print_usage = app_name + " print [-h] [-v] [-t | [[-d SDATE [EDATE]] [-dd] [-mm]] [-gid [GID ...] | -gname GNAME]"
+    print_usage = app_name + " print [-h] [-v] [-p ROWS] [-t | [[-d SDATE [EDATE]] [-dd] [-mm]] [-gid [GID ...] | -gname GNAME]"
     parser_print = subparser.add_parser(utils.ProgramModes.PRINT.value, usage=print_usage, help="Print time spent for provided games. By default, it prints the total playtime of every game played during the current year")
     exclusive_print_group_01 = parser_print.add_mutually_exclusive_group()
     exclusive_print_group_02 = parser_print.add_mutually_exclusive_group()
@@ -156,6 +200,7 @@ def parse_arguments(params):
     exclusive_print_group_02.add_argument("-gname", dest="name_print", metavar="GNAME", help="Filter the information to the specified game name")
     parser_print.add_argument("--mean", dest="print_mean", action="store_true", help="Compute the mean time spent on playing with respect to the current year. Can be grouped with other filters.")
     exclusive_print_group_01.add_argument("-mm", "--monthly", dest="print_monthly", action="store_true", help="Total time spent on each game as a total per month")
+    parser_print.add_argument("-p", "--page", dest="print_page", type=int, default=0, metavar="ROWS", help="Split the table into pages of ROWS rows, waiting for Enter between them when printing on a terminal")
     parser_print.add_argument("-s", "--sort-by", dest="print_sort", default="playtime", type=str.lower, choices=["name", "first_played", "last_played", "playtime"], help="Order the games based on the alphabetic order, play order (first or last played) or total playtime (default)")
     parser_print.add_argument("--sum", dest="print_sum", action="store_true", help="Compute the total time between all games stored inside the database for the current year. Can be grouped with other filters.")
     parser_print.add_argument("-t", "--total", dest="print_total", action="store_true", help="Total time spent on each game")
@@ -167,6 +212,10 @@ def parse_arguments(params):
 
     # Scan options
     parser_scan = subparser.add_parser(utils.ProgramModes.SCAN.value, help="Scan the paths indicated inside the configuration file for rapidly inserting/updating game and bucket's entries")
+    parser_scan.add_argument("-j", "--jobs", dest="jobs", metavar="JOBS", type=int, default=1, help="Number of processes used to parse the buckets")
+    parser_scan.add_argument("--follow", dest="scan_follow", action="store_true", help="Keep running after the scan, ingesting new or grown bucket files as they appear inside the bucket folder")
+    parser_scan.add_argument("--stats", dest="stats", metavar="FORMAT", type=str.lower, choices=["text", "json"], help="Print the statistics of the ingest of each file and of the whole run ['text' | 'json']")
+    parser_scan.add_argument("--interval", dest="scan_interval", metavar="SECONDS", type=float, default=utils.WATCH_POLL_INTERVAL, help="Seconds between two checks of the bucket folder when following it (default: " + str(utils.WATCH_POLL_INTERVAL) + ")")
 
     try:
         res = vars(parser.parse_args(params))
@@ -185,6 +234,14 @@ def parse_arguments(params):
             print("error: " + app_name + " print: error: argument --create-template: not allowed with argument --no-header")
             exit(-1)
 
+        if res["mode"] in (utils.ProgramModes.INSERT.value, utils.ProgramModes.SCAN.value) and res["jobs"] < 1:
+            print("error: " + app_name + " " + res["mode"] + ": error: argument -j/--jobs: the number of jobs has to be at least 1")
+            exit(-1)
+
+        if res["mode"] == utils.ProgramModes.SCAN.value and res["scan_interval"] <= 0:
+            print("error: " + app_name + " scan: error: argument --interval: the interval has to be greater than 0")
+            exit(-1)
+
         if res["mode"] == "plot" and res["plot_total"] and res["date_plot_default"]:
             print("usage: " + plot_usage)
             print("error: " + app_name + " plot: error: argument -t/--total: not allowed with argument -d/--date")
@@ -1,11 +1,24 @@
+import bz2
 import csv
+import gzip
+import hashlib
 import json
+import lzma
 import os
+import pathlib
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.client import HTTPException
 from json import JSONDecodeError
 from datetime import datetime
 from datetime import timedelta
-from operator import itemgetter
+from datetime import timezone
 from gtrack import utils
+from gtrack.bucket_manager import MAX_UTC_OFFSET, DatastoreReader, GameIndex, ServerReader, Sessionizer, iter_bucket_events, parse_event_timestamp
+from gtrack.cache_manager import bump_generation
+from gtrack.filter_manager import update_flag_masks, invalidate_filters
+from gtrack.stats_manager import current_run, track_file
 
 
 # Interpretation layer for the INSERT mode
@@ -82,6 +95,8 @@ def insert_from_cli(connection, cursor):
             cursor.execute(u_query, u_data)
     else:
         cursor.execute(i_query, i_data)
+        reset_datastore_marks(cursor)
+        invalidate_bucket_files(cursor)
 
     connection.commit()
 
@@ -115,6 +130,8 @@ def insert_from_cli(connection, cursor):
             cursor.execute(u_query, u_data)  
         else:
             cursor.execute(i_query, i_data)
+
+    update_flag_masks(cursor, gid)
     
     connection.commit()
     return err
@@ -123,15 +140,16 @@ def insert_from_cli(connection, cursor):
 # Additional controls for eventual errors during execution
 def insert_from_file(parsed_args, bucket_options, connection, cursor):
     err = None
+    skip_counter = 0
+    use_manifest = parsed_args.get("manifest_flag", False)
+    jobs = parsed_args.get("jobs") or 1
     
     # Check if user indicated a simple file or a directory of source files
     is_dir = os.path.isdir(parsed_args["insert_filepath"])
     is_path = os.path.isfile(parsed_args["insert_filepath"])
     
     # Obtain game names
-    s_query = "SELECT id, executable_name FROM Game"
-    cursor.execute(s_query)
-    games = cursor.fetchall()
+    games = load_game_index(cursor)
 
     # Useless to process the JSON file if no game has been inserted beforehand
     if parsed_args["insert_choice"] == "bucket" and not games:
@@ -140,28 +158,49 @@ def insert_from_file(parsed_args, bucket_options, connection, cursor):
 
     if is_dir == 1:
         input_files = os.listdir(parsed_args["insert_filepath"])
+        bucket_files = []
 
         for file_name in input_files:
             # Game
             if parsed_args["insert_choice"] == "game" and file_name.lower().endswith(".csv"):
                 file = parsed_args["insert_filepath"] + str(file_name)
-                open_data_file(file, 0, parsed_args["header_flag"], None, None, connection, cursor)
+                if open_data_file(file, 0, parsed_args["header_flag"], None, None, connection, cursor, use_manifest) == 2:
+                    skip_counter += 1
 
             # Activity
-            elif parsed_args["insert_choice"] == "bucket" and file_name.lower().endswith(".json"):
-                file = parsed_args["insert_filepath"] + str(file_name)
-                open_data_file(file, 1, None, games, bucket_options, connection, cursor)
+            elif parsed_args["insert_choice"] == "bucket" and file_name.lower().endswith(utils.BUCKET_EXTENSIONS):
+                bucket_files.append(parsed_args["insert_filepath"] + str(file_name))
+
+            # ActivityWatch datastore
+            elif parsed_args["insert_choice"] == "bucket" and file_name.lower().endswith(utils.DATASTORE_EXTENSIONS):
+                read_bucket_datastore(parsed_args["insert_filepath"] + str(file_name), games, bucket_options, connection, cursor)
+
+        # Buckets can be parsed in parallel when more jobs are requested
+        if jobs > 1 and len(bucket_files) > 1:
+            skip_counter += read_bucket_files_parallel(bucket_files, games, bucket_options, jobs, connection, cursor, use_manifest)
+        else:
+            for file in bucket_files:
+                if open_data_file(file, 1, None, games, bucket_options, connection, cursor, use_manifest) == 2:
+                    skip_counter += 1
+
+        if skip_counter > 0:
+            current_run().skipped_files += skip_counter
+            print(str(skip_counter) + " files have been skipped since they did not change after the last scan.")
 
         print("Insertion complete!")
 
     elif is_path == 1:
         # Game
         if parsed_args["insert_choice"] == "game" and parsed_args["insert_filepath"].lower().endswith(".csv"):
-            open_data_file(parsed_args["insert_filepath"], 0, parsed_args["header_flag"], None, None, connection, cursor)
+            open_data_file(parsed_args["insert_filepath"], 0, parsed_args["header_flag"], None, None, connection, cursor, use_manifest)
 
         # Activity
-        elif parsed_args["insert_choice"] == "bucket" and parsed_args["insert_filepath"].lower().endswith(".json"):
-            open_data_file(parsed_args["insert_filepath"], 1, None, games, bucket_options, connection, cursor)
+        elif parsed_args["insert_choice"] == "bucket" and parsed_args["insert_filepath"].lower().endswith(utils.BUCKET_EXTENSIONS):
+            open_data_file(parsed_args["insert_filepath"], 1, None, games, bucket_options, connection, cursor, use_manifest)
+
+        # ActivityWatch datastore
+        elif parsed_args["insert_choice"] == "bucket" and parsed_args["insert_filepath"].lower().endswith(utils.DATASTORE_EXTENSIONS):
+            read_bucket_datastore(parsed_args["insert_filepath"], games, bucket_options, connection, cursor)
 
         # Error
         else:
@@ -174,30 +213,140 @@ def insert_from_file(parsed_args, bucket_options, connection, cursor):
 
 
 # Checks for possible errors while opening the file and launches the correct module
-def open_data_file(file_name, file_type, header_flag, game_list, bucket_options, connection, cursor):
+# When the manifest is used, files already processed in their current form are skipped (returns 2)
+def open_data_file(file_name, file_type, header_flag, game_index, bucket_options, connection, cursor, use_manifest=False):
+    res = 0
+    entry = None
+    file_kind = "game" if file_type == 0 else "bucket"
+
     try:
-        input_file = open(file_name)
+        if use_manifest:
+            entry = check_manifest(file_name, file_kind, connection, cursor)
+            if entry is None:
+                return 2
+
+        input_file = open(file_name) if file_type == 0 else open_bucket_file(file_name)
+        file_stats = track_file(file_name, file_kind, os.path.getsize(file_name))
     except OSError:
         print("ERROR: file " + file_name + " couldn't be opened/read!")
         return 1
 
     print("Reading: " + file_name)
+    begin_transaction(connection)
     with input_file:
         if file_type == 0:
-            read_game_data_csv(input_file, header_flag, connection, cursor)
+            start = time.perf_counter()
+            res = read_game_data_csv(input_file, header_flag, connection, cursor)
+            file_stats.parse_time = time.perf_counter() - start
         else:
-            read_bucket_data_json(input_file, game_list, bucket_options, connection, cursor)
+            res = read_bucket_data_json(input_file, game_index, bucket_options, connection, cursor, file_stats)
 
-    return 0
+    if res != 0:
+        file_stats.status = "error"
+
+    # Only files processed without errors are marked as ingested
+    if entry is not None and res == 0:
+        record_manifest(entry, connection, cursor)
+
+    end_transaction(res, connection)
+    return res
+
+
+# Open a bucket export in text mode, decompressing it while it is read when needed
+def open_bucket_file(file_name):
+    lower_name = file_name.lower()
+
+    if lower_name.endswith(".gz"):
+        return gzip.open(file_name, "rt")
+
+    if lower_name.endswith(".xz"):
+        return lzma.open(file_name, "rt")
+
+    if lower_name.endswith(".bz2"):
+        return bz2.open(file_name, "rt")
+
+    return open(file_name)
+
+
+# Start an explicit transaction for the processing of a single source
+# Everything written for the source (data, ingest state, manifest) is committed at once by end_transaction
+def begin_transaction(connection):
+    if connection.in_transaction:
+        connection.commit()
+
+    connection.execute("BEGIN")
+
+
+# Commit the changes of the source when processed without errors, otherwise discard them
+def end_transaction(res, connection):
+    if res == 0:
+        connection.commit()
+    else:
+        connection.rollback()
+
+
+# Compare the file with the one recorded inside the ingest manifest
+# Returns None if the file has already been ingested, otherwise the entry to record once it is processed.
+# The file is opened only when its size or modification time changed, to verify its content through the hash
+def check_manifest(file_name, file_kind, connection, cursor):
+    path = os.path.abspath(file_name)
+    stats = os.stat(path)
+
+    s_query = """ SELECT size, mtime
+                  FROM IngestManifest
+                  WHERE path = ? AND kind = ? """
+
+    cursor.execute(s_query, (path, file_kind))
+    row = cursor.fetchone()
+    if row is not None and row[0] == stats.st_size and row[1] == stats.st_mtime_ns:
+        return None
+
+    entry = (path, file_kind, stats.st_size, stats.st_mtime_ns, hash_file(path))
+
+    # Same content already ingested, possibly from a different path: only the manifest needs updating
+    s_query = """ SELECT COUNT(*)
+                  FROM IngestManifest
+                  WHERE kind = ? AND hash = ? """
+
+    cursor.execute(s_query, (file_kind, entry[4]))
+    if cursor.fetchone()[0] > 0:
+        record_manifest(entry, connection, cursor)
+        connection.commit()
+        return None
+
+    return entry
+
+
+# Store or update the ingest manifest entry of a file
+def record_manifest(entry, connection, cursor):
+
+    i_query = """ INSERT INTO IngestManifest (path, kind, size, mtime, hash)
+                  VALUES (?, ?, ?, ?, ?)
+                  ON CONFLICT(path, kind) DO UPDATE SET size = excluded.size,
+                                                        mtime = excluded.mtime,
+                                                        hash = excluded.hash """
+
+    cursor.execute(i_query, entry)
+
+
+# Hash of the file content, read in chunks
+def hash_file(path):
+    file_hash = hashlib.sha256()
+
+    with open(path, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(utils.HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
 
 
 # Read the list of games from a .csv file and add them to the sql database
+# Each game is inserted or updated with a single upsert, while the flag values are written in bulk at the end
 def read_game_data_csv(input_stream, header_flag, connection, cursor):
     counter = 0       # Counter to skip first line
     disc_counter = 0  # Discarded line counter
     flag_list = []    # Flag list 
-    exe_list = []     # Executable list
-    option_list = []  # Options for parsable lines
+    flag_rows = []    # HasFlag values of the parsed games
 
     # Get the flag list to interpret the additional options in the .csv
     flag_query = """ SELECT id
@@ -207,6 +356,18 @@ def read_game_data_csv(input_stream, header_flag, connection, cursor):
     cursor.execute(flag_query)
     flag_list = cursor.fetchall()
 
+    # Games receiving an id greater than the current maximum are new ones
+    cursor.execute("SELECT IFNULL(MAX(id), 0) FROM Game")
+    max_gid = cursor.fetchone()[0]
+    new_games = False
+
+    # Check if entry already exist, based on the executable name, since it theoretically cannot change
+    # In case it exists, UPDATE the row, otherwise INSERT a new row
+    i_query = """ INSERT INTO Game (display_name, executable_name)
+                  VALUES (?, ?)
+                  ON CONFLICT(executable_name) DO UPDATE SET display_name = excluded.display_name
+                  RETURNING id """
+
     # Parse the .csv and insert games
     for line in csv.DictReader(input_stream, utils.FIELDNAMES, restkey="flags"):
         # Skip first line when the header of the .csv file is present
@@ -249,209 +410,618 @@ def read_game_data_csv(input_stream, header_flag, connection, cursor):
             while (len(flag_list) - len(options)) > 0:
                 options += [0]
 
-        # Check if entry already exist, based on the executable name, since it theoretically cannot change
-        # In case it exists, UPDATE the row, otherwise INSERT a new row
-        u_data = (name, exe_name)
-        u_query = """ UPDATE Game
-                      SET display_name = ?
-                      WHERE executable_name = ? """
+        cursor.execute(i_query, (name, exe_name))
+        gid = cursor.fetchone()[0]
+        if gid > max_gid:
+            new_games = True
 
-        i_data = (name, exe_name)
-        i_query = """ INSERT INTO Game (display_name, executable_name)
-                      VALUES (?, ?) """
-
-        cursor.execute(u_query, u_data)        
-        if cursor.rowcount < 1:
-            cursor.execute(i_query, i_data)
+        for i in range(len(flag_list)):
+            flag_rows.append((gid, flag_list[i][0], options[i]))
 
         counter += 1
-        exe_list.append(exe_name)
-        option_list.append(options)
 
-    # Commit the changes to the Game table
-    connection.commit()
+    # New games could appear inside events already read from a datastore or from the bucket files
+    if new_games:
+        reset_datastore_marks(cursor)
+        invalidate_bucket_files(cursor)
 
     # Insert the flags values
-    if (len(exe_list) != len(option_list)):
-        print("ERROR: cannot insert flag options due to some unexpected problem! Terminating program...")
-        return
-    
-    for i in range(len(exe_list)):
-        # For each game, retrieve its ID and make an insert inside the HasFlag table
-        exe_name = exe_list[i]
-        options = option_list[i]
-
-        s_data = (exe_name, )
-        s_query = """SELECT id
-                     FROM Game
-                     WHERE executable_name = ? """
-        
-        cursor.execute(s_query, s_data)
-        gid = cursor.fetchall()[0][0]
-
-        u_query = """ UPDATE HasFlag
-                      SET value = ?
-                      WHERE game_id = ? AND flag_id = ? """
-    
-        i_query = """INSERT INTO HasFlag (game_id, flag_id, value)
-                     VALUES (?, ?, ?) """
-        
-        for i in range(len(flag_list)):
-            u_data = (options[i], gid, flag_list[i][0])
-            i_data = (gid, flag_list[i][0], options[i])
+    i_query = """ INSERT INTO HasFlag (game_id, flag_id, value)
+                  VALUES (?, ?, ?)
+                  ON CONFLICT(game_id, flag_id) DO UPDATE SET value = excluded.value """
 
-            cursor.execute(u_query, u_data)        
-            if cursor.rowcount < 1:
-                cursor.execute(i_query, i_data)
+    cursor.executemany(i_query, flag_rows)
+    update_flag_masks(cursor)
 
-    # Commit the changes to the HasFlag table
-    connection.commit()
     if disc_counter > 0:
         print("WARNING: " + str(disc_counter) + " lines have been discarded for unexpected values encountered! Please check the input file.")
 
+    return 0
+
 
 # Read the list of activities from the buckets produced by ActivityWatch and add them to the sql database
-def read_bucket_data_json(input_stream, games, options, connection, cursor):
-    act_event_counter = 0
-    uthres_counter = 0
-    dup_counter = 0
-    activities = []
-    a_ins = {}
-    prev_end_time = 0
-    datetime_event_format = "%Y-%m-%dT%H:%M:%S.%f%z"
-    datetime_event_nomicro_format = "%Y-%m-%dT%H:%M:%S%z"
-    different_activities_threshold = timedelta(seconds=options["diff_thres"])
-
-    try: 
-        data = json.load(input_stream)
-    except JSONDecodeError as je:
-        print("ERROR: json file could not be decoded due to:" + str(je))
-        return
+def read_bucket_data_json(input_stream, game_index, options, connection, cursor, file_stats=None):
+    ingest_state = load_ingest_state(cursor)
+    sessions, err = parse_bucket_data_json(input_stream, game_index, options, ingest_state)
+    if err is not None:
+        print(err)
+        return 1
+
+    return store_bucket_sessions(sessions, options, connection, cursor, file_stats)
+
 
+# Group the relevant events of the bucket into sessions
+# The file is walked as a stream and the relevant events are immediately grouped into sessions,
+# so that the memory required does not grow with the size of the bucket
+def parse_bucket_data_json(input_stream, game_index, options, ingest_state=None):
     try:
-        # Cycle between different buckets
-        for bucket in data["buckets"]:
+        sessions = parse_bucket_events(iter_bucket_events(input_stream), game_index, options, ingest_state)
 
-            # Extract the content of the bucket
-            bucket_content = data["buckets"][bucket]["events"]
+    except JSONDecodeError as je:
+        return None, "ERROR: json file could not be decoded due to:" + str(je)
 
-            # Cycle through the events
-            for event in bucket_content:
-                result = is_event_relevant(event["data"]["app"], games)
+    except TypeError as te:
+        return None, "ERROR: some key dictionary couldn't be found inside the provided json file! Aborting file processing..."
 
-                if event["duration"] and result != 0 and event["duration"] > 0:
-                    # Sometimes the microseconds disappear
-                    try:
-                        event_dt = datetime.strptime(event["timestamp"], datetime_event_format)
-                    except ValueError as date_err:
-                        event_dt = datetime.strptime(event["timestamp"], datetime_event_nomicro_format)
+    except KeyError as ke:
+        return None, "ERROR: key " + str(ke) + " couldn't be found inside the provided json file! Aborting file processing..."
 
-                    a = {
-                        "game_id": result,
-                        "datetime": event_dt,
-                        "playtime": float(event["duration"])
-                    }
+    # Raised while reading corrupted or truncated compressed files
+    except (OSError, EOFError, lzma.LZMAError) as ce:
+        return None, "ERROR: file could not be read/decompressed due to: " + str(ce)
 
-                    activities.append(a)
+    return sessions, None
 
-    except TypeError as te:
-        print("ERROR: some key dictionary couldn't be found inside the provided json file! Aborting file processing...")
-        return
 
-    except KeyError as ke:
-        print("ERROR: key " + str(ke) + " couldn't be found inside the provided json file! Aborting file processing...")
-        return
+# Group the relevant events, received as (bucket_id, event) pairs, into sessions
+# When the ingest state is provided, events already ingested are skipped and the last stored session of
+# each game is used as a starting point, so that the new events can extend it
+def parse_bucket_events(events, game_index, options, ingest_state=None):
+    watermarks, open_sessions = ingest_state if ingest_state is not None else ({}, None)
+    sessions = Sessionizer(timedelta(seconds=options["diff_thres"]), open_sessions)
+    parse_start = time.perf_counter()
 
-    # Sort for better compute different activities
-    activities = sorted(activities, key=itemgetter("game_id", "datetime"))
-    for i in range(len(activities)):
-        event = activities[i]
+    add_new_events(sessions, iter_new_events(events, game_index, watermarks, sessions), watermarks)
 
-        # Need to duplicate the event when starting the cycle
-        if i == 0 or not a_ins:
-            a_ins = dict(event)
+    sessions.parse_time += time.perf_counter() - parse_start - sessions.sessionize_time
+    return sessions
 
-        # Check if the event is different from the previous one or if there is too much time
-        # discrepancy between the two start times. Store the past one and start collecting
-        # information on the new data
-        elif a_ins["game_id"] != event["game_id"] or ((event["datetime"] - prev_end_time) > different_activities_threshold):
-            ins_res = insert_activity(a_ins["game_id"], a_ins["datetime"], a_ins["playtime"], options["save_thres"], cursor)
-            if ins_res == 1:
-                uthres_counter += act_event_counter
-            elif ins_res == 2:
-                dup_counter += act_event_counter
 
-            act_event_counter = 0
-            a_ins = dict(event)
+# Relevant events of the buckets, as (bucket_id, game_id, start_datetime, playtime) tuples
+# Events are counted inside COUNTERS (seen and skipped), the ones clearly older than the watermark of their
+# bucket are recognized from the text of the timestamp and skipped without decoding it
+def iter_new_events(events, game_index, watermarks, counters):
 
-        else:
-            a_ins["playtime"] += event["playtime"]
+    # Cycle through the events of the different buckets
+    for bucket, event in events:
+        counters.seen += 1
+        result = is_event_relevant(event["data"]["app"], game_index)
 
-        act_event_counter += 1
-        prev_end_time = event["datetime"] + timedelta(0, event["playtime"])
+        if event["duration"] and result != 0 and event["duration"] > 0:
+            watermark = watermarks.get((bucket, result))
+            if watermark is not None and event["timestamp"][:19] < watermark[2]:
+                counters.skipped += 1
+                continue
 
-        # Last element has to be saved no matter what it is
-        if i == len(activities) - 1:
-            ins_res = insert_activity(a_ins["game_id"], a_ins["datetime"], a_ins["playtime"], options["save_thres"], cursor)
-            if ins_res == 1:
-                uthres_counter += act_event_counter
-            elif ins_res == 2:
-                dup_counter += act_event_counter
+            yield bucket, result, parse_event_timestamp(event["timestamp"]), float(event["duration"])
 
-            act_event_counter = 0
 
-    if uthres_counter > 0:
-        print("WARNING: " + str(uthres_counter) + " out of " + str(len(activities)) + " events have been discarded for being low time activities...")
+# Add the new events to the sessions, skipping the ones already ingested according to the watermarks
+def add_new_events(sessions, new_events, watermarks):
+    sessionize_time = 0.0
 
-    if dup_counter > 0:
-        print("WARNING: " + str(dup_counter) + " out of " + str(len(activities)) + " events have been discarded for being duplicates...")
+    for bucket, result, event_dt, playtime in new_events:
+        start = event_dt.timestamp()
+        watermark = watermarks.get((bucket, result))
 
-    # When everything goes well, commit the changes
-    connection.commit()
+        new_dt = event_dt
+        new_playtime = playtime
+        if watermark is not None and start <= watermark[0]:
+            # The latest event could have grown since the last ingest: only its new part is added
+            if start < watermark[0] or playtime <= watermark[1]:
+                sessions.skipped += 1
+                continue
+
+            new_dt = event_dt + timedelta(seconds=watermark[1])
+            new_playtime = playtime - watermark[1]
+
+        add_start = time.perf_counter()
+        sessions.add(result, new_dt, new_playtime)
+        sessionize_time += time.perf_counter() - add_start
 
+        sessions.update_watermark(bucket, result, start, playtime)
 
-# Inserts an activity, pre-elaborated from the bucket, inside the table
-def insert_activity(gid, dt, playtime, save_threshold, cursor):
+    sessions.sessionize_time += sessionize_time
 
-    playtime = round(playtime, 3)
 
-    # Playtime should be above a certain threshold
-    # In this way, meaningless events are avoided and not taken into account for the counts
-    if playtime <= save_threshold:
+# Read the window-watcher events directly from the SQLite datastore of an ActivityWatch server
+# The datastore is opened read-only and, for each bucket, only the events following the last ingest are retrieved.
+# The position reached inside each bucket is stored as a watermark not related to any game (game_id 0)
+def read_bucket_datastore(file_name, game_index, options, connection, cursor):
+    ingest_state = load_ingest_state(cursor)
+    lower_bounds = {}
+    for (bucket_id, gid), watermark in ingest_state[0].items():
+        if gid == 0:
+            lower_bounds[bucket_id] = watermark[0]
+
+    try:
+        datastore = sqlite3.connect(pathlib.Path(file_name).absolute().as_uri() + "?mode=ro", uri=True)
+        file_stats = track_file(file_name, "datastore", os.path.getsize(file_name))
+    except (sqlite3.Error, OSError):
+        print("ERROR: file " + file_name + " couldn't be opened/read!")
         return 1
 
-    # Verify that the data doesn't exist
-    search_query = """ SELECT COUNT(*)
-                       FROM Activity
-                       WHERE game_id = ? AND date = ? """
-    
-    search_data = (gid, dt)
-    cursor.execute(search_query, search_data)
-    if cursor.fetchone()[0] == 1:
-        return 2
-    
-    i_data = (gid, dt, playtime)
-    i_query = """ INSERT INTO Activity (game_id, date, playtime)
-                  VALUES (?, ?, ?) """
+    print("Reading: " + file_name)
+    try:
+        reader = DatastoreReader(datastore, lower_bounds)
+        sessions = parse_bucket_events(reader.events(), game_index, options, ingest_state)
 
-    cursor.execute(i_query, i_data)
-    return 0
+        for bucket_id, mark in reader.bucket_marks.items():
+            sessions.update_watermark(bucket_id, 0, mark, 0.0)
 
+    except sqlite3.Error as se:
+        print("ERROR: the ActivityWatch datastore could not be read due to: " + str(se))
+        file_stats.status = "error"
+        return 1
 
-# Check if the event is related to a game
-# Returns 0 if not relevant, otherwise returns the game id
-def is_event_relevant(event_name, game_list):
-    event_name = event_name.strip().lower()
-    if event_name == "":
-        return 0
+    except KeyError:
+        print("ERROR: the indicated file is not an ActivityWatch datastore! Aborting file processing...")
+        file_stats.status = "error"
+        return 1
+
+    finally:
+        datastore.close()
+
+    begin_transaction(connection)
+    res = store_bucket_sessions(sessions, options, connection, cursor, file_stats)
+    end_transaction(res, connection)
+    return res
+
+
+# Pull the window-watcher events from an aw-server compatible REST API
+# As for the datastore, only the events following the position reached by the last ingest are requested
+def read_bucket_server(server_options, game_index, options, connection, cursor):
+    ingest_state = load_ingest_state(cursor)
+    lower_bounds = {}
+    for (bucket_id, gid), watermark in ingest_state[0].items():
+        if gid == 0:
+            lower_bounds[bucket_id] = watermark[0]
+
+    print("Reading: " + server_options["url"])
+    file_stats = track_file(server_options["url"], "server")
+    file_stats.status = "error"
+    try:
+        reader = ServerReader(server_options["url"], lower_bounds, server_options["page_limit"])
+        sessions = parse_bucket_events(reader.events(), game_index, options, ingest_state)
+        file_stats.bytes = reader.bytes_read
+
+        for bucket_id, mark in reader.bucket_marks.items():
+            sessions.update_watermark(bucket_id, 0, mark, 0.0)
+
+    except (OSError, HTTPException) as he:
+        print("ERROR: the ActivityWatch server could not be reached due to: " + str(he))
+        return 1
+
+    except JSONDecodeError as je:
+        print("ERROR: the response of the ActivityWatch server could not be decoded due to: " + str(je))
+        return 1
+
+    except (ValueError, KeyError, TypeError) as ve:
+        print("ERROR: unexpected data received from the ActivityWatch server: " + str(ve))
+        return 1
+
+    file_stats.status = "ok"
+    begin_transaction(connection)
+    res = store_bucket_sessions(sessions, options, connection, cursor, file_stats)
+    end_transaction(res, connection)
+    return res
+
+
+# Index of the executable names and of the aliases of the stored games
+def load_game_index(cursor):
+
+    s_query = "SELECT id, executable_name FROM Game"
+    cursor.execute(s_query)
+    games = cursor.fetchall()
+
+    s_query = "SELECT game_id, kind, pattern FROM GameAlias ORDER BY id"
+    cursor.execute(s_query)
+    return GameIndex(games, cursor.fetchall())
+
+
+# Forget the position reached inside the datastore buckets
+# Needed when new games are added, since their past events were not relevant during the previous ingests
+def reset_datastore_marks(cursor):
+
+    rm_query = """ DELETE FROM IngestWatermark
+                   WHERE game_id = 0 """
+
+    cursor.execute(rm_query)
+
+
+# Remove the bucket files from the ingest manifest, so that the next scan reads them again
+# Needed when new games are added, since their events were not relevant while the files were read.
+# The watermarks of the games already known keep their events from being stored twice
+def invalidate_bucket_files(cursor):
+
+    rm_query = """ DELETE FROM IngestManifest
+                   WHERE kind = 'bucket' """
+
+    cursor.execute(rm_query)
+
+
+# Store the sessions, keeping track of the events discarded with them
+def store_bucket_sessions(sessions, options, connection, cursor, file_stats=None):
+    write_start = time.perf_counter()
+    writer = ActivityWriter(options["save_thres"], cursor, options["timezone"])
+    for gid, session_dt, playtime, session_events, seed in sessions.iter_sessions():
+        if seed is None:
+            writer.add(gid, session_dt, playtime, session_events)
+        else:
+            writer.extend(gid, seed, session_dt, playtime, session_events)
+
+    writer.flush()
+    save_ingest_state(sessions, cursor)
+
+    if file_stats is not None:
+        file_stats.events_seen = sessions.seen
+        file_stats.events_matched = sessions.events + sessions.skipped
+        file_stats.events_skipped = sessions.skipped
+        file_stats.sessions = writer.stored
+        file_stats.below_threshold = writer.uthres_counter
+        file_stats.duplicates = writer.dup_counter
+        file_stats.parse_time = sessions.parse_time
+        file_stats.sessionize_time = sessions.sessionize_time
+        file_stats.write_time = time.perf_counter() - write_start
+
+    if sessions.skipped > 0:
+        print(str(sessions.skipped) + " events have been skipped since they were already ingested.")
+
+    if writer.uthres_counter > 0:
+        print("WARNING: " + str(writer.uthres_counter) + " out of " + str(sessions.events) + " events have been discarded for being low time activities...")
 
-    for game in game_list:
-        if event_name == game[1]:
-            return game[0]
+    if writer.dup_counter > 0:
+        print("WARNING: " + str(writer.dup_counter) + " out of " + str(sessions.events) + " events have been discarded for being duplicates...")
 
     return 0
 
 
+# Retrieve the watermarks of the buckets and the last session of each game
+# Watermarks are returned as (bucket_id, game_id) -> (start, duration, text_cutoff), where the cutoff is the
+# local time, formatted as the timestamps of the events, before which an event is surely older than the watermark
+def load_ingest_state(cursor):
+    watermarks = {}
+    open_sessions = {}
+
+    w_query = """ SELECT bucket_id, game_id, last_event, last_duration
+                  FROM IngestWatermark """
+
+    o_query = """ SELECT game_id, session_date, session_end, playtime, events
+                  FROM OpenSession """
+
+    cursor.execute(w_query)
+    for bucket_id, gid, last_event, last_duration in cursor.fetchall():
+        cutoff = datetime.fromtimestamp(last_event - MAX_UTC_OFFSET, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        watermarks[(bucket_id, gid)] = (last_event, last_duration, cutoff)
+
+    cursor.execute(o_query)
+    for gid, session_date, session_end, playtime, events in cursor.fetchall():
+        open_sessions[gid] = (datetime.fromisoformat(session_date), session_end, playtime, events)
+
+    return watermarks, open_sessions
+
+
+# Store the watermarks reached and the last session of each game, keeping the most recent values
+def save_ingest_state(sessions, cursor):
+
+    w_query = """ INSERT INTO IngestWatermark (bucket_id, game_id, last_event, last_duration)
+                  VALUES (?, ?, ?, ?)
+                  ON CONFLICT(bucket_id, game_id) DO UPDATE SET last_event = excluded.last_event,
+                                                                last_duration = excluded.last_duration
+                  WHERE excluded.last_event > IngestWatermark.last_event OR
+                        (excluded.last_event == IngestWatermark.last_event AND excluded.last_duration > IngestWatermark.last_duration) """
+
+    o_query = """ INSERT INTO OpenSession (game_id, session_date, session_start, session_end, playtime, events)
+                  VALUES (?, ?, ?, ?, ?, ?)
+                  ON CONFLICT(game_id) DO UPDATE SET session_date = excluded.session_date,
+                                                     session_start = excluded.session_start,
+                                                     session_end = excluded.session_end,
+                                                     playtime = excluded.playtime,
+                                                     events = excluded.events
+                  WHERE excluded.session_start >= OpenSession.session_start """
+
+    w_data = []
+    for (bucket_id, gid), (start, duration) in sessions.watermarks.items():
+        w_data.append((bucket_id, gid, start, duration))
+
+    o_data = []
+    for gid, (session_dt, session_end, playtime, events) in sessions.last_sessions().items():
+        o_data.append((gid, session_dt.isoformat(" "), session_dt.timestamp(), session_end, playtime, events))
+
+    cursor.executemany(w_query, w_data)
+    cursor.executemany(o_query, o_data)
+
+
+# Parse and sessionize bucket files in a pool of processes, storing their sessions from the current one
+# Only this process writes to the database, so the workers never compete for the SQLite lock. Workers group the events
+# against the watermarks reached before the pool started, without the last stored sessions: their sessions are joined
+# here to the ones stored by the previous files, so that sessions continuing across files merge.
+# A file is read again here, against the current ingest state, when a previous file moved the watermark of one of
+# its buckets past the events it added, since some of them could then be already stored.
+# Returns the amount of files skipped thanks to the ingest manifest
+def read_bucket_files_parallel(file_list, game_index, bucket_options, jobs, connection, cursor, use_manifest=False):
+    skip_counter = 0
+    to_parse = []
+    queued = {}        # hash -> entries of the files sharing the content of a file already queued
+
+    for file_name in file_list:
+        entry = None
+
+        if use_manifest:
+            try:
+                entry = check_manifest(file_name, "bucket", connection, cursor)
+            except OSError:
+                print("ERROR: file " + file_name + " couldn't be opened/read!")
+                continue
+
+            if entry is None:
+                skip_counter += 1
+                continue
+
+            # Copies of the same content are parsed only once
+            if entry[4] in queued:
+                queued[entry[4]].append(entry)
+                skip_counter += 1
+                continue
+
+            queued[entry[4]] = []
+
+        to_parse.append((file_name, entry))
+
+    if not to_parse:
+        return skip_counter
+
+    watermarks = load_ingest_state(cursor)[0]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_bucket_worker, initargs=(game_index, bucket_options, watermarks)) as executor:
+        futures = [executor.submit(parse_bucket_file, file_name) for file_name, entry in to_parse]
+
+        # Results are stored in the order of the files, to keep the output readable
+        for i in range(len(to_parse)):
+            file_name, entry = to_parse[i]
+            opened, file_sessions, err = futures[i].result()
+
+            if opened:
+                print("Reading: " + file_name)
+                file_stats = track_file(file_name, "bucket", entry[2] if entry is not None else os.path.getsize(file_name))
+
+            if err is not None:
+                print(err)
+                if opened:
+                    file_stats.status = "error"
+                continue
+
+            begin_transaction(connection)
+            ingest_state = load_ingest_state(cursor)
+
+            if is_sessionized_stale(file_sessions, watermarks, ingest_state[0]):
+                try:
+                    with open_bucket_file(file_name) as input_file:
+                        sessions, err = parse_bucket_data_json(input_file, game_index, bucket_options, ingest_state)
+                except OSError:
+                    sessions, err = None, "ERROR: file " + file_name + " couldn't be opened/read!"
+
+            else:
+                sessions = Sessionizer(timedelta(seconds=bucket_options["diff_thres"]), ingest_state[1])
+                merge_start = time.perf_counter()
+                sessions.merge(file_sessions)
+                sessions.sessionize_time += time.perf_counter() - merge_start
+
+            if err is not None:
+                print(err)
+                file_stats.status = "error"
+                res = 1
+            else:
+                res = store_bucket_sessions(sessions, bucket_options, connection, cursor, file_stats)
+
+            if entry is not None and res == 0:
+                record_manifest(entry, connection, cursor)
+                for copy_entry in queued[entry[4]]:
+                    record_manifest(copy_entry, connection, cursor)
+
+            end_transaction(res, connection)
+
+    return skip_counter
+
+
+# Check if the sessions of a worker could contain events stored after the worker started
+# Watermarks only grow: the file is stale when, for one of its buckets and games, the current watermark
+# differs from the one the worker used and reaches the earliest event the worker added
+def is_sessionized_stale(file_sessions, used_watermarks, current_watermarks):
+    for key in file_sessions.earliest:
+        current = current_watermarks.get(key)
+        if current is None:
+            continue
+
+        used = used_watermarks.get(key)
+        if used is not None and used[:2] == current[:2]:
+            continue
+
+        if current[0] >= file_sessions.earliest[key]:
+            return True
+
+    return False
+
+
+# Worker state, assigned once for each process of the pool
+# The watermarks are the ones reached before the pool started
+_worker_game_index = None
+_worker_options = None
+_worker_watermarks = None
+
+
+# Initialization of the processes parsing the buckets
+def init_bucket_worker(game_index, bucket_options, watermarks):
+    global _worker_game_index, _worker_options, _worker_watermarks
+
+    _worker_game_index = game_index
+    _worker_options = bucket_options
+    _worker_watermarks = watermarks
+
+
+# Parse a bucket file inside a worker process
+# Returns the sessions of the new relevant events found, to be joined to the stored ones by the main process
+def parse_bucket_file(file_name):
+    try:
+        input_file = open_bucket_file(file_name)
+    except OSError:
+        return False, None, "ERROR: file " + file_name + " couldn't be opened/read!"
+
+    with input_file:
+        sessions, err = parse_bucket_data_json(input_file, _worker_game_index, _worker_options, (_worker_watermarks, None))
+
+    return True, sessions, err
+
+
+# Buffers the activities, pre-elaborated from the bucket, and inserts them inside the table in batches
+# Activities already stored are skipped by the conflict clause and their events are counted as duplicates
+class ActivityWriter:
+
+    def __init__(self, save_threshold, cursor, timezone=None, batch_size=utils.ACTIVITY_BATCH_SIZE):
+        self.save_threshold = save_threshold
+        self.cursor = cursor
+        self.timezone = timezone     # Timezone of the local days, None for the one of the system
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_events = []
+        self.days = set()        # Days of the games touched by the batch: (game_id, local_day)
+        self.uthres_counter = 0
+        self.dup_counter = 0
+        self.stored = 0          # Activities inserted or updated
+
+    # Add a session to the batch, flushing it once full
+    def add(self, gid, dt, playtime, event_counter):
+        playtime = round(playtime, 3)
+
+        # Playtime should be above a certain threshold
+        # In this way, meaningless events are avoided and not taken into account for the counts
+        if playtime <= self.save_threshold:
+            self.uthres_counter += event_counter
+            return
+
+        # Dates are stored in the same text form produced by the sqlite3 datetime adapter
+        activity = (gid, dt.isoformat(" "), playtime) + self.day_keys(dt)
+        self.pending.append(activity)
+        self.pending_events.append(event_counter)
+        self.days.add((gid, activity[4]))
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    # Update a stored session that has been extended by new events
+    # The seed describes the session as it was stored: (start_datetime, playtime, number_of_events)
+    def extend(self, gid, seed, dt, playtime, event_counter):
+        seed_dt, seed_playtime, seed_events = seed
+        seed_playtime = round(seed_playtime, 3)
+        playtime = round(playtime, 3)
+        event_counter -= seed_events
+
+        if dt == seed_dt and playtime == seed_playtime:
+            return
+
+        # The session was not stored for being a low time activity
+        if seed_playtime <= self.save_threshold:
+            self.add(gid, dt, playtime, event_counter)
+            return
+
+        u_query = """ UPDATE OR IGNORE Activity
+                      SET date = ?, playtime = ?, start_time = ?, local_day = ?
+                      WHERE game_id = ? AND date = ? AND playtime <= ? """
+
+        day_keys = self.day_keys(dt)
+        u_data = (dt.isoformat(" "), playtime) + day_keys + (gid, seed_dt.isoformat(" "), playtime)
+        self.cursor.execute(u_query, u_data)
+        if self.cursor.rowcount < 1:
+            self.dup_counter += event_counter
+        else:
+            self.stored += 1
+
+            # The session could have been moved to another day
+            self.days.add((gid, day_keys[1]))
+            self.days.add((gid, self.day_keys(seed_dt)[1]))
+
+    # Epoch of the start of the session and local day it belongs to, used by the date filters of the queries
+    def day_keys(self, dt):
+        return (dt.timestamp(), dt.astimezone(self.timezone).date().isoformat())
+
+    # Insert the pending activities and update the daily playtime of the days touched by the batch
+    def flush(self):
+        if self.pending:
+            self.insert_pending()
+
+        if self.days:
+            self.update_daily_playtime()
+
+    # Insert the pending activities
+    def insert_pending(self):
+        rowid_query = "SELECT IFNULL(MAX(rowid), 0) FROM Activity"
+        i_query = """ INSERT INTO Activity (game_id, date, playtime, start_time, local_day)
+                      VALUES (?, ?, ?, ?, ?)
+                      ON CONFLICT(game_id, date) DO NOTHING """
+
+        self.cursor.execute(rowid_query)
+        last_rowid = self.cursor.fetchone()[0]
+        self.cursor.executemany(i_query, self.pending)
+        self.stored += self.cursor.rowcount
+
+        # Some rows were not inserted: the new rows are the ones placed after the previous last row,
+        # every other activity of the batch was already stored, or repeated an earlier one of the same batch
+        if self.cursor.rowcount < len(self.pending):
+            s_query = """ SELECT game_id, date
+                          FROM Activity
+                          WHERE rowid > ? """
+
+            self.cursor.execute(s_query, (last_rowid, ))
+            inserted = set(self.cursor.fetchall())
+
+            for i in range(len(self.pending)):
+                if self.pending[i][:2] in inserted:
+                    inserted.remove(self.pending[i][:2])
+                else:
+                    self.dup_counter += self.pending_events[i]
+
+        self.pending = []
+        self.pending_events = []
+
+    # Compute again the playtime of the days touched by the batch, from the activities stored for them
+    # Each day is read through the ActivityLocalDay index, so the cost depends on the sessions of that day only
+    def update_daily_playtime(self):
+        u_query = """ INSERT INTO DailyPlaytime (game_id, day, seconds, sessions)
+                      SELECT game_id, local_day, SUM(playtime), COUNT(*)
+                      FROM Activity
+                      WHERE local_day = ? AND game_id = ?
+                      GROUP BY game_id, local_day
+                      ON CONFLICT(game_id, day) DO UPDATE SET seconds = excluded.seconds, sessions = excluded.sessions """
+
+        # Days left without activities, after their sessions have been moved to another day
+        rm_query = """ DELETE FROM DailyPlaytime
+                       WHERE day = ? AND game_id = ? AND
+                             NOT EXISTS (SELECT 1 FROM Activity WHERE local_day = ? AND game_id = ?) """
+
+        days = [(day, gid) for gid, day in self.days]
+        self.cursor.executemany(u_query, days)
+        self.cursor.executemany(rm_query, [day + day for day in days])
+        if days:
+            bump_generation(self.cursor)
+
+        self.days = set()
+
+
+# Check if the event is related to a game
+# Returns 0 if not relevant, otherwise returns the game id
+def is_event_relevant(event_name, game_index):
+    return game_index.lookup(event_name)
+
+
 # Function that performs checks before creating template files
 def create_template_file(parsed_args):
     err = None
@@ -547,12 +1117,13 @@ def create_bucket_template(file_name):
 
 
 # Preparation layer for the SCAN mode
-def scan_data(paths, bucket_options, connection, cursor):
+def scan_data(paths, bucket_options, connection, cursor, jobs=1, server_options=None):
     err = None
     pargs = {}
+    server_url = server_options["url"] if server_options is not None else None
 
     # No path indicated
-    if paths[0] is None and paths[1] is None:
+    if paths[0] is None and paths[1] is None and server_url is None:
         print("The configuration file does not specify any path. The operation will be terminated.")
         return
 
@@ -562,6 +1133,7 @@ def scan_data(paths, bucket_options, connection, cursor):
         pargs["insert_filepath"] = paths[0]
         pargs["insert_choice"] = "game"
         pargs["header_flag"] = 0
+        pargs["manifest_flag"] = True
         err = insert_from_file(pargs, None, connection, cursor)
         if err:
             return err
@@ -573,8 +1145,22 @@ def scan_data(paths, bucket_options, connection, cursor):
         pargs = {}
         pargs["insert_filepath"] = paths[1]
         pargs["insert_choice"] = "bucket"
+        pargs["manifest_flag"] = True
+        pargs["jobs"] = jobs
         print("Scanning bucket folder: " + paths[1])
         err = insert_from_file(pargs, bucket_options, connection, cursor)
+        if err:
+            return err
+
+    # Pull buckets from the ActivityWatch server
+    if server_url is not None and server_url.strip() != "":
+        games = load_game_index(cursor)
+        if not games:
+            return "ERROR: no game has been found! Buckets will not be processed..."
+
+        print("Scanning ActivityWatch server: " + server_url)
+        read_bucket_server(server_options, games, bucket_options, connection, cursor)
+        print("Insertion complete!")
 
     return err
 
@@ -589,12 +1175,29 @@ def remove_data(gid, connection, cursor):
     
     remove_hf_query = """DELETE FROM HasFlag
                          WHERE game_id = ? """
+
+    remove_wm_query = """DELETE FROM IngestWatermark
+                         WHERE game_id = ? """
+
+    remove_os_query = """DELETE FROM OpenSession
+                         WHERE game_id = ? """
+
+    remove_alias_query = """DELETE FROM GameAlias
+                            WHERE game_id = ? """
+
+    remove_daily_query = """DELETE FROM DailyPlaytime
+                            WHERE game_id = ? """
     
     remove_game_query = """ DELETE FROM Game
                             WHERE id = ? """
     
     cursor.execute(remove_act_query, rm_data)
     cursor.execute(remove_hf_query, rm_data)
+    cursor.execute(remove_wm_query, rm_data)
+    cursor.execute(remove_os_query, rm_data)
+    cursor.execute(remove_alias_query, rm_data)
+    cursor.execute(remove_daily_query, rm_data)
     cursor.execute(remove_game_query, rm_data)
+    invalidate_filters(cursor)
     connection.commit()
     return
\ No newline at end of file
@@ -1,73 +1,62 @@
 from datetime import datetime
-from gtrack import utils
+from gtrack.cache_manager import fetch_rows
+from gtrack.filter_manager import filter_condition, filter_games, load_filter_games
+from gtrack.query_manager import QueryBuilder
 import plotly.graph_objects as go
 
-def plot_data(parsed_args, plot_options, connection, cursor):
+def plot_data(parsed_args, plot_options, storage_options, connection, cursor):
     plot_type = parsed_args["plot_choice"]
     plot_color = parsed_args["color_filter_plot"]
-    plot_query = ""
-    plot_query_args = ""
+    plot_query = QueryBuilder()
     color_data = None
+    filter_query = None
+
+    # Games selected by the filter expression
+    if parsed_args["filter_plot"]:
+        filter_query = filter_condition(parsed_args["filter_plot"])
 
     # Create the query for the different plots
     if plot_type == "pot":
-        plot_query = """SELECT Game.id, Game.display_name, SUM(Activity.playtime) as playtime
-                        FROM Game, Activity
-                        WHERE Game.id == Activity.game_id """
+        plot_query.select("Game.id").select("Game.display_name").select("SUM(DailyPlaytime.seconds) as playtime")
+        plot_query.source("Game, DailyPlaytime")
+        plot_query.where("Game.id == DailyPlaytime.game_id")
     
-        date_filter_query, plot_query_args = plot_date_filtering(parsed_args)
-        plot_query += date_filter_query
-        plot_query += "GROUP BY Game.id "
-        plot_query = plot_flag_filtering(parsed_args, plot_query)
+        plot_date_filtering(parsed_args, plot_query)
+        plot_query.group_by("Game.id")
+        plot_query = plot_flag_filtering(parsed_args, plot_query, filter_query)
 
         # Ascendent order since the plot places the first item at the bottom
-        plot_query += "ORDER BY playtime ASC "  
+        plot_query.order_by("playtime ASC")
 
         # Recover the IDs of the games that needs to be highlighted due to the chosen flag
         if plot_color:
-            plot_color_query = """SELECT Game.id 
-                                  FROM Game
-                                  WHERE """ + utils.filter_recursive(plot_color[0]) + """
-                                  GROUP BY Game.id """
+            color_data = [(gid, ) for gid in filter_games(plot_color, connection, cursor)]
 
     elif plot_type == "mhot":
-        plot_query = """WITH RECURSIVE dates(date) AS (
-                            VALUES(?)
-                            UNION ALL
-                            SELECT date(date, '+1 day')
-                            FROM dates
-                            WHERE date < ?
-                        ) """
+        plot_query.with_table("dates(date)", """VALUES(?)
+                                                UNION ALL
+                                                SELECT date(date, '+1 day')
+                                                FROM dates
+                                                WHERE date < ?""", plot_period_filtering(parsed_args, connection, cursor), recursive=True)
         
-        if parsed_args["filter_plot"]:
-            filter_plot = parsed_args["filter_plot"]
-            plot_subquery = """SELECT Activity.game_id, Activity.date, Activity.playtime
-                               FROM Activity INNER JOIN (SELECT Game.id
-                                                         FROM Game
-                                                         WHERE """ + utils.filter_recursive(filter_plot[0]) + ") AS SUB ON Activity.game_id == SUB.id "
-            
-
-            plot_query += "SELECT dates.date, IFNULL(SUM(ACT_SUB.playtime), 0) "
-            plot_query += "FROM dates LEFT JOIN (" + plot_subquery + ") AS ACT_SUB ON (dates.date == strftime('%Y-%m-%d', ACT_SUB.date)) "
-            plot_query += "GROUP BY dates.date "
+        if filter_query:
+            plot_subquery = QueryBuilder()
+            plot_subquery.select("DailyPlaytime.game_id").select("DailyPlaytime.day").select("DailyPlaytime.seconds")
+            plot_subquery.source("DailyPlaytime")
+            plot_subquery.source_query(QueryBuilder().select("Game.id").source("Game").where(*filter_query), "SUB", join="INNER JOIN", on="DailyPlaytime.game_id == SUB.id")
 
-        else:
-            plot_query += """SELECT dates.date, IFNULL(SUM(Activity.playtime), 0) 
-                             FROM dates LEFT JOIN Activity ON (dates.date == strftime('%Y-%m-%d', Activity.date))
-                             GROUP BY dates.date """
-        
-        plot_query_args = plot_period_filtering(parsed_args, connection, cursor)
+            plot_query.select("dates.date").select("IFNULL(SUM(ACT_SUB.seconds), 0)")
+            plot_query.source("dates").source_query(plot_subquery, "ACT_SUB", join="LEFT JOIN", on="(dates.date == ACT_SUB.day)")
+            plot_query.group_by("dates.date")
 
-    # Execute the query
-    if plot_query_args: 
-        cursor.execute(plot_query, plot_query_args)
-    else:
-        cursor.execute(plot_query)
+        else:
+            plot_query.select("dates.date").select("IFNULL(SUM(DailyPlaytime.seconds), 0)")
+            plot_query.source("dates LEFT JOIN DailyPlaytime ON (dates.date == DailyPlaytime.day)")
+            plot_query.group_by("dates.date")
 
-    data = cursor.fetchall()
-    if plot_color:
-        cursor.execute(plot_color_query)
-        color_data = cursor.fetchall()
+    # Execute the query, unless its result is cached since the data did not change
+    query, query_args = plot_query.build()
+    data = fetch_rows(query, query_args, storage_options["query_cache_size"], connection, cursor, prepare=lambda: load_filter_games(connection, cursor))
 
     # Plot the retrieved data
     if plot_type == "pot":
@@ -78,29 +67,24 @@ def plot_data(parsed_args, plot_options, connection, cursor):
 
 # Manages dates filter and flag usage
 # Structure similar to that used within the print methods
-def plot_date_filtering(args):
+def plot_date_filtering(args, query):
     flag_total = args["plot_total"]
     dates = args["date_plot_default"]
-    date_filter_query = ""
 
     # If total is requested, date filter is not needed 
     if not flag_total:
-        date_filter_query += "AND date(Activity.date, 'localtime') >= ? "
-
         # Date can also be unspecified
         if dates:
-            if len(dates) == 2:
-                date_filter_query += "AND date(Activity.date, 'localtime') <= ? "
-                query_args = (dates[0], dates[1],)
+            query.where("DailyPlaytime.day >= ?", (dates[0], ))
 
-            else:
-                query_args = (dates[0],)
+            if len(dates) == 2:
+                query.where("DailyPlaytime.day <= ?", (dates[1], ))
 
         else:
             start_year = datetime.strftime(datetime(datetime.now().year, 1, 1), "%Y-%m-%d")
-            query_args = (start_year,)
+            query.where("DailyPlaytime.day >= ?", (start_year, ))
 
-    return [date_filter_query, query_args]
+    return query
 
 
 # Manages date filter when two dates are required 
@@ -120,8 +104,9 @@ def plot_period_filtering(args, connection, cursor):
     
     else: 
         # Need to recover the information about the overall stored period of time
-        period_query = """SELECT MIN(strftime('%Y-%m-%d', Activity.date)) as start_date, MAX(strftime('%Y-%m-%d', Activity.date)) as end_date
-                          FROM Activity """
+        # Two separate subqueries allow both the MIN and the MAX to be read from the DailyPlaytimeDay index
+        period_query = """SELECT (SELECT MIN(DailyPlaytime.day) FROM DailyPlaytime) as start_date,
+                                 (SELECT MAX(DailyPlaytime.day) FROM DailyPlaytime) as end_date """
         
         cursor.execute(period_query)
         dates = cursor.fetchall()
@@ -131,17 +116,15 @@ def plot_period_filtering(args, connection, cursor):
 
 
 # Manages flag filtering to restric plot to specific games
-def plot_flag_filtering(args, query):
+def plot_flag_filtering(args, query, filter_query_flags):
     filter_flag = args["filter_plot"]
-    filter_query = ""
 
     if filter_flag:
-        filter_query = """SELECT Game.id, Game.display_name, SUB.playtime 
-                          FROM Game INNER JOIN (""" + query + """) as SUB ON Game.id == SUB.id 
-                                    INNER JOIN HasFlag ON Game.id == HasFlag.game_id """
-
-        filter_query += "WHERE " + utils.filter_recursive(filter_flag[0]) + " "
-        filter_query += "GROUP BY Game.id "
+        filter_query = QueryBuilder()
+        filter_query.select("Game.id").select("Game.display_name").select("SUB.playtime")
+        filter_query.source("Game").source_query(query, "SUB", join="INNER JOIN", on="Game.id == SUB.id")
+        filter_query.where(*filter_query_flags)
+        filter_query.group_by("Game.id")
         query = filter_query
 
     return query
@@ -1,10 +1,16 @@
+import itertools
+import sys
 from datetime import datetime
 from tabulate import tabulate
 from gtrack import utils
+from gtrack.cache_manager import iter_rows
+from gtrack.filter_manager import filter_condition, load_filter_games
+from gtrack.query_manager import QueryBuilder
+from gtrack.table_manager import TableWriter
 
 
 # Interpretation layer for the PRINT mode
-def print_data(parsed_args, connection, cursor):
+def print_data(parsed_args, storage_options, connection, cursor):
     mean_days = None
     flag_list = []
     group_dates = parsed_args["print_daily"] or parsed_args["print_monthly"]
@@ -33,18 +39,22 @@ def print_data(parsed_args, connection, cursor):
         for row in rows:
             flag_list += [row[0]]
 
-    query, args, headers = print_query_definition(args=parsed_args, flist=flag_list)
-    if args:
-        cursor.execute(query, args)
-    else:
-        cursor.execute(query)
+    # Games selected by the filter expression
+    filter_query = None
+    if parsed_args["filter_print"]:
+        filter_query = filter_condition(parsed_args["filter_print"])
 
-    info = cursor.fetchall()
-    print_data_cli(headers=headers, rows=info, flag_verbose=parsed_args["print_verbose"], mean_days=mean_days, group_dates=group_dates)
+    # Results are read from the cache when the data did not change since the same query was executed,
+    # otherwise from the cursor in batches, printing them while they are read
+    query, args, headers = print_query_definition(args=parsed_args, flist=flag_list, filter_query=filter_query)
+    info = iter_rows(query, args, storage_options["query_cache_size"], connection, cursor, prepare=lambda: load_filter_games(connection, cursor))
+    rows = print_rows_format(info, flag_verbose=parsed_args["print_verbose"], mean_days=mean_days, group_dates=group_dates)
+    print_data_cli(headers=headers, rows=rows, page_size=parsed_args["print_page"], connection=connection)
 
 
 # Query defintion for recovering data from the DB
-def print_query_definition(args, flist):
+# Queries are composed through the QueryBuilder, binding every value requested as an argument
+def print_query_definition(args, flist, filter_query=None):
     flag_verbose = args["print_verbose"]
     flag_daily = args["print_daily"]
     flag_mean = args["print_mean"]
@@ -57,82 +67,66 @@ def print_query_definition(args, flist):
     gname = args["name_print"]
     order = args["print_sort"]
 
-    temp_conditions = ""
-    print_query = ""
-    print_subquery = ""
-    print_filters_sub = ""
-    query_args = None
+    print_query = QueryBuilder()
+    print_subquery = None
+    print_date = ""
     headers = ["game_id", "game_name"]
 
     ### SELECT ###
-    print_query += "SELECT Game.id, Game.display_name, "
+    print_query.select("Game.id").select("Game.display_name")
 
     # If daily is selected, the day has to be printed
     if flag_daily:
-        print_query += "strftime('%Y-%m-%d', Activity.date) as rel_day, "
+        print_query.select("DailyPlaytime.day as rel_day")
         headers += ["day"]
     # If monthly is selected, the month has to be printed
     elif flag_monthly:
-        print_query += "strftime('%Y-%m', Activity.date) as rel_month, "
+        print_query.select("substr(DailyPlaytime.day, 1, 7) as rel_month")
         headers += ["month"]
 
     # When the order selected is first or last played, add the MIN or MAX values for the date only when the query 
     # acts as a subquery. Otherwise, use the formulas inside the ORDER BY clause. This assures to avoid unwanted data as part of the output.
     if filter_flag:
         if order == "first_played":
-            print_query += "MIN(strftime('%Y-%m-%d', Activity.date)) as first_played, "
+            print_query.select("MIN(DailyPlaytime.day) as first_played")
         elif order == "last_played":
-            print_query += "MAX(strftime('%Y-%m-%d', Activity.date)) as last_played, "
+            print_query.select("MAX(DailyPlaytime.day) as last_played")
 
-    print_query += "SUM(Activity.playtime) as total_playtime "
+    print_query.select("SUM(DailyPlaytime.seconds) as total_playtime")
     headers += ["playtime (HH:MM:SS)"]
 
     ### FROM ###
-    print_query += "FROM Game, Activity "
+    # Playtime is read from the daily rollup, whose size depends on the days played instead of the sessions
+    print_query.source("Game, DailyPlaytime")
 
     ### WHERE ###
-    print_query += "WHERE Game.id == Activity.game_id "
+    print_query.where("Game.id == DailyPlaytime.game_id")
 
     # If total is requested, date filter is not needed
+    # Days are compared with the ones of the DailyPlaytime rollup, allowing a range scan of the DailyPlaytimeDay index
     if not flag_total:
-        print_query += "AND date(Activity.date, 'localtime') >= ? "
-
         # Date can also be unspecified
         if dates:
-            if len(dates) == 2:
-                print_query += "AND date(Activity.date, 'localtime') <= ? "
-                query_args = (dates[0], dates[1],)
+            print_query.where("DailyPlaytime.day >= ?", (dates[0], ))
 
-            else:
-                query_args = (dates[0],)
+            if len(dates) == 2:
+                print_query.where("DailyPlaytime.day <= ?", (dates[1], ))
 
         else:
             start_year = datetime.strftime(datetime(datetime.now().year, 1, 1), "%Y-%m-%d")
-            query_args = (start_year,)
+            print_query.where("DailyPlaytime.day >= ?", (start_year, ))
 
     # If verbose is selected, GID and GNAME have to be managed on the join
     if not flag_verbose:
-        # Manage game IDs
-        if gids:
-            for i in range(len(gids)):
-                temp_conditions += "Game.id == " + str(gids[i]) + " "
-
-                if i < len(gids) - 1:
-                    temp_conditions += "OR "
-
-            print_query += "AND (" + temp_conditions + ") "
-
-        # Manage game name search
-        if gname:
-            print_query += "AND Game.display_name LIKE '%" + gname + "%' "
+        print_game_filtering(print_query, gids, gname)
 
     # GROUP BY ###
-    print_query += "GROUP BY Game.id "
+    print_query.group_by("Game.id")
 
     if flag_daily:
-        print_query += ", rel_day "
+        print_query.group_by("rel_day")
     elif flag_monthly:
-        print_query += ", rel_month "
+        print_query.group_by("rel_month")
 
 
     # SUM, MEAN, VERBOSE or FILTERS: use the defined query as a subquery and create the outer query
@@ -145,193 +139,215 @@ def print_query_definition(args, flist):
         else:
             headers = ["Mean time per day"]
 
-        print_query = """SELECT SUM(SUB.total_playtime)
-                         FROM Game INNER JOIN (""" + print_subquery + """) as SUB ON Game.id == SUB.id 
-                         WHERE Game.id > 0 """
+        print_query = QueryBuilder()
+        print_query.select("SUM(SUB.total_playtime)")
+        print_query.source("Game").source_query(print_subquery, "SUB", join="INNER JOIN", on="Game.id == SUB.id")
+        print_query.where("Game.id > 0")
         
         # Manage filters
         if filter_flag:
-            print_query += "AND " + utils.filter_recursive(filter_flag[0]) + " "
+            print_query.where(*filter_query)
 
-        # Manage game IDs
-        if gids:
-            temp_conditions = ""
-            for i in range(len(gids)):
-                temp_conditions += "Game.id == " + str(gids[i]) + " "
-
-                if i < len(gids) - 1:
-                    temp_conditions += "OR "
-
-            print_query += "AND (" + temp_conditions + ") "
-
-        # Manage game name search
-        if gname:
-            print_query += "AND Game.display_name LIKE '%" + gname + "%' "
+        print_game_filtering(print_query, gids, gname)
     
     elif flag_verbose or filter_flag:
         print_subquery = print_query
-        print_sq_filters = ""
-        print_date = ""
+        print_query = QueryBuilder()
 
         if flag_verbose:
             headers = ["game_id", "game_name", "game_exe"] + flist + ["playtime"]
+            print_query.select("Game.id").select("Game.display_name").select("Game.executable_name").select("HasFlag.value").select("SUB.total_playtime")
+            print_query.source("Game").source_query(print_subquery, "SUB", join="LEFT JOIN", on="Game.id == SUB.id")
+
             if filter_flag:
-                print_sq_filters = """SELECT Game.id
-                                      FROM Game 
-                                      WHERE """ + utils.filter_recursive(filter_flag[0])
-
-                print_query = """SELECT Game.*, HasFlag.value, SUB.total_playtime 
-                                 FROM Game LEFT JOIN (""" + print_subquery + """) as SUB ON Game.id == SUB.id 
-                                           INNER JOIN (""" + print_sq_filters + """) as SUBFILTERS ON Game.id == SUBFILTERS.id
-                                           INNER JOIN HasFlag ON SUBFILTERS.id == HasFlag.game_id """                
+                print_sq_filters = QueryBuilder().select("Game.id").source("Game").where(*filter_query)
+                print_query.source_query(print_sq_filters, "SUBFILTERS", join="INNER JOIN", on="Game.id == SUBFILTERS.id")
+                print_query.source("INNER JOIN HasFlag ON SUBFILTERS.id == HasFlag.game_id")
                 
             else:
-                print_query = """SELECT Game.*, HasFlag.value, SUB.total_playtime 
-                                 FROM Game LEFT JOIN (""" + print_subquery + """) as SUB ON Game.id == SUB.id 
-                                           INNER JOIN HasFlag ON Game.id == HasFlag.game_id """
-
-            # Manage game IDs
-            if gids:
-                for i in range(len(gids)):
-                    temp_conditions += "Game.id == " + str(gids[i]) + " "
+                print_query.source("INNER JOIN HasFlag ON Game.id == HasFlag.game_id")
 
-                    if i < len(gids) - 1:
-                        temp_conditions += "OR "
+            print_game_filtering(print_query, gids, gname)
 
-                print_query += "WHERE (" + temp_conditions + ") "
-
-            # Manage game name search
-            if gname:
-                print_query += "WHERE Game.display_name LIKE '%" + gname + "%' "
-
-            print_query += """GROUP BY Game.id, HasFlag.flag_id
-                              ORDER BY Game.id ASC, HasFlag.flag_id ASC"""
+            print_query.group_by("Game.id").group_by("HasFlag.flag_id")
+            print_query.order_by("Game.id ASC").order_by("HasFlag.flag_id ASC")
 
         elif filter_flag:
             # Date information have to be reported on the outer query too
             if flag_daily:
-                print_date = ", SUB.rel_day "
+                print_date = "SUB.rel_day"
                 
             elif flag_monthly:
-                print_date = ", SUB.rel_month "
-
-            print_query = """SELECT Game.id, Game.display_name""" + print_date + """, SUB.total_playtime 
-                             FROM Game INNER JOIN (""" + print_subquery + """) as SUB ON Game.id == SUB.id 
-                                       INNER JOIN HasFlag ON Game.id == HasFlag.game_id """
-            
-            # Manage filters
-            print_query += "WHERE " + utils.filter_recursive(filter_flag[0]) + " "
+                print_date = "SUB.rel_month"
 
-            # Manage game IDs
-            if gids:
-                temp_conditions = ""
-                for i in range(len(gids)):
-                    temp_conditions += "Game.id == " + str(gids[i]) + " "
+            print_query.select("Game.id").select("Game.display_name")
+            if print_date:
+                print_query.select(print_date)
 
-                    if i < len(gids) - 1:
-                        temp_conditions += "OR "
-
-                print_query += "AND (" + temp_conditions + ") "
-
-            # Manage game name search
-            if gname:
-                print_query += "AND Game.display_name LIKE '%" + gname + "%' "
+            print_query.select("SUB.total_playtime")
+            print_query.source("Game").source_query(print_subquery, "SUB", join="INNER JOIN", on="Game.id == SUB.id")
             
-            print_query += "GROUP BY Game.id "
-            if flag_daily or flag_monthly:
-                print_query += print_date
+            # Manage filters: the games selected are looked up by their ID, without joining the HasFlag table
+            print_query.where(*filter_query)
+            print_game_filtering(print_query, gids, gname)
             
-            print_query += "ORDER BY "
-            if flag_daily or flag_monthly:
-                print_query += print_date[2:] + "DESC, "
+            print_query.group_by("Game.id")
+            if print_date:
+                print_query.group_by(print_date)
+                print_query.order_by(print_date + " DESC")
 
             if order == "playtime":
-                print_query += "total_playtime DESC"
+                print_query.order_by("total_playtime DESC")
             elif order == "name":
-                print_query += "Game.display_name ASC"
+                print_query.order_by("Game.display_name ASC")
             elif order == "first_played":
-                print_query += "SUB.first_played ASC"
+                print_query.order_by("SUB.first_played ASC")
             elif order == "last_played":
-                print_query += "SUB.last_played DESC"
+                print_query.order_by("SUB.last_played DESC")
 
     else:
         # ORDER BY: useless to order the query if it acts as a subquery
         # Do it when it's sure how it's used
-        print_query += "ORDER BY "
-
         if flag_daily:
-            print_query += "rel_day DESC, "
+            print_query.order_by("rel_day DESC")
         elif flag_monthly:
-            print_query += "rel_month DESC, "
+            print_query.order_by("rel_month DESC")
 
         if order == "playtime":
-            print_query += "total_playtime DESC"
+            print_query.order_by("total_playtime DESC")
         elif order == "name":
-            print_query += "Game.display_name ASC"
+            print_query.order_by("Game.display_name ASC")
         elif order == "first_played":
-            print_query += "MIN(strftime('%Y-%m-%d', Activity.date)) ASC"
+            print_query.order_by("MIN(DailyPlaytime.day) ASC")
         elif order == "last_played":
-            print_query += "MAX(strftime('%Y-%m-%d', Activity.date)) DESC"
+            print_query.order_by("MAX(DailyPlaytime.day) DESC")
+
+    query, query_args = print_query.build()
+    return [query, query_args, headers]
+
 
-    return [print_query, query_args, headers]
+# Restrict the query to the game IDs (GIDS) or to the games whose name contains GNAME
+# IDs are bound as a single array and the name as a LIKE pattern, so neither of them changes the text of the query
+def print_game_filtering(query, gids, gname):
+
+    # Manage game IDs
+    if gids:
+        query.where_in("Game.id", gids)
+
+    # Manage game name search
+    if gname:
+        query.where("Game.display_name LIKE ?", ("%" + gname + "%", ))
 
 
 # Table printing on CLI
-def print_data_cli(headers, rows, flag_verbose, mean_days, group_dates):
-    ins_barriers = 0
-    barriers = []
-    print_rows = []
+# Tables fitting inside a single batch of rows are printed at once by tabulate, larger ones (or the ones split into
+# pages) are written while the rows are read, with the widths of the columns bounded in advance (see print_column_widths)
+def print_data_cli(headers, rows, page_size, connection):
+    first_rows = list(itertools.islice(rows, utils.DB_FETCH_BATCH_SIZE + 1))
 
-    # Convert duplicate rows due to flags into columns
-    if flag_verbose:
-        ogid = 0
-        flags = []
-        new_row = None
+    if len(first_rows) <= utils.DB_FETCH_BATCH_SIZE and page_size <= 0:
+        print(tabulate(first_rows, headers=headers, tablefmt="fancy_outline"))
+        return
 
-        for i in range(len(rows)):
-            row = rows[i]
+    interactive = sys.stdin.isatty() and sys.stdout.isatty()
+    table = TableWriter(headers, print_column_widths(headers, connection), sample=first_rows, page_size=page_size, interactive=interactive)
 
-            # Starting game id
-            if ogid == 0:
-                ogid = row[0]
+    for row in itertools.chain(first_rows, rows):
+        if not table.write_row(row):
+            break
 
-            # New game detected, save the previous one's values together with its flags
-            if ogid != row[0]:
-                print_rows.append(new_row)
-                ogid = row[0]
-                flags = []
+    table.close()
 
-            flags += ["X"] if row[3] == 1 else [""]
-            new_row = tuple([row[0], row[1], row[2]] + flags + [row[len(row) - 1]])
 
-            # Last cycle
-            if i == len(rows) - 1:
-                print_rows.append(new_row)               
-    else:
-        print_rows = rows
+# Rows ready to be printed, produced one by one from the ones returned by the query
+def print_rows_format(rows, flag_verbose, mean_days, group_dates):
+    previous_date = None
+
+    # Convert duplicate rows due to flags into columns
+    if flag_verbose:
+        rows = print_rows_flags(rows)
 
-    # Convert playtimes into HH:MM form
-    for i in range(len(print_rows)):
-        tmp_tuple = list(print_rows[i])
-        if tmp_tuple[-1] is None:
+    for row in rows:
+        if row[-1] is None:
+            yield row
             continue
-        
+
         # Compute mean in case it is requested, based on how many days passed since the start of the year
+        row = list(row)
         if mean_days is not None:
-            tmp_tuple[-1] /= mean_days
-
-        min, sec = divmod(tmp_tuple[-1], 60)
-        h, min = divmod(min, 60)
-        tmp_tuple[-1] = "{hours:02d}:{minutes:02d}:{seconds:02d}".format(hours=int(h), minutes=int(min), seconds=int(sec))
-        print_rows[i] = tmp_tuple
+            row[-1] /= mean_days
+
+        # Convert playtimes into HH:MM:SS form
+        row[-1] = format_duration(row[-1])
+
+        # Add barriers between different dates
+        if group_dates:
+            if previous_date is not None and row[-2] != previous_date:
+                yield ("",)
+
+            previous_date = row[-2]
+
+        yield row
+
+
+# Merge the rows of each game, one for each flag, into a single row with a column for each flag
+def print_rows_flags(rows):
+    flags = []
+    last_row = None
+
+    for row in rows:
+        # New game detected, return the previous one's values together with its flags
+        if last_row is not None and last_row[0] != row[0]:
+            yield tuple([last_row[0], last_row[1], last_row[2]] + flags + [last_row[-1]])
+            flags = []
+
+        flags += ["X"] if row[3] == 1 else [""]
+        last_row = row
+
+    if last_row is not None:
+        yield tuple([last_row[0], last_row[1], last_row[2]] + flags + [last_row[-1]])
+
+
+# Largest width of each column of the table, known before reading the rows
+# Bounds are read from the whole database: games with the longest names, the highest ID and the most playtime
+def print_column_widths(headers, connection):
+    widths = []
+
+    s_query = """ SELECT GameBounds.max_id, GameBounds.max_name, GameBounds.max_exe, PlaytimeBounds.max_seconds, PlaytimeBounds.total_seconds
+                  FROM (SELECT IFNULL(MAX(id), 0) AS max_id, IFNULL(MAX(length(display_name)), 0) AS max_name,
+                               IFNULL(MAX(length(executable_name)), 0) AS max_exe
+                        FROM Game) AS GameBounds,
+                       (SELECT IFNULL(MAX(seconds), 0) AS max_seconds, IFNULL(SUM(seconds), 0) AS total_seconds
+                        FROM DailyPlaytime) AS PlaytimeBounds """
+
+    # The cursor of the query being printed cannot be used
+    cursor = connection.cursor()
+    cursor.execute(s_query)
+    max_id, max_name, max_exe, max_seconds, total_seconds = cursor.fetchone()
+    cursor.close()
+
+    for i in range(len(headers)):
+        if headers[i] == "game_id":
+            widths.append(len(str(max_id)))
+        elif headers[i] == "game_name":
+            widths.append(max_name)
+        elif headers[i] == "game_exe":
+            widths.append(max_exe)
+        elif headers[i] == "day":
+            widths.append(10)
+        elif headers[i] == "month":
+            widths.append(7)
+        elif i == len(headers) - 1:
+            # A daily row holds the playtime of a single day, the other ones up to the whole playtime stored
+            widths.append(len(format_duration(max_seconds if "day" in headers else total_seconds)))
+        else:
+            widths.append(1)
 
-        if group_dates and i < (len(rows) - 1) and print_rows[i][-2] != print_rows[i + 1][-2]:
-            barriers.append(i + 1)
+    return widths
 
-    # Add barriers
-    for i in range(len(barriers)):
-        rows.insert(barriers[i] + ins_barriers, ("",))
-        ins_barriers += 1
 
-    # Print information table
-    print(tabulate(print_rows, headers=headers, tablefmt="fancy_outline"))
+# Playtime in the HH:MM:SS form
+def format_duration(seconds):
+    min, sec = divmod(seconds, 60)
+    h, min = divmod(min, 60)
+    return "{hours:02d}:{minutes:02d}:{seconds:02d}".format(hours=int(h), minutes=int(min), seconds=int(sec))
@@ -0,0 +1,76 @@
+import json
+
+# Clauses of a SELECT statement, in the order they appear inside the query
+CLAUSES = ("WITH", "SELECT", "FROM", "WHERE", "GROUP BY", "ORDER BY")
+
+# Separator of the fragments of each clause
+SEPARATORS = {"WITH": ", ", "SELECT": ", ", "FROM": " ", "WHERE": " AND ", "GROUP BY": ", ", "ORDER BY": ", "}
+
+
+# Composable SELECT statement used by the print and plot queries
+# Every value is bound as a parameter, so the text of the query only depends on the clauses used and not on the values
+# requested (dates, game IDs, names, filters): SQLite compiles it once and the statement cache of the connection reuses it
+class QueryBuilder:
+
+    def __init__(self):
+        self.fragments = {clause: [] for clause in CLAUSES}
+        self.args = {clause: [] for clause in CLAUSES}
+        self.recursive = False
+
+    def add(self, clause, fragment, args=()):
+        self.fragments[clause].append(fragment)
+        self.args[clause].extend(args)
+        return self
+
+    # Common table expression (NAME AS (QUERY)), where QUERY is either a text or another builder
+    def with_table(self, name, query, args=(), recursive=False):
+        query, args = as_query(query, args)
+        self.recursive = self.recursive or recursive
+        return self.add("WITH", name + " AS (" + query + ")", args)
+
+    def select(self, column, args=()):
+        return self.add("SELECT", column, args)
+
+    # Source of the rows: the first one is a table, the following ones must include their join (e.g. "INNER JOIN Flag ON ...")
+    def source(self, table, args=()):
+        return self.add("FROM", table, args)
+
+    # Source made of another query: "(QUERY) AS ALIAS", preceded by the join and followed by its condition when provided
+    def source_query(self, query, alias, join="", on="", args=()):
+        query, args = as_query(query, args)
+        return self.add("FROM", (join + " " if join else "") + "(" + query + ") AS " + alias + (" ON " + on if on else ""), args)
+
+    # Conditions are combined through AND
+    def where(self, condition, args=()):
+        return self.add("WHERE", condition, args)
+
+    # Condition on a list of values, bound as a single JSON array: the query is the same whatever the number of values
+    def where_in(self, column, values):
+        return self.where(column + " IN (SELECT value FROM json_each(?))", (json.dumps(list(values)), ))
+
+    def group_by(self, column):
+        return self.add("GROUP BY", column)
+
+    def order_by(self, column):
+        return self.add("ORDER BY", column)
+
+    # Text of the query together with its arguments, in the order of their placeholders
+    def build(self):
+        query = ""
+        args = []
+
+        for clause in CLAUSES:
+            if self.fragments[clause]:
+                keyword = "WITH RECURSIVE" if clause == "WITH" and self.recursive else clause
+                query += keyword + " " + SEPARATORS[clause].join(self.fragments[clause]) + " "
+                args.extend(self.args[clause])
+
+        return [query.rstrip(), tuple(args)]
+
+
+# Text and arguments of a query provided either as a builder or as a text
+def as_query(query, args=()):
+    if isinstance(query, QueryBuilder):
+        return query.build()
+
+    return [query, tuple(args)]
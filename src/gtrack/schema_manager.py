@@ -0,0 +1,296 @@
+import sqlite3
+from datetime import datetime
+from gtrack.cache_manager import bump_generation
+
+# Schema of the database, described as an ordered list of migrations
+# The version of a database is the number of migrations applied to it, stored inside PRAGMA user_version.
+# Databases created before the introduction of the migrations have version 0: every statement of the first
+# migrations can be executed on them, since the tables they already have are left untouched.
+# New changes to the schema have to be appended as new migrations, never edited inside the existing ones
+
+# 1: tables of the games, of their flags and of the activities
+SCHEMA_BASE = [
+    """ CREATE TABLE IF NOT EXISTS Game (
+            id INTEGER PRIMARY KEY,
+            display_name VARCHAR(50) NOT NULL,
+            executable_name VARCHAR(50) NOT NULL
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS Flag (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR(50) NOT NULL
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS HasFlag (
+            game_id INT NOT NULL,
+            flag_id INT NOT NULL,
+            value INT NOT NULL,
+            PRIMARY KEY (game_id, flag_id)
+            FOREIGN KEY (game_id) REFERENCES Game(id),
+            FOREIGN KEY (flag_id) REFERENCES Flag(id)
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS Activity (
+            game_id INT NOT NULL,
+            date DATETIME NOT NULL,
+            playtime FLOAT NOT NULL,
+            PRIMARY KEY (game_id, date),
+            FOREIGN KEY (game_id) REFERENCES Game(id)
+    ) """
+]
+
+# 2: tables tracking the ingest and unique executable names
+SCHEMA_INGEST = [
+    # Games sharing the same executable name, which could be inserted manually, are merged into the oldest one:
+    # its activities and flags are kept when the same ones are stored for the duplicates too
+    """ CREATE TEMP TABLE GameDuplicate AS
+        SELECT Game.id AS id, Kept.id AS keep_id
+        FROM Game, (SELECT MIN(id) AS id, executable_name
+                    FROM Game
+                    GROUP BY executable_name
+                    HAVING COUNT(*) > 1) AS Kept
+        WHERE Game.executable_name = Kept.executable_name AND Game.id <> Kept.id """,
+
+    """ UPDATE OR IGNORE Activity
+        SET game_id = (SELECT keep_id FROM GameDuplicate WHERE GameDuplicate.id = Activity.game_id)
+        WHERE game_id IN (SELECT id FROM GameDuplicate) """,
+
+    "DELETE FROM Activity WHERE game_id IN (SELECT id FROM GameDuplicate)",
+    "DELETE FROM HasFlag WHERE game_id IN (SELECT id FROM GameDuplicate)",
+    "DELETE FROM Game WHERE id IN (SELECT id FROM GameDuplicate)",
+    "DROP TABLE GameDuplicate",
+
+    # Executable names identify the games, allowing them to be upserted
+    """ CREATE UNIQUE INDEX IF NOT EXISTS GameExecutable
+        ON Game (executable_name) """,
+
+    # Additional names identifying a game: exact executable names, globs or regexes
+    """ CREATE TABLE IF NOT EXISTS GameAlias (
+            id INTEGER PRIMARY KEY,
+            game_id INT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            pattern TEXT NOT NULL,
+            UNIQUE (kind, pattern),
+            FOREIGN KEY (game_id) REFERENCES Game(id)
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS IngestManifest (
+            path TEXT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            size INT NOT NULL,
+            mtime INT NOT NULL,
+            hash VARCHAR(64) NOT NULL,
+            PRIMARY KEY (path, kind)
+    ) """,
+
+    """ CREATE INDEX IF NOT EXISTS IngestManifestHash
+        ON IngestManifest (kind, hash) """,
+
+    """ CREATE TABLE IF NOT EXISTS IngestWatermark (
+            bucket_id TEXT NOT NULL,
+            game_id INT NOT NULL,
+            last_event REAL NOT NULL,
+            last_duration REAL NOT NULL,
+            PRIMARY KEY (bucket_id, game_id),
+            FOREIGN KEY (game_id) REFERENCES Game(id)
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS OpenSession (
+            game_id INT NOT NULL,
+            session_date DATETIME NOT NULL,
+            session_start REAL NOT NULL,
+            session_end REAL NOT NULL,
+            playtime FLOAT NOT NULL,
+            events INT NOT NULL,
+            PRIMARY KEY (game_id),
+            FOREIGN KEY (game_id) REFERENCES Game(id)
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS IngestLog (
+            id INTEGER PRIMARY KEY,
+            run_started DATETIME NOT NULL,
+            source TEXT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            status VARCHAR(10) NOT NULL,
+            bytes INT NOT NULL,
+            events_seen INT NOT NULL,
+            events_matched INT NOT NULL,
+            events_skipped INT NOT NULL,
+            sessions INT NOT NULL,
+            below_threshold INT NOT NULL,
+            duplicates INT NOT NULL,
+            parse_time REAL NOT NULL,
+            sessionize_time REAL NOT NULL,
+            write_time REAL NOT NULL,
+            elapsed REAL NOT NULL
+    ) """
+]
+
+# 3: indexes used by the print and plot queries
+SCHEMA_QUERY_INDEXES = [
+    # Flag filters look for the games having a flag set to a value: the index covers the whole lookup
+    """ CREATE INDEX IF NOT EXISTS HasFlagValue
+        ON HasFlag (flag_id, value, game_id) """
+]
+
+# 4: epoch and local day of the activities, so that the date filters and groupings become index range scans
+SCHEMA_LOCAL_DAY = [
+    "ALTER TABLE Activity ADD COLUMN start_time REAL",
+    "ALTER TABLE Activity ADD COLUMN local_day CHAR(10)",
+
+    # Same days previously computed by the queries, through the timezone of the system
+    """ UPDATE Activity
+        SET start_time = (julianday(date) - 2440587.5) * 86400.0,
+            local_day = date(date, 'localtime') """,
+
+    """ CREATE INDEX IF NOT EXISTS ActivityLocalDay
+        ON Activity (local_day, game_id, playtime) """,
+
+    # Settings the stored data depends on, the timezone of the local days ('' for the one of the system)
+    """ CREATE TABLE IF NOT EXISTS Setting (
+            name VARCHAR(50) PRIMARY KEY,
+            value TEXT NOT NULL
+    ) """,
+
+    "INSERT OR IGNORE INTO Setting (name, value) VALUES ('timezone', '')"
+]
+
+# 5: playtime of each game for each local day, maintained together with the activities
+SCHEMA_DAILY_PLAYTIME = [
+    """ CREATE TABLE IF NOT EXISTS DailyPlaytime (
+            game_id INT NOT NULL,
+            day CHAR(10) NOT NULL,
+            seconds FLOAT NOT NULL,
+            sessions INT NOT NULL,
+            PRIMARY KEY (game_id, day),
+            FOREIGN KEY (game_id) REFERENCES Game(id)
+    ) """,
+
+    # Date filters and groupings read a range of days, the index covers the whole aggregation
+    """ CREATE INDEX IF NOT EXISTS DailyPlaytimeDay
+        ON DailyPlaytime (day, game_id, seconds) """,
+
+    """ INSERT INTO DailyPlaytime (game_id, day, seconds, sessions)
+        SELECT game_id, local_day, SUM(playtime), COUNT(*)
+        FROM Activity
+        GROUP BY game_id, local_day """
+]
+
+# 6: bitmask of the flags set for each game, kept together with the HasFlag rows
+SCHEMA_FLAG_MASK = [
+    "ALTER TABLE Game ADD COLUMN flags INT NOT NULL DEFAULT 0",
+
+    # Only the flags with an ID up to 63 fit inside the bitmask
+    """ UPDATE Game
+        SET flags = (SELECT IFNULL(SUM(1 << (HasFlag.flag_id - 1)), 0)
+                     FROM HasFlag
+                     WHERE HasFlag.game_id = Game.id AND HasFlag.value = 1 AND HasFlag.flag_id BETWEEN 1 AND 63) """
+]
+
+# 7: games selected by the filter expressions already evaluated, valid as long as the flags version does not change
+SCHEMA_FILTER_CACHE = [
+    """ CREATE TABLE IF NOT EXISTS FilterCache (
+            expression TEXT PRIMARY KEY,
+            version INT NOT NULL,
+            games BLOB NOT NULL
+    ) """,
+
+    # Incremented every time the flags of the games change
+    "INSERT OR IGNORE INTO Setting (name, value) VALUES ('flags_version', '0')"
+]
+
+# 8: rows returned by the print and plot queries, valid as long as the data generation does not change
+SCHEMA_QUERY_CACHE = [
+    """ CREATE TABLE IF NOT EXISTS QueryCache (
+            key CHAR(64) PRIMARY KEY,
+            generation INT NOT NULL,
+            rows TEXT NOT NULL,
+            size INT NOT NULL,
+            last_used REAL NOT NULL
+    ) """,
+
+    # Incremented every time the games, their flags or their activities change
+    "INSERT OR IGNORE INTO Setting (name, value) VALUES ('data_generation', '0')"
+]
+
+MIGRATIONS = [SCHEMA_BASE, SCHEMA_INGEST, SCHEMA_QUERY_INDEXES, SCHEMA_LOCAL_DAY, SCHEMA_DAILY_PLAYTIME, SCHEMA_FLAG_MASK,
+              SCHEMA_FILTER_CACHE, SCHEMA_QUERY_CACHE]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+# Version of the schema of the database
+def schema_version(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+# Bring the schema of the database to the current version, applying the missing migrations
+# Each migration is applied inside its own transaction together with the new version, so that an interrupted
+# upgrade restarts from the last migration completed. Nothing is executed when the schema is already current
+def migrate_schema(connection, cursor):
+    version = schema_version(cursor)
+
+    if version == SCHEMA_VERSION:
+        return None
+
+    if version > SCHEMA_VERSION:
+        return "ERROR: the database has been created by a newer version of the program (schema " + str(version) + ", supported " + str(SCHEMA_VERSION) + ")!"
+
+    if connection.in_transaction:
+        connection.commit()
+
+    for i in range(version, SCHEMA_VERSION):
+        try:
+            connection.execute("BEGIN")
+            for query in MIGRATIONS[i]:
+                cursor.execute(query)
+
+            # PRAGMA statements cannot be parameterized, the version is always an integer
+            cursor.execute("PRAGMA user_version = " + str(i + 1))
+            connection.commit()
+
+        except sqlite3.Error as e:
+            connection.rollback()
+            return "ERROR: the database could not be upgraded to schema " + str(i + 1) + " due to " + str(e)
+
+    return None
+
+
+# Assign the activities to the local days of the timezone indicated inside the configuration file,
+# when it differs from the one used to store them
+def update_local_days(timezone_name, timezone, connection, cursor):
+
+    s_query = "SELECT value FROM Setting WHERE name = 'timezone'"
+    cursor.execute(s_query)
+    if cursor.fetchone()[0] == timezone_name:
+        return
+
+    u_query = """ UPDATE Activity
+                  SET local_day = local_day(start_time) """
+
+    u_setting_query = """ UPDATE Setting
+                          SET value = ?
+                          WHERE name = 'timezone' """
+
+    connection.create_function("local_day", 1, lambda start_time: datetime.fromtimestamp(start_time, timezone).date().isoformat(), deterministic=True)
+    cursor.execute(u_query)
+    cursor.execute(u_setting_query, (timezone_name, ))
+    rebuild_daily_playtime(connection, cursor)
+
+    print("Activities assigned to the days of the timezone: " + (timezone_name if timezone_name != "" else "system"))
+
+
+# Compute again the daily playtime of every game from the stored activities
+def rebuild_daily_playtime(connection, cursor):
+
+    rm_query = "DELETE FROM DailyPlaytime"
+
+    i_query = """ INSERT INTO DailyPlaytime (game_id, day, seconds, sessions)
+                  SELECT game_id, local_day, SUM(playtime), COUNT(*)
+                  FROM Activity
+                  GROUP BY game_id, local_day """
+
+    cursor.execute(rm_query)
+    cursor.execute(i_query)
+    bump_generation(cursor)
+    connection.commit()
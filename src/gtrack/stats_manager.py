@@ -0,0 +1,161 @@
+import json
+import time
+from datetime import datetime
+
+# Run collecting the statistics of the current execution
+_current_run = None
+
+
+# Statistics of the ingest of a single source (file, datastore or server)
+class FileStats:
+
+    def __init__(self, source, kind, size=0):
+        self.source = source
+        self.kind = kind
+        self.status = "ok"
+        self.bytes = size
+        self.events_seen = 0        # Events read from the buckets
+        self.events_matched = 0     # Events related to a game
+        self.events_skipped = 0     # Events already ingested by a previous run
+        self.sessions = 0           # Activities inserted or extended
+        self.below_threshold = 0    # Events discarded for being part of low time activities
+        self.duplicates = 0         # Events discarded for being part of activities already stored
+        self.parse_time = 0.0
+        self.sessionize_time = 0.0
+        self.write_time = 0.0
+
+    def elapsed(self):
+        return self.parse_time + self.sessionize_time + self.write_time
+
+    def events_per_sec(self):
+        return self.events_seen / self.elapsed() if self.elapsed() > 0 else 0.0
+
+    def as_dict(self):
+        res = {}
+        res["source"] = self.source
+        res["kind"] = self.kind
+        res["status"] = self.status
+        res["bytes"] = self.bytes
+        res["events_seen"] = self.events_seen
+        res["events_matched"] = self.events_matched
+        res["events_skipped"] = self.events_skipped
+        res["sessions"] = self.sessions
+        res["below_threshold"] = self.below_threshold
+        res["duplicates"] = self.duplicates
+        res["parse_time"] = round(self.parse_time, 6)
+        res["sessionize_time"] = round(self.sessionize_time, 6)
+        res["write_time"] = round(self.write_time, 6)
+        res["events_per_sec"] = round(self.events_per_sec(), 1)
+        return res
+
+
+# Statistics of a whole execution of the INSERT or SCAN mode
+class IngestRun:
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started = datetime.now()
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.files = []
+        self.skipped_files = 0      # Files not read since they did not change after the last scan
+
+    # Start tracking a new source
+    def track(self, source, kind, size=0):
+        file_stats = FileStats(source, kind, size)
+        self.files.append(file_stats)
+        return file_stats
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+
+    def elapsed(self):
+        return (self.end_time if self.end_time is not None else time.perf_counter()) - self.start_time
+
+    def totals(self):
+        res = {}
+        res["mode"] = self.mode
+        res["started"] = self.started.isoformat(" ")
+        res["elapsed"] = round(self.elapsed(), 6)
+        res["files"] = len(self.files)
+        res["skipped_files"] = self.skipped_files
+
+        for key in ("bytes", "events_seen", "events_matched", "events_skipped", "sessions", "below_threshold", "duplicates"):
+            res[key] = sum(getattr(file_stats, key) for file_stats in self.files)
+
+        for key in ("parse_time", "sessionize_time", "write_time"):
+            res[key] = round(sum(getattr(file_stats, key) for file_stats in self.files), 6)
+
+        res["events_per_sec"] = round(res["events_seen"] / res["elapsed"], 1) if res["elapsed"] > 0 else 0.0
+        return res
+
+    def as_dict(self):
+        return {"run": self.totals(), "files": [file_stats.as_dict() for file_stats in self.files]}
+
+
+# Begin collecting the statistics of a new execution
+def start_run(mode):
+    global _current_run
+    _current_run = IngestRun(mode)
+    return _current_run
+
+
+# Run of the current execution, created on the first use when none has been started
+def current_run():
+    global _current_run
+    if _current_run is None:
+        _current_run = IngestRun(None)
+
+    return _current_run
+
+
+# Start tracking a source inside the current run
+def track_file(source, kind, size=0):
+    return current_run().track(source, kind, size)
+
+
+# Print the statistics of the run in the requested format ('text' or 'json')
+def print_stats(run, stats_format):
+
+    if stats_format == "json":
+        print(json.dumps(run.as_dict()))
+        return
+
+    print("")
+    for file_stats in run.files:
+        print("STATS: " + file_stats.source + " [" + file_stats.status + "] - " + format_stats(file_stats.as_dict()))
+
+    totals = run.totals()
+    print("STATS: total of " + str(totals["files"]) + " sources (" + str(totals["skipped_files"]) + " unchanged) in " +
+          "{:.2f}".format(totals["elapsed"]) + "s - " + format_stats(totals))
+
+
+def format_stats(stats):
+    return (str(stats["bytes"]) + " bytes, " + str(stats["events_seen"]) + " events, " + str(stats["events_matched"]) + " matched, " +
+            str(stats["events_skipped"]) + " already ingested, " + str(stats["sessions"]) + " sessions, " +
+            str(stats["below_threshold"]) + " below threshold, " + str(stats["duplicates"]) + " duplicates | parse " +
+            "{:.3f}".format(stats["parse_time"]) + "s, sessionize " + "{:.3f}".format(stats["sessionize_time"]) + "s, write " +
+            "{:.3f}".format(stats["write_time"]) + "s, " + "{:,.0f}".format(stats["events_per_sec"]) + " events/s")
+
+
+# Store the statistics of the run inside the IngestLog table: a row for each source and a row with the totals
+def write_ingest_log(run, connection, cursor):
+    rows = []
+    totals = run.totals()
+
+    for file_stats in run.files:
+        stats = file_stats.as_dict()
+        rows.append((totals["started"], stats["source"], stats["kind"], stats["status"], stats["bytes"], stats["events_seen"],
+                     stats["events_matched"], stats["events_skipped"], stats["sessions"], stats["below_threshold"], stats["duplicates"],
+                     stats["parse_time"], stats["sessionize_time"], stats["write_time"], round(file_stats.elapsed(), 6)))
+
+    rows.append((totals["started"], str(run.mode), "run", "ok", totals["bytes"], totals["events_seen"], totals["events_matched"],
+                 totals["events_skipped"], totals["sessions"], totals["below_threshold"], totals["duplicates"],
+                 totals["parse_time"], totals["sessionize_time"], totals["write_time"], totals["elapsed"]))
+
+    i_query = """ INSERT INTO IngestLog (run_started, source, kind, status, bytes, events_seen, events_matched, events_skipped,
+                                         sessions, below_threshold, duplicates, parse_time, sessionize_time, write_time, elapsed)
+                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) """
+
+    cursor.executemany(i_query, rows)
+    connection.commit()
@@ -0,0 +1,101 @@
+import sys
+
+# Lines of the frame, the same ones drawn by tabulate for the 'fancy_outline' format: (left, fill, separator, right)
+TABLE_TOP = ("╒", "═", "╤", "╕")
+TABLE_HEADER_BELOW = ("╞", "═", "╪", "╡")
+TABLE_BOTTOM = ("╘", "═", "╧", "╛")
+
+# Space added around the headers, as done by tabulate
+HEADER_PADDING = 2
+
+
+# Table written row by row to OUT (the current standard output by default), without keeping the rows in memory
+# Widths have to be known before the first row: each one is the largest between the width requested (WIDTHS),
+# the one of its header and the ones of the rows received before the table is started (SAMPLE).
+# Columns whose sampled values are all numbers are aligned to the right, like tabulate does.
+# When PAGE_SIZE is positive the table is split into pages of that many rows, each one with its own header: on a
+# terminal the next page is written only after Enter is pressed, 'q' stops the output
+class TableWriter:
+
+    def __init__(self, headers, widths, sample=(), out=None, page_size=0, interactive=False):
+        self.headers = headers
+        self.out = out if out is not None else sys.stdout
+        self.page_size = page_size
+        self.interactive = interactive
+        self.page_rows = 0
+        self.started = False
+        self.stopped = False
+
+        self.widths = [max(widths[i], len(headers[i]) + HEADER_PADDING) for i in range(len(headers))]
+        self.numeric = [False] * len(headers)
+
+        for i in range(len(headers)):
+            values = [row[i] for row in sample if i < len(row) and row[i] not in (None, "")]
+            self.numeric[i] = len(values) > 0 and all(isinstance(value, (int, float)) for value in values)
+
+            for value in values:
+                self.widths[i] = max(self.widths[i], len(str(value)))
+
+    # Write a single row, returns False when the output has been stopped
+    def write_row(self, row):
+        if self.stopped:
+            return False
+
+        if not self.started:
+            self.write_header()
+
+        elif self.page_size > 0 and self.page_rows == self.page_size:
+            self.write_line(TABLE_BOTTOM)
+            if self.interactive and not self.wait_page():
+                self.stopped = True
+                return False
+
+            self.write_header()
+
+        self.out.write(self.format_row(row))
+        self.page_rows += 1
+        return True
+
+    # Complete the table, written even when no row has been received
+    def close(self):
+        if self.stopped:
+            return
+
+        if not self.started:
+            self.write_header()
+
+        self.write_line(TABLE_BOTTOM)
+        self.out.flush()
+
+    def write_header(self):
+        self.write_line(TABLE_TOP)
+        self.out.write(self.format_row(self.headers))
+        self.write_line(TABLE_HEADER_BELOW)
+        self.started = True
+        self.page_rows = 0
+
+    def write_line(self, line):
+        left, fill, separator, right = line
+        self.out.write(left + separator.join(fill * (width + 2) for width in self.widths) + right + "\n")
+
+    def format_row(self, row):
+        cells = []
+
+        for i in range(len(self.widths)):
+            value = row[i] if i < len(row) and row[i] is not None else ""
+            if self.numeric[i]:
+                cells.append(str(value).rjust(self.widths[i]))
+            else:
+                cells.append(str(value).ljust(self.widths[i]))
+
+        return "│ " + " │ ".join(cells) + " │\n"
+
+    # Wait for the user before writing the next page, returns False when the output has to stop
+    def wait_page(self):
+        self.out.flush()
+        try:
+            answer = input("-- more (Enter to continue, q to quit) --")
+        except EOFError:
+            return False
+
+        return answer.strip().lower() != "q"
@@ -1,7 +1,7 @@
 import argparse
 import platformdirs
-import pyparsing as pp
 from enum import Enum
+from gtrack.expression_manager import parse_filter
 
 # Paths for the application (platform-dependent)
 CONFIG_PATH = platformdirs.user_config_dir("gtrack", ensure_exists=True)    # Configuration file
@@ -11,11 +11,49 @@ DB_PATH = platformdirs.user_data_dir("gtrack", ensure_exists=True)          # Da
 SAVE_ACT_THRESHOLD = 3 * 60                     # Used to filter relevant activities (CONFIGURABLE)
 DIFF_ACT_THRESHOLD = 30 * 60                    # Used to identify different gaming sessions (CONFIGURABLE)
 
+# SQLite storage profile applied to the database connection (CONFIGURABLE)
+DB_JOURNAL_MODE = "WAL"                         # Readers do not block the writer, a single fsync per checkpoint
+DB_SYNCHRONOUS = "NORMAL"                       # Safe with WAL: a power loss can only drop the last transactions
+DB_CACHE_SIZE = -64 * 1024                      # Page cache, negative values are expressed in KiB
+DB_MMAP_SIZE = 256 * 1024 * 1024                # Bytes of the database file accessed through memory mapping
+DB_TEMP_STORE = "MEMORY"                        # Temporary tables and indices are kept in memory
+DB_INGEST_LOG = False                           # Statistics of every ingest stored inside the IngestLog table
+DB_CACHED_STATEMENTS = 256                      # Compiled statements kept by the connection, reused when the same query text is executed again
+DB_QUERY_CACHE_SIZE = 16 * 1024 * 1024          # Bytes of the print and plot results kept inside the QueryCache table, 0 to disable it
+DB_QUERY_CACHE_TOUCH = 60 * 60                  # Seconds after which a cached result read again is marked as recently used (write on a cache hit)
+DB_FETCH_BATCH_SIZE = 1000                      # Rows read at once from the cursor when printing the results
+DB_TIMEZONE = ""                                # Timezone defining the local day of the activities, the system one when empty
+
+# Accepted values of the storage profile settings
+DB_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+DB_SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+DB_TEMP_STORES = ("DEFAULT", "FILE", "MEMORY")
+
+# Time thresholds of the scan in follow mode (in SECONDS)
+WATCH_POLL_INTERVAL = 5                         # Interval between two checks of the bucket folder
+WATCH_DEBOUNCE = 2                              # Time a file has to remain unchanged before being read
+
+# Amount of activities buffered before being written to the database
+ACTIVITY_BATCH_SIZE = 500
+
+# Amount of bytes read at a time when computing the hash of an ingested file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Flags stored inside the bitmask of each game, the bit (flag_id - 1) being set when the flag is true
+# Bit 63 is left out since it would make the SQLite integer negative
+FLAG_MASK_BITS = 63
+
 # Font sizes for plots
 BAR_FONT_SIZE = 16
 TITLE_FONT_SIZE = 16
 LABEL_FONT_SIZE = 14
 
+# Extensions of the bucket exports, which can be compressed to be decoded as a stream while reading them
+BUCKET_EXTENSIONS = (".json", ".json.gz", ".json.xz", ".json.bz2")
+
+# Extensions of the SQLite datastore of ActivityWatch, accepted as bucket source
+DATASTORE_EXTENSIONS = (".db", ".sqlite")
+
 # Field names of the CSV file for the game table
 FIELDNAMES = ("display_name", "executable_name")
 
@@ -28,6 +66,8 @@ class ProgramModes(Enum):
     PRINT   = "print"        # Print filtered data from the tables
     REMOVE  = "rm"           # Remove unwanted processes from the database
     SCAN    = "scan"         # Scan the paths contained in the .ini file to add new data
+    ALIAS   = "alias"        # Configure additional names or patterns identifying the games
+    REBUILD = "rebuild"      # Compute again the daily playtime of the games from their activities
 
 
 # For argparse usage
@@ -63,113 +103,28 @@ class SimpleFilterProcessor(argparse.Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
 
-        # Variables are filter IDs, numbers
-        number = pp.Word(pp.nums)  
-        boolean_operator = pp.oneOf("NOT", caseless=True)
-
-        # Define expression grammar using infixNotation
-        boolean_expr = pp.infixNotation(
-            number,
-            [
-                ("NOT", 1, pp.opAssoc.RIGHT),
-            ],
-        )
-
-        try: 
-            parsedList = boolean_expr.parse_string(values.upper(), parse_all=True).as_list()
-        except pp.ParseException as pe:
-            msg = "filter argument incorrect: '" + str(pe) + "'"
+        # Variables are filter IDs, numbers, with the NOT operator only
+        try:
+            expression = parse_filter(values, ("NOT", ))
+        except ValueError as ve:
+            msg = "filter argument incorrect: '" + str(ve) + "'"
             raise argparse.ArgumentTypeError(msg)
 
-        setattr(namespace, self.dest, parsedList)
+        setattr(namespace, self.dest, expression)
 
 
 # For argparse usage
 # Used for correctly parsing the filter boolean expression
+# The expression is stored already normalized (see expression_manager), ready to be evaluated over the flags of the games
 class FilterProcessor(argparse.Action):
 
     def __call__(self, parser, namespace, values, option_string=None):
 
-        # Variables are filter IDs, numbers
-        number = pp.Word(pp.nums)  
-        boolean_operator = pp.oneOf("AND OR NOT", caseless=True)
-
-        # Define expression grammar using infixNotation
-        boolean_expr = pp.infixNotation(
-            number,
-            [
-                ("NOT", 1, pp.opAssoc.RIGHT),  
-                ("AND", 2, pp.opAssoc.LEFT),  
-                ("OR", 2, pp.opAssoc.LEFT),   
-            ],
-        )
-
-        try: 
-            parsedList = boolean_expr.parse_string(values.upper(), parse_all=True).as_list()
-        except pp.ParseException as pe:
-            msg = "filter argument incorrect: '" + str(pe) + "'"
+        # Variables are filter IDs, numbers, combined through NOT, AND and OR
+        try:
+            expression = parse_filter(values)
+        except ValueError as ve:
+            msg = "filter argument incorrect: '" + str(ve) + "'"
             raise argparse.ArgumentTypeError(msg)
 
-        setattr(namespace, self.dest, parsedList)
-
-
-# Converts the filter boolean expression into the correct WHERE statements for the query
-def filter_recursive(operand):
-    query_final = ""
-    query_left = ""
-    query_right = ""
-    temp_operand = []
-    operator = ""
-
-    # Single operand case
-    if len(operand) == 1:
-        query_final = """Game.id IN (SELECT Game.id 
-                                     FROM Game, HasFlag
-                                     WHERE Game.id == HasFlag.game_id AND 
-                                           HasFlag.flag_id == """ + str(operand) + " AND HasFlag.value == 1) "
-    
-    # NOT case
-    elif len(operand) == 2:
-        # NOT followed by a number like: ['NOT', operand]
-        if len(operand[1]) == 1:
-            query_final = """Game.id IN (SELECT Game.id 
-                                         FROM Game, HasFlag
-                                         WHERE Game.id == HasFlag.game_id AND 
-                                               HasFlag.flag_id == """ + str(operand[1]) + " AND HasFlag.value == 0) "
-
-        # NOT followed by a NOT like: ['NOT', ['NOT', operand]]
-        elif len(operand[1]) == 2:
-            query_final = filter_recursive(operand[1][1])
-
-        # NOT followed by a structure of LEFT OPERAND RIGHT
-        # Need to use De Morgan's law to properly manage the NOT structure
-        # Example: ['NOT', [operand, 'AND', operand]]
-        else:
-            operator = "OR" if operand[1][1] == "AND" else "AND"
-            temp_operand.append(['NOT', operand[1][0]])
-            temp_operand.append(operator)
-            temp_operand.append(['NOT', operand[1][2]])
-
-            query_left = filter_recursive(temp_operand[0])
-            query_right = filter_recursive(temp_operand[2])
-            query_final = "(" + query_left + " " + str(temp_operand[1]) + " " + query_right + ")"
-
-    # left+op+right general case
-    elif len(operand) == 3:
-        query_left = filter_recursive(operand[0])
-        query_right = filter_recursive(operand[2])
-        query_final = "(" + query_left + " " + str(operand[1]) + " " + query_right + ")"
-
-    # Chain of left+op+right case
-    else:
-        for i in range(len(operand)):
-            if i == 1:
-               query_left = filter_recursive(operand[i-1])
-               query_right = filter_recursive(operand[i+1])
-               query_final = "(" + query_left + " " + str(operand[i]) + " " + query_right + ")"
-            
-            elif i % 2 == 1:
-                query_right = filter_recursive(operand[i+1])
-                query_final = "(" + query_final + " " + str(operand[i]) + " " + query_right + ")"
-
-    return query_final
\ No newline at end of file
+        setattr(namespace, self.dest, expression)
@@ -0,0 +1,199 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from gtrack import utils
+from gtrack.insert_manager import load_game_index, open_data_file
+from gtrack.stats_manager import current_run, start_run
+
+# inotify constants (from <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_EVENT_HEADER = struct.Struct("iIII")       # wd, mask, cookie, len
+IN_READ_SIZE = 64 * 1024
+
+
+# Watch the bucket folder, ingesting new or grown exports as soon as they stop changing
+# The connection and the game index are kept for the whole execution: the index is loaded again only when
+# another process modified the database, as reported by 'PRAGMA data_version'.
+# The files ingested together are tracked by a new run, handed over to REPORT (when provided) once they are processed
+def watch_data(path, bucket_options, connection, cursor, interval=utils.WATCH_POLL_INTERVAL, debounce=utils.WATCH_DEBOUNCE, report=None):
+
+    if path is None or path.strip() == "":
+        return "ERROR: the configuration file does not specify any bucket path to follow!"
+
+    # A single bucket file can be indicated as well
+    if os.path.isdir(path):
+        folder, only_name = path, None
+    elif os.path.isfile(path):
+        folder, only_name = os.path.split(os.path.abspath(path))
+    else:
+        return "ERROR: the indicated bucket path is not correct!"
+
+    watcher = open_watcher(folder)
+    games = load_game_index(cursor)
+    data_version = read_data_version(cursor)
+    pending = {}    # file name -> time of the last change observed
+    run = None      # Run of the files being ingested
+
+    print("Following bucket folder: " + folder + " (" + watcher.kind + ", press CTRL+C to stop)")
+    try:
+        while True:
+            # Wake up in time to process the files that are about to settle
+            timeout = interval
+            if pending:
+                timeout = max(0.0, min(interval, debounce - (time.monotonic() - max(pending.values()))))
+
+            now = time.monotonic()
+            for name in watcher.changes(timeout):
+                if name.lower().endswith(utils.BUCKET_EXTENSIONS) and (only_name is None or name == only_name):
+                    pending[name] = now
+
+            now = time.monotonic()
+            ready = sorted(name for name in pending if now - pending[name] >= debounce)
+            if not ready:
+                continue
+
+            # Games added or removed by other processes
+            current_version = read_data_version(cursor)
+            if current_version != data_version:
+                games = load_game_index(cursor)
+                data_version = current_version
+
+            run = start_run(current_run().mode)
+            for name in ready:
+                del pending[name]
+
+                if not games:
+                    print("ERROR: no game has been found! Buckets will not be processed...")
+                    continue
+
+                # Unchanged content is recognized by the ingest manifest, new events by the watermarks
+                file_name = os.path.join(folder, name)
+                if os.path.isfile(file_name):
+                    open_data_file(file_name, 1, None, games, bucket_options, connection, cursor, True)
+
+            if report is not None:
+                report(run)
+
+            run = None
+            sys.stdout.flush()
+
+    except KeyboardInterrupt:
+        # The file interrupted is discarded as a whole, to be read again by the next scan
+        if connection.in_transaction:
+            connection.rollback()
+            if run is not None and run.files:
+                run.files[-1].status = "aborted"
+
+        if run is not None and report is not None:
+            report(run)
+
+        print("Watch terminated.")
+
+    finally:
+        watcher.close()
+
+    return None
+
+
+# Counter changed by SQLite whenever a different connection commits to the database
+def read_data_version(cursor):
+    cursor.execute("PRAGMA data_version")
+    return cursor.fetchone()[0]
+
+
+# Use inotify where available, otherwise fall back to polling the modification times
+def open_watcher(folder):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError):
+            pass
+
+    return PollingWatcher(folder)
+
+
+# Reports the files of a folder written or moved into it, through the inotify interface of the Linux kernel
+class InotifyWatcher:
+
+    kind = "inotify"
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify could not be initialized")
+
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, "inotify could not watch " + folder)
+
+    # Names of the files changed, waiting up to timeout seconds for the first change
+    def changes(self, timeout):
+        names = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return names
+
+        try:
+            data = os.read(self.fd, IN_READ_SIZE)
+        except BlockingIOError:
+            return names
+
+        offset = 0
+        while offset + IN_EVENT_HEADER.size <= len(data):
+            _, _, _, length = IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += IN_EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if name:
+                names.add(os.fsdecode(name))
+
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+# Reports the files of a folder whose size or modification time changed between two checks
+class PollingWatcher:
+
+    kind = "polling"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        snapshot = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stats = entry.stat()
+                    snapshot[entry.name] = (stats.st_size, stats.st_mtime_ns)
+
+        return snapshot
+
+    # Names of the files changed, checked after timeout seconds
+    def changes(self, timeout):
+        time.sleep(timeout)
+
+        snapshot = self.take_snapshot()
+        names = set(name for name in snapshot if self.snapshot.get(name) != snapshot[name])
+        self.snapshot = snapshot
+        return names
+
+    def close(self):
+        return
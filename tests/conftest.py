@@ -0,0 +1,33 @@
+import sqlite3
+from datetime import timezone
+
+import pytest
+
+from gtrack import utils
+from gtrack.schema_manager import migrate_schema
+
+
+# Database with the current schema and no data
+@pytest.fixture
+def empty_database(tmp_path):
+    connection = sqlite3.connect(tmp_path / "data.db")
+    cursor = connection.cursor()
+    assert migrate_schema(connection, cursor) is None
+
+    yield connection, cursor
+    connection.close()
+
+
+# Database with the current schema and two games (IDs 1 and 2, executables game0.exe and game1.exe)
+@pytest.fixture
+def database(empty_database):
+    connection, cursor = empty_database
+    cursor.execute("INSERT INTO Game (display_name, executable_name) VALUES ('Game 0', 'game0.exe'), ('Game 1', 'game1.exe')")
+    connection.commit()
+
+    return connection, cursor
+
+
+@pytest.fixture
+def bucket_options():
+    return {"save_thres": utils.SAVE_ACT_THRESHOLD, "diff_thres": utils.DIFF_ACT_THRESHOLD, "timezone": timezone.utc}
@@ -0,0 +1,118 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# Start of the events written by the tests
+EVENTS_START = datetime(2024, 3, 1, 18, 0, 0, tzinfo=timezone.utc)
+BUCKET_ID = "aw-watcher-window_host-0"
+
+
+# Contiguous events of a game, as (start, duration, app, title), with the newest first as in the exports
+def game_events(count, duration=600.0, app="game0.exe", start=EVENTS_START):
+    events = []
+    for i in range(count):
+        events.append((start + timedelta(seconds=i * duration), duration, app, "Game 0"))
+
+    return events[::-1]
+
+
+# Events in the format of the REST API and of the exports of ActivityWatch
+def event_dicts(events):
+    res = []
+    for i, (start, duration, app, title) in enumerate(events):
+        res.append({"id": i + 1, "timestamp": start.isoformat(), "duration": duration, "data": {"app": app, "title": title}})
+
+    return res
+
+
+# Write the events as an export of ActivityWatch holding a single window-watcher bucket
+def write_export(path, events, bucket_id=BUCKET_ID):
+    bucket = {"id": bucket_id, "type": "currentwindow", "client": "aw-watcher-window", "hostname": "host-0", "events": event_dicts(events)}
+    with open(path, "w") as output:
+        json.dump({"buckets": {bucket_id: bucket}}, output)
+
+
+# Playtime and number of the activities stored
+def activity_totals(cursor):
+    cursor.execute("SELECT IFNULL(SUM(playtime), 0), COUNT(*) FROM Activity")
+    return cursor.fetchone()
+
+
+# Write the events inside a datastore of ActivityWatch, with the schema of aw-server ('peewee') or of
+# aw-server-rust ('rust'). An AFK bucket holding the same timestamps is added, since it must be ignored
+def write_datastore(path, schema, events, bucket_id=BUCKET_ID):
+    connection = sqlite3.connect(path)
+
+    if schema == "peewee":
+        connection.execute(""" CREATE TABLE bucketmodel (key INTEGER PRIMARY KEY, id VARCHAR(255) UNIQUE, created DATETIME, name VARCHAR(255),
+                                                         type VARCHAR(255), client VARCHAR(255), hostname VARCHAR(255), datastr TEXT) """)
+        connection.execute(""" CREATE TABLE eventmodel (id INTEGER PRIMARY KEY, bucket_id INTEGER, timestamp DATETIME, duration DECIMAL(10, 5),
+                                                        datastr TEXT) """)
+        connection.execute("CREATE INDEX eventmodel_bucket_id ON eventmodel (bucket_id)")
+        connection.execute("CREATE INDEX eventmodel_timestamp ON eventmodel (timestamp)")
+
+        connection.execute("INSERT INTO bucketmodel VALUES (1, ?, '2024-01-01', NULL, 'currentwindow', 'aw-watcher-window', 'host-0', '{}')", (bucket_id, ))
+        connection.execute("INSERT INTO bucketmodel VALUES (2, 'aw-watcher-afk_host-0', '2024-01-01', NULL, 'afkstatus', 'aw-watcher-afk', 'host-0', '{}')")
+
+        for start, duration, app, title in events:
+            timestamp = start.astimezone(timezone.utc).isoformat(" ")
+            connection.execute("INSERT INTO eventmodel (bucket_id, timestamp, duration, datastr) VALUES (1, ?, ?, ?)",
+                               (timestamp, duration, json.dumps({"app": app, "title": title})))
+            connection.execute("INSERT INTO eventmodel (bucket_id, timestamp, duration, datastr) VALUES (2, ?, ?, ?)",
+                               (timestamp, duration, json.dumps({"status": "not-afk"})))
+
+    else:
+        connection.execute(""" CREATE TABLE buckets (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, type TEXT NOT NULL,
+                                                     client TEXT NOT NULL, hostname TEXT NOT NULL, created TEXT NOT NULL, data TEXT) """)
+        connection.execute(""" CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, bucketrow INTEGER NOT NULL, starttime INTEGER NOT NULL,
+                                                    endtime INTEGER NOT NULL, data TEXT NOT NULL) """)
+        connection.execute("CREATE INDEX events_bucketrow_index ON events(bucketrow)")
+        connection.execute("CREATE INDEX events_starttime_index ON events(starttime)")
+        connection.execute("CREATE INDEX events_endtime_index ON events(endtime)")
+
+        connection.execute("INSERT INTO buckets VALUES (1, ?, 'currentwindow', 'aw-watcher-window', 'host-0', '2024-01-01', '{}')", (bucket_id, ))
+        connection.execute("INSERT INTO buckets VALUES (2, 'aw-watcher-afk_host-0', 'afkstatus', 'aw-watcher-afk', 'host-0', '2024-01-01', '{}')")
+
+        for start, duration, app, title in events:
+            starttime = int(start.timestamp()) * 10 ** 9 + start.microsecond * 1000
+            endtime = starttime + int(duration * 10 ** 9)
+            connection.execute("INSERT INTO events (bucketrow, starttime, endtime, data) VALUES (1, ?, ?, ?)",
+                               (starttime, endtime, json.dumps({"app": app, "title": title})))
+            connection.execute("INSERT INTO events (bucketrow, starttime, endtime, data) VALUES (2, ?, ?, ?)",
+                               (starttime, endtime, json.dumps({"status": "not-afk"})))
+
+    connection.commit()
+    connection.close()
+
+
+# Events of a few sessions of two games, separated by long pauses and mixed with other applications
+def mixed_events(sessions=6, events_per_session=12):
+    events = []
+    start = EVENTS_START
+
+    for i in range(sessions):
+        for j in range(events_per_session):
+            app = "game" + str(i % 2) + ".exe" if j % 4 != 3 else "firefox.exe"
+            events.append((start, 300.0 + j, app, "Window " + str(j)))
+            start += timedelta(seconds=300.0 + j, microseconds=250000)
+
+        start += timedelta(hours=3)
+
+    return events[::-1]
+
+
+# Write a game list in the format read by the scan: a header, then display name, executable and flag values of each game
+def write_games(path, games, flags="n"):
+    with open(path, "w") as output:
+        output.write("display_name,executable_name,flags\n")
+        for name, executable in games:
+            output.write(name + "," + executable + "," + flags + "\n")
+
+
+# Arguments of the print command, with every option left to its default value unless given
+def print_args(**kwargs):
+    args = {"print_verbose": False, "print_daily": False, "print_mean": False, "print_monthly": False, "print_sum": False,
+            "print_total": False, "date_print_default": None, "filter_print": None, "id_print": None, "name_print": None,
+            "print_sort": "playtime"}
+    args.update(kwargs)
+    return args
@@ -0,0 +1,48 @@
+from datetime import timedelta, timezone
+
+from gtrack import utils
+from gtrack.insert_manager import ActivityWriter
+from helpers import EVENTS_START
+
+
+def stored_activities(cursor):
+    cursor.execute("SELECT game_id, date, playtime FROM Activity ORDER BY game_id, date")
+    return cursor.fetchall()
+
+
+# Activities already stored are kept as they are, and only the events of the colliding ones are counted as duplicates
+def test_batch_skips_stored_activities(database):
+    connection, cursor = database
+    writer = ActivityWriter(utils.SAVE_ACT_THRESHOLD, cursor, timezone.utc)
+    writer.add(1, EVENTS_START, 1000.0, 4)
+    writer.flush()
+
+    writer = ActivityWriter(utils.SAVE_ACT_THRESHOLD, cursor, timezone.utc, batch_size=2)
+    writer.add(1, EVENTS_START + timedelta(hours=3), 2000.0, 5)
+    writer.add(1, EVENTS_START, 1500.0, 6)
+    writer.add(2, EVENTS_START, 3000.0, 7)
+    writer.add(2, EVENTS_START, 3500.0, 8)
+    writer.add(2, EVENTS_START + timedelta(hours=1), 60.0, 9)
+    writer.flush()
+
+    assert (writer.stored, writer.dup_counter, writer.uthres_counter) == (2, 14, 9)
+    assert stored_activities(cursor) == [
+        (1, "2024-03-01 18:00:00+00:00", 1000.0),
+        (1, "2024-03-01 21:00:00+00:00", 2000.0),
+        (2, "2024-03-01 18:00:00+00:00", 3000.0),
+    ]
+
+
+# A stored session extended by new events is updated in place, unless a longer one is already stored
+def test_extend_updates_stored_session(database):
+    connection, cursor = database
+    writer = ActivityWriter(utils.SAVE_ACT_THRESHOLD, cursor, timezone.utc)
+    writer.add(1, EVENTS_START, 1000.0, 4)
+    writer.flush()
+
+    writer.extend(1, (EVENTS_START, 1000.0, 4), EVENTS_START - timedelta(minutes=10), 1600.0, 6)
+    writer.extend(1, (EVENTS_START, 1000.0, 4), EVENTS_START, 1200.0, 5)
+    writer.flush()
+
+    assert (writer.stored, writer.dup_counter) == (2, 1)
+    assert stored_activities(cursor) == [(1, "2024-03-01 17:50:00+00:00", 1600.0)]
@@ -0,0 +1,63 @@
+import os
+
+from gtrack.alias_manager import add_alias
+from gtrack.bucket_manager import GameIndex
+from gtrack.insert_manager import load_game_index, scan_data
+from gtrack.stats_manager import start_run
+from helpers import EVENTS_START, game_events, write_export, write_games
+
+
+def test_regex_groups_kept(database):
+    connection, cursor = database
+
+    # Valid on their own, even if they refer to their groups or share the names of the groups
+    assert add_alias(1, r"(a)\1-launcher\.exe", "regex", connection, cursor) is None
+    assert add_alias(2, r"(?P<name>b)(?P=name)\.exe", "regex", connection, cursor) is None
+    assert add_alias(2, r"(?P<name>c)\.exe", "regex", connection, cursor) is None
+
+    games = load_game_index(cursor)
+    assert games.lookup("AA-Launcher.exe") == 1
+    assert games.lookup("ab-launcher.exe") == 0
+    assert games.lookup("bb.exe") == 2
+    assert games.lookup("c.exe") == 2
+
+
+def test_invalid_regex_rejected(database):
+    connection, cursor = database
+
+    assert add_alias(1, r"(a", "regex", connection, cursor).startswith("ERROR:")
+    cursor.execute("SELECT COUNT(*) FROM GameAlias")
+    assert cursor.fetchone()[0] == 0
+
+
+def test_first_alias_wins():
+    games = GameIndex([(1, "game0.exe")], [(2, "glob", "game*.exe"), (3, "regex", r"game\d\.exe"), (3, "exact", "game0.exe")])
+
+    assert games.lookup("Game0.exe") == 1
+    assert games.lookup("game1.exe") == 2
+    assert games.lookup("other.exe") == 0
+    assert len(games) == 3
+
+
+# Exports already read must be read again, to credit the game with the events of its new alias
+def test_alias_rescan_unchanged_export(tmp_path, bucket_options, empty_database):
+    connection, cursor = empty_database
+    games = tmp_path / "games"
+    buckets = tmp_path / "buckets"
+    games.mkdir()
+    buckets.mkdir()
+
+    write_games(games / "games.csv", [("Game 0", "game0.exe"), ("Game 1", "game1.exe")])
+    write_export(buckets / "a.json", game_events(10) + game_events(5, app="launcher-x64.exe", start=EVENTS_START.replace(day=2)))
+    paths = (str(games) + "/", str(buckets) + "/")
+
+    start_run("scan")
+    assert scan_data(paths, bucket_options, connection, cursor) is None
+    assert add_alias(2, "launcher-*.exe", "glob", connection, cursor) is None
+
+    run = start_run("scan")
+    assert scan_data(paths, bucket_options, connection, cursor) is None
+
+    cursor.execute("SELECT game_id, SUM(playtime) FROM Activity GROUP BY game_id ORDER BY game_id")
+    assert [os.path.basename(file_stats.source) for file_stats in run.files] == ["a.json"]
+    assert cursor.fetchall() == [(1, 6000.0), (2, 3000.0)]
@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+
+from gtrack.bucket_manager import GameIndex, iter_bucket_events
+from gtrack.insert_manager import parse_bucket_data_json
+from helpers import event_dicts, game_events
+
+# Export with keys to skip around the buckets, nested values and numbers that a small chunk can cut in two
+EXPORT = json.dumps({
+    "version": 1.25,
+    "buckets": {
+        "aw-watcher-window_host-0": {
+            "id": "aw-watcher-window_host-0",
+            "data": {"nested": [1, {"a": [2.5, "]}"]}]},
+            "events": event_dicts(game_events(3, duration=123.456)),
+            "last_updated": "2024-03-01T19:00:00",
+        },
+        "aw-watcher-window_host-1": {"events": []},
+    },
+    "exported": -1e3,
+}, indent=1)
+
+
+# Stream returning at most SIZE characters for each read, whatever the amount requested
+class ChunkedStream(io.StringIO):
+
+    def __init__(self, text, size):
+        super().__init__(text)
+        self.size = size
+
+    def read(self, size=-1):
+        return super().read(self.size if size < 0 else min(size, self.size))
+
+
+def expected_events(text):
+    res = []
+    for bucket_id, bucket in json.loads(text)["buckets"].items():
+        res.extend((bucket_id, event) for event in bucket["events"])
+
+    return res
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 16, 64, len(EXPORT)])
+def test_chunk_boundaries(size):
+    assert list(iter_bucket_events(ChunkedStream(EXPORT, size))) == expected_events(EXPORT)
+
+
+# Every truncation of the export is reported as an error instead of returning the events read so far
+def test_truncated_file(bucket_options):
+    game_index = GameIndex([(1, "game0.exe")])
+
+    for length in range(len(EXPORT.rstrip())):
+        sessions, err = parse_bucket_data_json(ChunkedStream(EXPORT[:length], 7), game_index, bucket_options)
+        assert sessions is None and err.startswith("ERROR:"), length
+
+
+@pytest.mark.parametrize("text, key", [
+    ('{"version": 1}', "buckets"),
+    ('{"buckets": {"aw-watcher-window_host-0": {"id": "aw-watcher-window_host-0"}}}', "events"),
+])
+def test_missing_keys(text, key, bucket_options):
+    sessions, err = parse_bucket_data_json(io.StringIO(text), GameIndex([]), bucket_options)
+    assert sessions is None and "'" + key + "'" in err
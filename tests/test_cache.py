@@ -0,0 +1,86 @@
+import json
+import sqlite3
+
+from gtrack import utils
+from gtrack.cache_manager import bump_generation, fetch_rows, iter_rows, query_key
+
+GAMES_QUERY = "SELECT id, display_name FROM Game ORDER BY id"
+
+
+def last_used(cursor):
+    cursor.execute("SELECT last_used FROM QueryCache")
+    return cursor.fetchone()[0]
+
+
+# Results read from the cache do not write to the database, so they are returned while another process is writing
+def test_hit_is_read_only(database, tmp_path):
+    connection, cursor = database
+    rows = fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor)
+    stored = last_used(cursor)
+
+    writer = sqlite3.connect(tmp_path / "data.db")
+    writer.execute("BEGIN IMMEDIATE")
+    cursor.execute("PRAGMA busy_timeout = 0")
+
+    assert fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor, prepare=lambda: 1 / 0) == rows
+    assert not connection.in_transaction
+
+    writer.rollback()
+    writer.close()
+    assert last_used(cursor) == stored
+
+
+# The time of use is refreshed once it is older than DB_QUERY_CACHE_TOUCH, keeping the eviction order meaningful
+def test_hit_touches_old_results(database):
+    connection, cursor = database
+    fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor)
+    cursor.execute("UPDATE QueryCache SET last_used = last_used - ?", (utils.DB_QUERY_CACHE_TOUCH, ))
+    connection.commit()
+    stored = last_used(cursor)
+
+    fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor)
+    assert last_used(cursor) > stored
+
+
+def cached_keys(cursor):
+    cursor.execute("SELECT key FROM QueryCache ORDER BY last_used, key")
+    return [row[0] for row in cursor.fetchall()]
+
+
+# A change to the stored data starts a new generation: the previous results are computed again and discarded
+def test_generation_invalidates(database):
+    connection, cursor = database
+    assert fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor) == [(1, "Game 0"), (2, "Game 1")]
+
+    cursor.execute("INSERT INTO Game (display_name, executable_name) VALUES ('Game 2', 'game2.exe')")
+    connection.commit()
+    assert fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor) == [(1, "Game 0"), (2, "Game 1")]
+
+    bump_generation(cursor)
+    connection.commit()
+    assert fetch_rows(GAMES_QUERY, (), utils.DB_QUERY_CACHE_SIZE, connection, cursor) == [(1, "Game 0"), (2, "Game 1"), (3, "Game 2")]
+
+    cursor.execute("SELECT COUNT(*), MIN(generation) FROM QueryCache")
+    assert cursor.fetchone() == (1, 1)
+
+
+# The least recently used results are evicted once the cache is full, the ones larger than the cache are never stored,
+# as the ones whose rows were not all read
+def test_cache_size(database):
+    connection, cursor = database
+    size = len(json.dumps([[1, "Game 0"]])) * 2
+
+    fetch_rows("SELECT id, display_name FROM Game WHERE id = ?", (1, ), size, connection, cursor)
+    cursor.execute("UPDATE QueryCache SET last_used = last_used - 10")
+    fetch_rows("SELECT id, display_name FROM Game WHERE id = ?", (2, ), size, connection, cursor)
+    assert cached_keys(cursor) == [query_key("SELECT id, display_name FROM Game WHERE id = ?", (1, )),
+                                   query_key("SELECT id, display_name FROM Game WHERE id = ?", (2, ))]
+
+    fetch_rows("SELECT id, display_name FROM Game WHERE id >= ?", (2, ), size, connection, cursor)
+    fetch_rows("SELECT id, display_name, executable_name FROM Game", (), size, connection, cursor)
+    next(iter_rows("SELECT id, display_name FROM Game WHERE id <= ?", (1, ), size, connection, cursor))
+    assert cached_keys(cursor) == [query_key("SELECT id, display_name FROM Game WHERE id = ?", (2, )),
+                                   query_key("SELECT id, display_name FROM Game WHERE id >= ?", (2, ))]
+
+    fetch_rows(GAMES_QUERY, (), 0, connection, cursor)
+    assert len(cached_keys(cursor)) == 2
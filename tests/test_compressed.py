@@ -0,0 +1,46 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from gtrack.insert_manager import insert_from_file, load_game_index, open_data_file
+from helpers import activity_totals, game_events, write_export
+
+COMPRESSIONS = [(".json.gz", gzip.compress), (".json.xz", lzma.compress), (".json.bz2", bz2.compress)]
+
+
+# Write the events as an export compressed by COMPRESS
+def write_compressed(path, compress, events):
+    plain = path.with_name("plain.json")
+    write_export(plain, events)
+    path.write_bytes(compress(plain.read_bytes()))
+    plain.unlink()
+
+
+# Compressed exports are found inside the folders by their extension and read as the plain ones
+@pytest.mark.parametrize("suffix, compress", COMPRESSIONS)
+def test_compressed_export(suffix, compress, tmp_path, bucket_options, database):
+    connection, cursor = database
+    folder = tmp_path / "buckets"
+    folder.mkdir()
+    write_compressed(folder / ("a" + suffix.upper()), compress, game_events(10))
+
+    parsed_args = {"insert_filepath": str(folder) + "/", "insert_choice": "bucket", "header_flag": 0, "jobs": 1, "manifest_flag": False}
+    assert insert_from_file(parsed_args, bucket_options, connection, cursor) is None
+
+    assert activity_totals(cursor) == (6000.0, 1)
+
+
+# A truncated compressed export is reported as an error, storing none of its events
+@pytest.mark.parametrize("suffix, compress", COMPRESSIONS)
+def test_truncated_export(suffix, compress, tmp_path, bucket_options, database, capsys):
+    connection, cursor = database
+    path = tmp_path / ("a" + suffix)
+    write_compressed(path, compress, game_events(10))
+    path.write_bytes(path.read_bytes()[:-20])
+
+    assert open_data_file(str(path), 1, None, load_game_index(cursor), bucket_options, connection, cursor) == 1
+
+    assert "ERROR:" in capsys.readouterr().out
+    assert activity_totals(cursor) == (0, 0)
@@ -0,0 +1,46 @@
+from gtrack.config_manager import read_timezone
+from gtrack.insert_manager import insert_from_file, remove_data
+from gtrack.schema_manager import update_local_days
+from helpers import mixed_events, write_export
+
+
+def daily_rows(cursor):
+    cursor.execute("SELECT game_id, day, seconds, sessions FROM DailyPlaytime ORDER BY game_id, day")
+    return cursor.fetchall()
+
+
+# Daily totals computed from scratch over the stored activities
+def grouped_rows(cursor):
+    cursor.execute(""" SELECT game_id, local_day, SUM(playtime), COUNT(*)
+                       FROM Activity
+                       GROUP BY game_id, local_day
+                       ORDER BY game_id, local_day """)
+    return cursor.fetchall()
+
+
+def insert_export(path, bucket_options, connection, cursor):
+    parsed_args = {"insert_filepath": str(path), "insert_choice": "bucket", "header_flag": 0, "jobs": 1, "manifest_flag": False}
+    assert insert_from_file(parsed_args, bucket_options, connection, cursor) is None
+
+
+# The rollup follows the activities inserted, extended by a later export, removed and assigned to other days
+def test_rollup_matches_activities(tmp_path, bucket_options, database):
+    connection, cursor = database
+    events = mixed_events()[::-1]
+
+    write_export(tmp_path / "a.json", events[:30][::-1])
+    insert_export(tmp_path / "a.json", bucket_options, connection, cursor)
+    assert len(daily_rows(cursor)) > 2
+    assert daily_rows(cursor) == grouped_rows(cursor)
+
+    # The last session of the first export continues inside the second one
+    write_export(tmp_path / "b.json", events[30:][::-1])
+    insert_export(tmp_path / "b.json", bucket_options, connection, cursor)
+    assert daily_rows(cursor) == grouped_rows(cursor)
+
+    update_local_days("Pacific/Kiritimati", read_timezone("Pacific/Kiritimati"), connection, cursor)
+    assert daily_rows(cursor) == grouped_rows(cursor)
+
+    remove_data(2, connection, cursor)
+    assert [row[0] for row in daily_rows(cursor)] == [1] * len(daily_rows(cursor))
+    assert daily_rows(cursor) == grouped_rows(cursor)
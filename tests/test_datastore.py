@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+from gtrack.bucket_manager import DatastoreReader
+from gtrack.insert_manager import load_game_index, open_data_file, read_bucket_datastore
+from gtrack.stats_manager import start_run
+from helpers import BUCKET_ID, activity_totals, mixed_events, write_datastore, write_export
+
+SCHEMAS = ["peewee", "rust"]
+
+
+def stored_activities(cursor):
+    cursor.execute("SELECT game_id, date, ROUND(playtime, 3) FROM Activity ORDER BY game_id, date")
+    return cursor.fetchall()
+
+
+def datastore_watermark(cursor):
+    cursor.execute("SELECT last_event FROM IngestWatermark WHERE bucket_id = ? AND game_id = 0", (BUCKET_ID, ))
+    return cursor.fetchone()[0]
+
+
+@pytest.mark.parametrize("schema", SCHEMAS)
+def test_range_query(schema, tmp_path):
+    events = mixed_events()[::-1]
+    path = tmp_path / "aw.db"
+    write_datastore(path, schema, events)
+
+    # Bounds are truncated to the second, so the event starting at the bound is read again
+    bound = events[30][0].timestamp()
+    datastore = sqlite3.connect(path)
+    executed = []
+    datastore.set_trace_callback(executed.append)
+    reader = DatastoreReader(datastore, {BUCKET_ID: bound})
+    read = list(reader.events())
+    datastore.set_trace_callback(None)
+
+    assert reader.schema == schema
+    assert len(read) == len(events) - 30
+    assert all(bucket_id == BUCKET_ID for bucket_id, event in read)
+    assert [event["data"]["app"] for bucket_id, event in read] == [app for start, duration, app, title in events[30:]]
+    assert reader.bucket_marks[BUCKET_ID] == pytest.approx(events[-1][0].timestamp())
+
+    # The events of the bucket are retrieved through an index, not by scanning the whole table
+    table = "eventmodel" if schema == "peewee" else "events"
+    queries = [query for query in executed if "FROM " + table in query]
+    assert len(queries) == 1
+
+    plan = datastore.execute("EXPLAIN QUERY PLAN " + queries[0]).fetchall()
+    assert any("SEARCH " + table + " USING INDEX" in row[3] for row in plan)
+    assert all("SCAN " + table not in row[3] for row in plan)
+    datastore.close()
+
+
+@pytest.mark.parametrize("schema", SCHEMAS)
+def test_only_new_events_read(schema, tmp_path, bucket_options, database):
+    connection, cursor = database
+    events = mixed_events()
+    path = tmp_path / "aw.db"
+
+    # First half of the events, then the whole datastore once the second half has been recorded
+    write_datastore(path, schema, events[len(events) // 2:])
+    assert read_bucket_datastore(str(path), load_game_index(cursor), bucket_options, connection, cursor) == 0
+    first_mark = datastore_watermark(cursor)
+
+    path.unlink()
+    write_datastore(path, schema, events)
+    run = start_run("scan")
+    assert read_bucket_datastore(str(path), load_game_index(cursor), bucket_options, connection, cursor) == 0
+
+    # Only the events from the second of the watermark onward are read again
+    newer = [start for start, duration, app, title in events if start.timestamp() >= int(first_mark)]
+    assert run.files[0].events_seen == len(newer)
+    assert datastore_watermark(cursor) == pytest.approx(events[0][0].timestamp())
+
+    # Nothing left to read
+    run = start_run("scan")
+    assert read_bucket_datastore(str(path), load_game_index(cursor), bucket_options, connection, cursor) == 0
+    assert run.files[0].events_seen == 1
+    assert run.files[0].sessions == 0
+
+
+@pytest.mark.parametrize("schema", SCHEMAS)
+def test_sessions_match_export(schema, tmp_path, bucket_options, database):
+    connection, cursor = database
+    events = mixed_events()
+
+    write_export(tmp_path / "export.json", events)
+    assert open_data_file(str(tmp_path / "export.json"), 1, None, load_game_index(cursor), bucket_options, connection, cursor) == 0
+    from_export = stored_activities(cursor)
+    export_totals = activity_totals(cursor)
+
+    cursor.execute("DELETE FROM Activity")
+    cursor.execute("DELETE FROM DailyPlaytime")
+    cursor.execute("DELETE FROM IngestWatermark")
+    cursor.execute("DELETE FROM OpenSession")
+    connection.commit()
+
+    write_datastore(tmp_path / "aw.db", schema, events)
+    assert read_bucket_datastore(str(tmp_path / "aw.db"), load_game_index(cursor), bucket_options, connection, cursor) == 0
+
+    assert export_totals[1] == 6
+    assert stored_activities(cursor) == from_export
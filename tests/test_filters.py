@@ -0,0 +1,117 @@
+import re
+
+import pytest
+
+from gtrack.expression_manager import OPERATORS, filter_key, parse_filter
+from gtrack.filter_manager import filter_games, update_flag_masks
+from gtrack.utils import FLAG_MASK_BITS
+
+
+# Flag FLAG_ID set for game 1 and not set for game 2, while game 3 has no value for it
+# Both a flag stored inside the bitmask of the games and one stored only inside the HasFlag table are used
+@pytest.fixture(params=[1, FLAG_MASK_BITS + 1])
+def flagged_database(request, database):
+    connection, cursor = database
+    flag_id = request.param
+
+    cursor.execute("INSERT INTO Flag (id, name) VALUES (?, 'completed')", (flag_id, ))
+    cursor.execute("INSERT INTO HasFlag (game_id, flag_id, value) VALUES (1, ?, 1), (2, ?, 0)", (flag_id, flag_id))
+    cursor.execute("INSERT INTO Game (display_name, executable_name) VALUES ('Game 2', 'game2.exe')")
+    update_flag_masks(cursor)
+    connection.commit()
+
+    return connection, cursor, flag_id
+
+
+@pytest.mark.parametrize("expression, games", [
+    ("{0}", [1]),
+    ("NOT {0}", [2]),
+    ("NOT NOT {0}", [1]),
+    ("{0} OR NOT {0}", [1, 2]),
+    ("NOT ({0} AND NOT {0})", [1, 2]),
+    ("{0} AND NOT {0}", []),
+])
+def test_not_requires_a_value(flagged_database, expression, games):
+    connection, cursor, flag_id = flagged_database
+
+    assert filter_games(parse_filter(expression.format(flag_id)), connection, cursor) == games
+
+
+# Flags 1, 2 and 3 with the values 111, 110, 010 and 001 for the games 1 to 4
+@pytest.fixture
+def catalog_database(database):
+    connection, cursor = database
+    cursor.execute("INSERT INTO Game (display_name, executable_name) VALUES ('Game 2', 'game2.exe'), ('Game 3', 'game3.exe')")
+    cursor.execute("INSERT INTO Flag (name) VALUES ('completed'), ('platinum'), ('multiplayer')")
+
+    values = ["111", "110", "010", "001"]
+    for gid in range(1, 5):
+        for flag_id in range(1, 4):
+            cursor.execute("INSERT INTO HasFlag (game_id, flag_id, value) VALUES (?, ?, ?)", (gid, flag_id, int(values[gid - 1][flag_id - 1])))
+
+    update_flag_masks(cursor)
+    connection.commit()
+    return connection, cursor
+
+
+# Operators are applied in the order NOT, AND, OR, whatever their case, unless parentheses are used
+@pytest.mark.parametrize("expression, games", [
+    ("1 OR 2 AND NOT 3", [1, 2, 3]),
+    ("(1 OR 2) AND NOT 3", [2, 3]),
+    ("NOT 1 AND 2", [3]),
+    ("NOT (1 AND 2)", [3, 4]),
+    ("not 1 or not 2", [3, 4]),
+    ("1 or 2 and 3 or 3 and not 1", [1, 2, 4]),
+    ("NOT (NOT 1 OR (2 AND NOT 3))", [1]),
+])
+def test_precedence(catalog_database, expression, games):
+    connection, cursor = catalog_database
+
+    assert filter_games(parse_filter(expression), connection, cursor) == games
+
+
+# Equivalent expressions are normalized into the same tree, sharing the cached result
+@pytest.mark.parametrize("first, second", [
+    ("3 AND 2", "2 and (3)"),
+    ("NOT (1 AND 2)", "NOT 1 OR NOT 2"),
+    ("NOT NOT 1", "1"),
+    ("1 AND (2 AND 3)", "(1 AND 2) AND 3 AND 1"),
+])
+def test_equivalent_expressions(first, second):
+    assert filter_key(parse_filter(first)) == filter_key(parse_filter(second))
+
+
+@pytest.mark.parametrize("expression, operators, message", [
+    ("", OPERATORS, "empty expression"),
+    ("1 AND", OPERATORS, "expected a flag ID (at end of expression)"),
+    ("(1 OR 2", OPERATORS, "expected ')' (at end of expression)"),
+    ("1 2", OPERATORS, "unexpected '2'"),
+    ("AND 1", OPERATORS, "expected a flag ID (at char 0)"),
+    ("1 XOR 2", OPERATORS, "unexpected 'XOR' (at char 2)"),
+    ("1 AND 2", ("NOT", ), "operator AND is not supported (at char 2)"),
+])
+def test_invalid_expressions(expression, operators, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        parse_filter(expression, operators)
+
+
+def cached_filters(cursor):
+    cursor.execute("SELECT expression, version FROM FilterCache ORDER BY expression")
+    return cursor.fetchall()
+
+
+# Results are reused until the flags version changes, then computed again and the old ones discarded
+def test_filter_cache_version(catalog_database):
+    connection, cursor = catalog_database
+    assert filter_games(parse_filter("1 AND 2"), connection, cursor) == [1, 2]
+    assert filter_games(parse_filter("NOT 3"), connection, cursor) == [2, 3]
+    version = cached_filters(cursor)[0][1]
+    assert cached_filters(cursor) == [("!3", version), ("(1&2)", version)]
+
+    # Without a new version the stored result is returned
+    cursor.execute("UPDATE HasFlag SET value = 0 WHERE game_id = 2")
+    assert filter_games(parse_filter("2 AND 1"), connection, cursor) == [1, 2]
+
+    update_flag_masks(cursor)
+    assert filter_games(parse_filter("2 AND 1"), connection, cursor) == [1]
+    assert cached_filters(cursor) == [("(1&2)", version + 1)]
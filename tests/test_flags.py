@@ -0,0 +1,80 @@
+from gtrack.expression_manager import parse_filter
+from gtrack.filter_manager import add_flag, filter_games, remove_flag, scan_flags, update_flag_masks
+
+
+def flag_names(cursor):
+    cursor.execute("SELECT id, name FROM Flag ORDER BY id")
+    return cursor.fetchall()
+
+
+def flag_values(cursor):
+    cursor.execute("SELECT game_id, flag_id, value FROM HasFlag ORDER BY game_id, flag_id")
+    return cursor.fetchall()
+
+
+# Every game is associated to a new flag, with a false value
+def test_add_flag_to_every_game(database):
+    connection, cursor = database
+
+    assert add_flag("completed", connection, cursor) is None
+    assert add_flag("completed", connection, cursor).startswith("WARNING:")
+
+    assert flag_names(cursor) == [(1, "completed")]
+    assert flag_values(cursor) == [(1, 1, 0), (2, 1, 0)]
+
+
+# Flags already defined, repeated or empty are skipped
+def test_scan_flags_adds_missing_ones(database):
+    connection, cursor = database
+    assert add_flag("completed", connection, cursor) is None
+
+    scan_flags("completed, platinum,,platinum , multiplayer", connection, cursor)
+
+    assert flag_names(cursor) == [(1, "completed"), (2, "platinum"), (3, "multiplayer")]
+    assert len(flag_values(cursor)) == 6
+
+
+# The values of a removed flag are removed for every game, and the game files have to be read again
+def test_remove_flag(database):
+    connection, cursor = database
+    scan_flags("completed,platinum", connection, cursor)
+    cursor.execute("INSERT INTO IngestManifest (path, kind, size, mtime, hash) VALUES ('games.csv', 'game', 1, 1, 'h')")
+    connection.commit()
+
+    remove_flag(1, connection, cursor)
+
+    assert flag_names(cursor) == [(2, "platinum")]
+    assert flag_values(cursor) == [(1, 2, 0), (2, 2, 0)]
+    cursor.execute("SELECT COUNT(*) FROM IngestManifest")
+    assert cursor.fetchone()[0] == 0
+
+
+def game_masks(cursor):
+    cursor.execute("SELECT id, flags FROM Game ORDER BY id")
+    return cursor.fetchall()
+
+
+# The bitmask of the games follows the values of their flags, as flags are added and removed
+def test_masks_follow_flags(database):
+    connection, cursor = database
+    scan_flags("completed,platinum,multiplayer", connection, cursor)
+    assert game_masks(cursor) == [(1, 0), (2, 0)]
+
+    cursor.execute("UPDATE HasFlag SET value = 1 WHERE game_id = 1 OR flag_id = 3")
+    update_flag_masks(cursor)
+    assert game_masks(cursor) == [(1, 7), (2, 4)]
+
+    scan_flags("completed,single player", connection, cursor)
+    assert game_masks(cursor) == [(1, 7), (2, 4)]
+
+    remove_flag(1, connection, cursor)
+    assert game_masks(cursor) == [(1, 6), (2, 4)]
+
+
+# Filters evaluated before a flag is added do not keep their result, since its negation now selects every game
+def test_add_flag_invalidates_filters(database):
+    connection, cursor = database
+
+    assert filter_games(parse_filter("NOT 1"), connection, cursor) == []
+    assert add_flag("completed", connection, cursor) is None
+    assert filter_games(parse_filter("NOT 1"), connection, cursor) == [1, 2]
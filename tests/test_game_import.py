@@ -0,0 +1,52 @@
+import io
+
+from gtrack.filter_manager import add_flag
+from gtrack.insert_manager import read_game_data_csv
+
+
+def import_games(text, connection, cursor):
+    assert read_game_data_csv(io.StringIO(text), 1, connection, cursor) == 0
+    connection.commit()
+
+
+def stored_games(cursor):
+    cursor.execute("SELECT id, display_name, executable_name, flags FROM Game ORDER BY id")
+    games = cursor.fetchall()
+    cursor.execute("SELECT game_id, value FROM HasFlag ORDER BY game_id, flag_id")
+    values = cursor.fetchall()
+
+    return [game + ("".join(str(value) for gid, value in values if gid == game[0]), ) for game in games]
+
+
+def bucket_files(cursor):
+    cursor.execute("SELECT COUNT(*) FROM IngestManifest WHERE kind = 'bucket'")
+    return cursor.fetchone()[0]
+
+
+# Games imported again keep their ID, while their name and flags are updated
+# Files already read are kept inside the manifest, since no new executable could match their events
+def test_reimport_updates_games(database):
+    connection, cursor = database
+    assert add_flag("completed", connection, cursor) is None
+    assert add_flag("platinum", connection, cursor) is None
+    cursor.execute("INSERT INTO IngestManifest (path, kind, size, mtime, hash) VALUES ('a.json', 'bucket', 1, 1, 'h')")
+    connection.commit()
+
+    import_games("Game 0,game0.exe,y,n\nGame 1,game1.exe,n,n\n", connection, cursor)
+    import_games("Renamed 0,GAME0.exe,y,y\nGame 1,game1.exe,1\n", connection, cursor)
+
+    assert stored_games(cursor) == [(1, "Renamed 0", "game0.exe", 3, "11"), (2, "Game 1", "game1.exe", 1, "10")]
+    assert bucket_files(cursor) == 1
+
+
+# A new game gets the next ID, and the files already read are read again by the next scan
+def test_import_new_game(database):
+    connection, cursor = database
+    assert add_flag("completed", connection, cursor) is None
+    cursor.execute("INSERT INTO IngestManifest (path, kind, size, mtime, hash) VALUES ('a.json', 'bucket', 1, 1, 'h')")
+    connection.commit()
+
+    import_games("Game 1,game1.exe,y\nGame 2,game2.exe,n\n,missing.exe,y\n", connection, cursor)
+
+    assert stored_games(cursor) == [(1, "Game 0", "game0.exe", 0, "0"), (2, "Game 1", "game1.exe", 1, "1"), (3, "Game 2", "game2.exe", 0, "0")]
+    assert bucket_files(cursor) == 0
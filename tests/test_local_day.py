@@ -0,0 +1,50 @@
+from datetime import timedelta, timezone
+
+from gtrack import utils
+from gtrack.config_manager import read_timezone
+from gtrack.insert_manager import ActivityWriter
+from gtrack.schema_manager import update_local_days
+from helpers import EVENTS_START
+
+
+def local_days(cursor):
+    cursor.execute("SELECT game_id, date, local_day FROM Activity ORDER BY game_id, date")
+    return cursor.fetchall()
+
+
+def store_activities(cursor, tz):
+    writer = ActivityWriter(utils.SAVE_ACT_THRESHOLD, cursor, tz)
+    writer.add(1, EVENTS_START, 1000.0, 4)
+    writer.add(1, EVENTS_START + timedelta(hours=7), 1000.0, 4)
+    writer.flush()
+
+
+# Activities are assigned to the day they started on, in the timezone of the configuration
+def test_days_of_the_timezone(database):
+    connection, cursor = database
+    store_activities(cursor, read_timezone("Pacific/Kiritimati"))
+
+    assert local_days(cursor) == [(1, "2024-03-01 18:00:00+00:00", "2024-03-02"), (1, "2024-03-02 01:00:00+00:00", "2024-03-02")]
+
+
+# A different timezone inside the configuration assigns every activity again, once
+def test_timezone_change(database, capsys):
+    connection, cursor = database
+    store_activities(cursor, timezone.utc)
+    update_local_days("UTC", timezone.utc, connection, cursor)
+    assert local_days(cursor) == [(1, "2024-03-01 18:00:00+00:00", "2024-03-01"), (1, "2024-03-02 01:00:00+00:00", "2024-03-02")]
+
+    update_local_days("America/Los_Angeles", read_timezone("America/Los_Angeles"), connection, cursor)
+    assert local_days(cursor) == [(1, "2024-03-01 18:00:00+00:00", "2024-03-01"), (1, "2024-03-02 01:00:00+00:00", "2024-03-01")]
+
+    capsys.readouterr()
+    update_local_days("America/Los_Angeles", read_timezone("America/Los_Angeles"), connection, cursor)
+    assert capsys.readouterr().out == ""
+
+
+# The activities of a day are read through the ActivityLocalDay index
+def test_day_lookup_uses_index(database):
+    connection, cursor = database
+
+    cursor.execute("EXPLAIN QUERY PLAN SELECT SUM(playtime), COUNT(*) FROM Activity WHERE local_day = ? AND game_id = ?", ("2024-03-01", 1))
+    assert any("USING COVERING INDEX ActivityLocalDay" in row[3] for row in cursor.fetchall())
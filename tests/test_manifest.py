@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from gtrack.insert_manager import scan_data
+from gtrack.stats_manager import start_run
+from helpers import EVENTS_START, activity_totals, game_events, write_export, write_games
+
+
+@pytest.fixture
+def folders(tmp_path):
+    games = tmp_path / "games"
+    buckets = tmp_path / "buckets"
+    games.mkdir()
+    buckets.mkdir()
+    return games, buckets
+
+
+def scan(folders, bucket_options, connection, cursor):
+    run = start_run("scan")
+    assert scan_data((str(folders[0]) + "/", str(folders[1]) + "/"), bucket_options, connection, cursor) is None
+    return run
+
+
+def game_totals(cursor):
+    cursor.execute("SELECT game_id, SUM(playtime) FROM Activity GROUP BY game_id ORDER BY game_id")
+    return cursor.fetchall()
+
+
+def test_unchanged_files_skipped(folders, bucket_options, empty_database):
+    connection, cursor = empty_database
+    write_games(folders[0] / "games.csv", [("Game 0", "game0.exe")])
+    write_export(folders[1] / "a.json", game_events(10))
+
+    run = scan(folders, bucket_options, connection, cursor)
+    assert [os.path.basename(file_stats.source) for file_stats in run.files] == ["games.csv", "a.json"]
+    assert run.skipped_files == 0
+
+    run = scan(folders, bucket_options, connection, cursor)
+    assert run.files == []
+    assert run.skipped_files == 2
+    assert activity_totals(cursor) == (6000.0, 1)
+
+
+def test_rehash_when_touched(folders, bucket_options, empty_database):
+    connection, cursor = empty_database
+    write_games(folders[0] / "games.csv", [("Game 0", "game0.exe")])
+    export = folders[1] / "a.json"
+    write_export(export, game_events(10))
+    scan(folders, bucket_options, connection, cursor)
+
+    # Same content with a new modification time: the hash matches, so the file is not read again
+    stats = os.stat(export)
+    os.utime(export, ns=(stats.st_atime_ns, stats.st_mtime_ns + 10 ** 9))
+    run = scan(folders, bucket_options, connection, cursor)
+    assert run.files == []
+
+    cursor.execute("SELECT mtime FROM IngestManifest WHERE path = ?", (str(export), ))
+    assert cursor.fetchone()[0] == stats.st_mtime_ns + 10 ** 9
+
+    # Different content: the file is read again, and only its new events are stored
+    write_export(export, game_events(20))
+    run = scan(folders, bucket_options, connection, cursor)
+    assert [os.path.basename(file_stats.source) for file_stats in run.files] == ["a.json"]
+    assert run.files[0].events_skipped == 10
+    assert activity_totals(cursor) == (12000.0, 1)
+
+
+# Games added to the list must be credited with the events of the exports already read
+def test_new_games_rescan_unchanged_export(folders, bucket_options, empty_database):
+    connection, cursor = empty_database
+    events = game_events(10) + game_events(5, app="game1.exe", start=EVENTS_START.replace(day=2))
+    write_games(folders[0] / "games.csv", [("Game 0", "game0.exe")])
+    write_export(folders[1] / "a.json", events)
+
+    scan(folders, bucket_options, connection, cursor)
+    assert game_totals(cursor) == [(1, 6000.0)]
+
+    write_games(folders[0] / "games.csv", [("Game 0", "game0.exe"), ("Game 1", "game1.exe")])
+    run = scan(folders, bucket_options, connection, cursor)
+
+    assert [os.path.basename(file_stats.source) for file_stats in run.files] == ["games.csv", "a.json"]
+    assert game_totals(cursor) == [(1, 6000.0), (2, 3000.0)]
@@ -0,0 +1,98 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from gtrack.schema_manager import SCHEMA_VERSION, migrate_schema, schema_version
+
+# Tables created by the releases preceding the migrations (schema version 0)
+BASELINE_TABLES = [
+    """ CREATE TABLE IF NOT EXISTS Game (
+            id INTEGER PRIMARY KEY,
+            display_name VARCHAR(50) NOT NULL,
+            executable_name VARCHAR(50) NOT NULL
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS Flag (
+            id INTEGER PRIMARY KEY,
+            name VARCHAR(50) NOT NULL
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS HasFlag (
+            game_id INT NOT NULL,
+            flag_id INT NOT NULL,
+            value INT NOT NULL,
+            PRIMARY KEY (game_id, flag_id)
+            FOREIGN KEY (game_id) REFERENCES Game(id),
+            FOREIGN KEY (flag_id) REFERENCES Flag(id)
+    ) """,
+
+    """ CREATE TABLE IF NOT EXISTS Activity (
+            game_id INT NOT NULL,
+            date DATETIME NOT NULL,
+            playtime FLOAT NOT NULL,
+            PRIMARY KEY (game_id, date),
+            FOREIGN KEY (game_id) REFERENCES Game(id)
+    ) """
+]
+
+
+# Database of a previous release, where game 2 repeats the executable of game 1
+@pytest.fixture
+def baseline_database(tmp_path):
+    connection = sqlite3.connect(tmp_path / "data.db")
+    cursor = connection.cursor()
+    for query in BASELINE_TABLES:
+        cursor.execute(query)
+
+    cursor.execute("INSERT INTO Game VALUES (1, 'Game 0', 'game0.exe'), (2, 'Game 0 copy', 'game0.exe'), (3, 'Game 1', 'game1.exe')")
+    cursor.execute("INSERT INTO Flag VALUES (1, 'completed')")
+    cursor.execute("INSERT INTO HasFlag VALUES (1, 1, 0), (2, 1, 1), (3, 1, 1)")
+    cursor.execute(""" INSERT INTO Activity VALUES (1, '2024-03-01 18:00:00+00:00', 1000.0), (2, '2024-03-01 18:00:00+00:00', 900.0),
+                                                   (2, '2024-03-02 18:00:00+00:00', 800.0), (3, '2024-03-01 18:00:00+00:00', 700.0) """)
+    connection.commit()
+
+    yield connection, cursor
+    connection.close()
+
+
+def local_day(date):
+    return datetime.fromisoformat(date).astimezone().date().isoformat()
+
+
+# Duplicated games are merged into the oldest one, which keeps its own activities and flags when both have them
+def test_baseline_upgrade(baseline_database):
+    connection, cursor = baseline_database
+
+    assert migrate_schema(connection, cursor) is None
+    assert schema_version(cursor) == SCHEMA_VERSION
+
+    cursor.execute("SELECT id, display_name, executable_name, flags FROM Game ORDER BY id")
+    assert cursor.fetchall() == [(1, "Game 0", "game0.exe", 0), (3, "Game 1", "game1.exe", 1)]
+    cursor.execute("SELECT game_id, flag_id, value FROM HasFlag ORDER BY game_id")
+    assert cursor.fetchall() == [(1, 1, 0), (3, 1, 1)]
+
+    cursor.execute("SELECT game_id, date, playtime, local_day FROM Activity ORDER BY game_id, date")
+    activities = cursor.fetchall()
+    assert [activity[:3] for activity in activities] == [(1, "2024-03-01 18:00:00+00:00", 1000.0), (1, "2024-03-02 18:00:00+00:00", 800.0),
+                                                         (3, "2024-03-01 18:00:00+00:00", 700.0)]
+    assert [activity[3] for activity in activities] == [local_day(activity[1]) for activity in activities]
+
+    cursor.execute("SELECT game_id, day, seconds, sessions FROM DailyPlaytime ORDER BY game_id, day")
+    assert cursor.fetchall() == [(game_id, day, playtime, 1) for game_id, date, playtime, day in activities]
+
+    # Executable names are now unique
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute("INSERT INTO Game (display_name, executable_name) VALUES ('Game 1 copy', 'game1.exe')")
+
+
+# A current database is left untouched, while one created by a newer release is refused
+def test_version_checks(baseline_database):
+    connection, cursor = baseline_database
+    assert migrate_schema(connection, cursor) is None
+
+    assert migrate_schema(connection, cursor) is None
+    assert not connection.in_transaction
+
+    cursor.execute("PRAGMA user_version = " + str(SCHEMA_VERSION + 1))
+    assert migrate_schema(connection, cursor).startswith("ERROR:")
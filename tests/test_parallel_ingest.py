@@ -0,0 +1,117 @@
+import sqlite3
+
+import pytest
+
+from gtrack.insert_manager import insert_from_file, load_game_index, open_data_file, read_bucket_files_parallel
+from gtrack.schema_manager import migrate_schema
+from helpers import activity_totals, game_events, mixed_events, write_export
+
+
+# Two cumulative exports of the same continuous session: the second one repeats the events of the first
+@pytest.fixture
+def overlapping_exports(tmp_path):
+    folder = tmp_path / "buckets"
+    folder.mkdir()
+    write_export(folder / "a.json", game_events(10))
+    write_export(folder / "b.json", game_events(20))
+    return folder
+
+
+def insert_folder(folder, jobs, bucket_options, connection, cursor):
+    parsed_args = {"insert_filepath": str(folder) + "/", "insert_choice": "bucket", "header_flag": 0, "jobs": jobs, "manifest_flag": False}
+    assert insert_from_file(parsed_args, bucket_options, connection, cursor) is None
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_overlapping_exports_merge(overlapping_exports, jobs, bucket_options, database):
+    connection, cursor = database
+    insert_folder(overlapping_exports, jobs, bucket_options, connection, cursor)
+
+    assert activity_totals(cursor) == (12000.0, 1)
+
+
+# Both orders of the files, since the longer export can be stored either before or after the shorter one
+@pytest.mark.parametrize("names", [("a.json", "b.json"), ("b.json", "a.json")])
+def test_parallel_matches_sequential(overlapping_exports, names, bucket_options, database, tmp_path):
+    connection, cursor = database
+    files = [str(overlapping_exports / name) for name in names]
+
+    for file_name in files:
+        assert open_data_file(file_name, 1, None, load_game_index(cursor), bucket_options, connection, cursor) == 0
+
+    sequential = activity_totals(cursor)
+    cursor.execute("SELECT session_date, playtime, events FROM OpenSession")
+    sequential_open = cursor.fetchall()
+
+    cursor.execute("DELETE FROM Activity")
+    cursor.execute("DELETE FROM DailyPlaytime")
+    cursor.execute("DELETE FROM IngestWatermark")
+    cursor.execute("DELETE FROM OpenSession")
+    connection.commit()
+
+    read_bucket_files_parallel(files, load_game_index(cursor), bucket_options, 2, connection, cursor)
+
+    assert sequential == (12000.0, 1)
+    assert activity_totals(cursor) == sequential
+
+    cursor.execute("SELECT session_date, playtime, events FROM OpenSession")
+    assert cursor.fetchall() == sequential_open
+
+
+# Sessions continuing into a later export, once the first one has been stored by a previous run
+def test_parallel_extends_stored_session(tmp_path, bucket_options, database):
+    connection, cursor = database
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    write_export(first / "a.json", game_events(10))
+    insert_folder(first, 1, bucket_options, connection, cursor)
+
+    write_export(second / "b.json", game_events(20))
+    write_export(second / "c.json", game_events(30))
+    insert_folder(second, 2, bucket_options, connection, cursor)
+
+    assert activity_totals(cursor) == (18000.0, 1)
+
+
+# Activities and daily totals stored
+def stored_rows(cursor):
+    cursor.execute("SELECT game_id, date, playtime FROM Activity ORDER BY game_id, date")
+    activities = cursor.fetchall()
+    cursor.execute("SELECT game_id, day, seconds, sessions FROM DailyPlaytime ORDER BY game_id, day")
+    return activities, cursor.fetchall()
+
+
+# Sessions cut by the boundaries of the files, continuing a session stored by a previous run, repeated by an
+# overlapping export and recorded by a second bucket
+def test_jobs_store_same_rows(tmp_path, bucket_options):
+    events = mixed_events()[::-1]
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    write_export(first / "a.json", events[:20][::-1])
+    write_export(second / "b.json", events[20:45][::-1])
+    write_export(second / "c.json", events[45:][::-1])
+    write_export(second / "d.json", events[30:60][::-1])
+    write_export(second / "e.json", events[10:40][::-1], "aw-watcher-window_host-1")
+
+    results = []
+    for jobs in (1, 2):
+        connection = sqlite3.connect(tmp_path / ("jobs" + str(jobs) + ".db"))
+        cursor = connection.cursor()
+        assert migrate_schema(connection, cursor) is None
+        cursor.execute("INSERT INTO Game (display_name, executable_name) VALUES ('Game 0', 'game0.exe'), ('Game 1', 'game1.exe')")
+        connection.commit()
+
+        insert_folder(first, 1, bucket_options, connection, cursor)
+        insert_folder(second, jobs, bucket_options, connection, cursor)
+        results.append(stored_rows(cursor))
+        connection.close()
+
+    activities, days = results[0]
+    assert len(activities) > 2 and len(days) > 1
+    assert results[1] == results[0]
@@ -0,0 +1,53 @@
+from datetime import date
+
+from gtrack.print_manager import print_query_definition
+from gtrack.query_manager import QueryBuilder
+from helpers import print_args
+
+
+# Arguments follow the order of the placeholders inside the query, whatever the order the clauses were added in
+def test_builder_argument_order():
+    sub = QueryBuilder().select("id").source("Game").where("id > ?", (1, ))
+    query = QueryBuilder().where("SUB.id < ?", (5, )).select("? AS label", ("x", ))
+    query.source("Game").source_query(sub, "SUB", join="INNER JOIN", on="Game.id == SUB.id")
+    query.with_table("nums(n)", "SELECT ? UNION ALL SELECT n + 1 FROM nums WHERE n < ?", (1, 3), recursive=True)
+    query.group_by("Game.id").order_by("Game.id ASC")
+
+    assert query.build() == [
+        "WITH RECURSIVE nums(n) AS (SELECT ? UNION ALL SELECT n + 1 FROM nums WHERE n < ?) SELECT ? AS label "
+        "FROM Game INNER JOIN (SELECT id FROM Game WHERE id > ?) AS SUB ON Game.id == SUB.id WHERE SUB.id < ? "
+        "GROUP BY Game.id ORDER BY Game.id ASC",
+        (1, 3, "x", 1, 5),
+    ]
+
+
+# A list of values is bound as a single argument, leaving the text of the query the same for any number of them
+def test_where_in(database):
+    connection, cursor = database
+    one = QueryBuilder().select("id").source("Game").where_in("id", [2]).build()
+    many = QueryBuilder().select("id").source("Game").where_in("id", [1, 2, 7]).build()
+
+    assert one[0] == many[0]
+    cursor.execute(*one)
+    assert cursor.fetchall() == [(2, )]
+    cursor.execute(*many)
+    assert cursor.fetchall() == [(1, ), (2, )]
+
+
+# Dates, game IDs and names (as parsed from the command line) are bound as arguments: different values share the same statement
+def test_print_values_are_bound(database):
+    connection, cursor = database
+    cursor.execute(""" INSERT INTO DailyPlaytime (game_id, day, seconds, sessions)
+                       VALUES (1, '2024-03-01', 1000.0, 1), (1, '2024-03-02', 500.0, 1), (2, '2024-03-02', 2000.0, 2) """)
+
+    first = print_query_definition(print_args(date_print_default=[date(2024, 3, 1), date(2024, 3, 1)], id_print=[1], name_print="Game"), [])
+    second = print_query_definition(print_args(date_print_default=[date(2024, 1, 1), date(2024, 12, 31)], id_print=[1, 2], name_print="' OR 1 = 1 --"), [])
+    third = print_query_definition(print_args(date_print_default=[date(2024, 1, 1), date(2024, 12, 31)], id_print=[1, 2], name_print="Game"), [])
+
+    assert first[0] == second[0] == third[0]
+    cursor.execute(first[0], first[1])
+    assert cursor.fetchall() == [(1, "Game 0", 1000.0)]
+    cursor.execute(second[0], second[1])
+    assert cursor.fetchall() == []
+    cursor.execute(third[0], third[1])
+    assert cursor.fetchall() == [(2, "Game 1", 2000.0), (1, "Game 0", 1500.0)]
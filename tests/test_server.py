@@ -0,0 +1,211 @@
+import json
+import socket
+import threading
+from datetime import datetime
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+from gtrack.bucket_manager import ServerReader
+from gtrack.insert_manager import load_game_index, open_data_file, read_bucket_server
+from helpers import BUCKET_ID, event_dicts, game_events, mixed_events, write_export
+
+
+# Stand-in of an aw-server, serving the buckets received through the REST API
+# Events are returned as aw-server does: the ones overlapping the requested window, newest first, up to the limit.
+# Requests can be made to fail from a given one onward (FAIL_FROM), to simulate a server going away
+class StandInServer(ThreadingHTTPServer):
+
+    def __init__(self, buckets):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.buckets = buckets
+        self.connections = 0
+        self.requests = []
+        self.fail_from = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:" + str(self.server_address[1])
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.requests.append((url.path, params))
+
+        if self.server.fail_from is not None and len(self.server.requests) >= self.server.fail_from:
+            self.reply(500, {"message": "unavailable"})
+            return
+
+        if url.path == "/api/0/buckets/":
+            self.reply(200, {bucket_id: {"id": bucket_id, "type": bucket["type"]} for bucket_id, bucket in self.server.buckets.items()})
+            return
+
+        parts = url.path.split("/")
+        if len(parts) != 6 or parts[:4] != ["", "api", "0", "buckets"] or parts[5] != "events" or unquote(parts[4]) not in self.server.buckets:
+            self.reply(404, {"message": "not found"})
+            return
+
+        start = datetime.fromisoformat(params["start"]).timestamp()
+        end = datetime.fromisoformat(params["end"]).timestamp()
+        page = []
+        for event in self.server.buckets[unquote(parts[4])]["events"]:
+            event_start = datetime.fromisoformat(event["timestamp"]).timestamp()
+            if event_start < end and event_start + event["duration"] > start:
+                page.append(event)
+
+        page.sort(key=lambda event: event["timestamp"], reverse=True)
+        self.reply(200, page[:int(params["limit"])])
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(events, bucket_id=BUCKET_ID):
+        buckets = {bucket_id: {"type": "currentwindow", "events": event_dicts(events)},
+                   "aw-watcher-afk_host-0": {"type": "afkstatus", "events": [{"timestamp": "2024-03-01T18:00:00+00:00", "duration": 60.0,
+                                                                              "data": {"status": "afk"}}]}}
+        server = StandInServer(buckets)
+        threading.Thread(target=server.serve_forever, args=(0.05, ), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fetcher_threads():
+    return [thread for thread in threading.enumerate() if "fetch_pages" in thread.name]
+
+
+@pytest.mark.parametrize("page_limit", [1000, 7, 2])
+def test_window_pagination(stand_in, page_limit):
+    events = mixed_events()
+    server = stand_in(events)
+    reader = ServerReader(server.url, page_limit=page_limit)
+
+    read = list(reader.events())
+
+    # Every event is read once, in chronological order, whatever the windows requested
+    assert [event["timestamp"] for bucket_id, event in read] == [event["timestamp"] for event in event_dicts(events[::-1])]
+    assert all(bucket_id == BUCKET_ID for bucket_id, event in read)
+    assert reader.bucket_marks[BUCKET_ID] == pytest.approx(events[0][0].timestamp())
+
+    # Windows reaching the limit are split, so more requests are needed as the limit decreases
+    event_requests = [params for path, params in server.requests if path.endswith("/events")]
+    assert all(params["limit"] == str(page_limit) for params in event_requests)
+    assert reader.requests == len(server.requests)
+    if page_limit >= len(events):
+        assert len(event_requests) == 1
+    else:
+        assert len(event_requests) > len(events) // page_limit
+
+
+def test_lower_bound(stand_in):
+    events = mixed_events()[::-1]
+    server = stand_in(events)
+    reader = ServerReader(server.url, {BUCKET_ID: events[30][0].timestamp()}, page_limit=5)
+
+    read = list(reader.events())
+
+    # Windows start from the second of the bound, so the event starting at the bound is read again
+    assert [event["timestamp"] for bucket_id, event in read] == [event["timestamp"] for event in event_dicts(events)[30:]]
+
+
+def test_keep_alive_connection(stand_in):
+    server = stand_in(game_events(40))
+    reader = ServerReader(server.url, page_limit=4)
+
+    assert len(list(reader.events())) == 40
+    assert len(server.requests) > 10
+    assert server.connections == 1
+
+
+@pytest.mark.parametrize("fail_from", [1, 4])
+def test_fetcher_stops_on_error(stand_in, fail_from):
+    server = stand_in(game_events(40))
+    server.fail_from = fail_from
+    reader = ServerReader(server.url, page_limit=4, prefetch=1)
+
+    with pytest.raises(HTTPException):
+        list(reader.events())
+
+    assert fetcher_threads() == []
+
+
+def test_fetcher_stops_when_consumer_stops(stand_in):
+    server = stand_in(game_events(40))
+    reader = ServerReader(server.url, page_limit=4, prefetch=1)
+
+    events = reader.events()
+    next(events)
+    assert len(fetcher_threads()) == 1
+
+    events.close()
+
+    assert fetcher_threads() == []
+
+
+def test_fetcher_stops_when_unreachable():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+
+    reader = ServerReader("http://127.0.0.1:" + str(port), page_limit=4)
+
+    with pytest.raises(OSError):
+        list(reader.events())
+
+    assert fetcher_threads() == []
+
+
+def test_sessions_match_export(stand_in, tmp_path, bucket_options, database):
+    connection, cursor = database
+    events = mixed_events()
+    server = stand_in(events)
+
+    write_export(tmp_path / "export.json", events)
+    assert open_data_file(str(tmp_path / "export.json"), 1, None, load_game_index(cursor), bucket_options, connection, cursor) == 0
+    cursor.execute("SELECT game_id, date, playtime FROM Activity ORDER BY game_id, date")
+    from_export = cursor.fetchall()
+
+    cursor.execute("DELETE FROM Activity")
+    cursor.execute("DELETE FROM DailyPlaytime")
+    cursor.execute("DELETE FROM IngestWatermark")
+    cursor.execute("DELETE FROM OpenSession")
+    connection.commit()
+
+    server_options = {"url": server.url, "page_limit": 5}
+    assert read_bucket_server(server_options, load_game_index(cursor), bucket_options, connection, cursor) == 0
+    cursor.execute("SELECT game_id, date, playtime FROM Activity ORDER BY game_id, date")
+    assert cursor.fetchall() == from_export
+
+    # A second pull only requests the windows following the watermark
+    requests = len(server.requests)
+    assert read_bucket_server(server_options, load_game_index(cursor), bucket_options, connection, cursor) == 0
+    assert len(server.requests) - requests == 2
@@ -0,0 +1,65 @@
+import io
+from datetime import date
+
+import pytest
+from tabulate import tabulate
+
+from gtrack import utils
+from gtrack.print_manager import print_data_cli, print_query_definition, print_rows_format
+from gtrack.table_manager import TableWriter
+from helpers import print_args
+
+ROWS = [(1, "Game 0", "2024-03-02", "01:00:00"), ("", ), (12, "A much longer name", "2024-03-01", "10:00:05"), (2, None, "2024-03-01", "")]
+HEADERS = ["game_id", "game_name", "day", "playtime (HH:MM:SS)"]
+
+
+# Rows known in advance give the same table tabulate prints
+def test_same_as_tabulate():
+    out = io.StringIO()
+    table = TableWriter(HEADERS, [0] * len(HEADERS), sample=ROWS, out=out)
+    for row in ROWS:
+        assert table.write_row(row)
+
+    table.close()
+    assert out.getvalue() == tabulate(ROWS, headers=HEADERS, tablefmt="fancy_outline") + "\n"
+
+
+# A table without rows still has its header and its bottom line
+def test_empty_table():
+    out = io.StringIO()
+    TableWriter(HEADERS, [0] * len(HEADERS), out=out).close()
+
+    assert out.getvalue() == tabulate([], headers=HEADERS, tablefmt="fancy_outline") + "\n"
+
+
+# Pages repeat the header and, when not interactive, are all written
+def test_pages():
+    out = io.StringIO()
+    table = TableWriter(HEADERS, [0] * len(HEADERS), sample=ROWS, out=out, page_size=2)
+    for row in ROWS:
+        table.write_row(row)
+
+    table.close()
+    pages = out.getvalue().split("╛\n")[:-1]
+    assert len(pages) == 2
+    assert all(page.count("game_id") == 1 for page in pages)
+
+
+# Daily reports larger than a batch of rows are written while they are read, looking the same as the ones printed at once
+@pytest.mark.parametrize("batch_size", [2, 1000])
+def test_daily_report_matches_tabulate(batch_size, database, monkeypatch, capsys):
+    connection, cursor = database
+    monkeypatch.setattr(utils, "DB_FETCH_BATCH_SIZE", batch_size)
+    cursor.execute("INSERT INTO Game (id, display_name, executable_name) VALUES (10, 'A much longer name', 'longer.exe')")
+    cursor.execute(""" INSERT INTO DailyPlaytime (game_id, day, seconds, sessions)
+                       VALUES (1, '2024-03-01', 1000.0, 1), (1, '2024-03-02', 500.0, 1), (2, '2024-03-02', 2000.0, 2),
+                              (10, '2024-03-02', 36005.0, 3), (10, '2024-03-03', 60.0, 1) """)
+
+    args = print_args(print_daily=True, date_print_default=[date(2024, 1, 1), date(2024, 12, 31)])
+    query, query_args, headers = print_query_definition(args, [])
+    cursor.execute(query, query_args)
+    rows = cursor.fetchall()
+    expected = tabulate(list(print_rows_format(rows, False, None, True)), headers=headers, tablefmt="fancy_outline") + "\n"
+
+    print_data_cli(headers, print_rows_format(iter(rows), False, None, True), 0, connection)
+    assert capsys.readouterr().out == expected
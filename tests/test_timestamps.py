@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import pytest
+
+from gtrack.bucket_manager import EVENT_DATETIME_FORMAT, EVENT_DATETIME_NOMICRO_FORMAT, parse_event_timestamp
+
+
+# The shapes emitted by ActivityWatch, decoded by position, and other ones left to strptime
+@pytest.mark.parametrize("timestamp", [
+    "2024-03-01T18:00:00.123456+00:00",
+    "2024-03-01T18:00:00.000001-05:30",
+    "2024-12-31T23:59:59.999999+14:00",
+    "2024-03-01T18:00:00+00:00",
+    "2024-03-01T18:00:00-09:45",
+    "2024-03-01T18:00:00.123+01:00",
+    "2024-03-01T18:00:00.123456+0100",
+    "2024-03-01T18:00:00Z",
+])
+def test_same_as_strptime(timestamp):
+    expected = datetime.strptime(timestamp, EVENT_DATETIME_FORMAT if "." in timestamp else EVENT_DATETIME_NOMICRO_FORMAT)
+    decoded = parse_event_timestamp(timestamp)
+
+    assert decoded == expected
+    assert decoded.utcoffset() == expected.utcoffset()
+    assert decoded.isoformat() == expected.isoformat()
+
+
+@pytest.mark.parametrize("timestamp", ["2024-03-01 18:00:00", "2024-13-01T18:00:00.123456+00:00", "2024-03-01T18:00:00+24:00",
+                                       "not a timestamp at all!!"])
+def test_invalid_timestamps(timestamp):
+    with pytest.raises(ValueError):
+        parse_event_timestamp(timestamp)
@@ -0,0 +1,86 @@
+import pytest
+
+from gtrack import insert_manager, watch_manager
+from gtrack.stats_manager import start_run, write_ingest_log
+from helpers import activity_totals, game_events, write_export
+
+
+# Watcher reporting the given changes, one set of names for each check, then stopping the watch as CTRL+C does
+class ScriptedWatcher:
+
+    kind = "scripted"
+
+    def __init__(self, changes):
+        self.pending = list(changes)
+
+    def changes(self, timeout):
+        if not self.pending:
+            raise KeyboardInterrupt
+
+        return self.pending.pop(0)
+
+    def close(self):
+        return
+
+
+@pytest.fixture
+def follow(monkeypatch, tmp_path, bucket_options, database):
+    connection, cursor = database
+    folder = tmp_path / "buckets"
+    folder.mkdir()
+    reports = []
+
+    def report(run):
+        reports.append(run)
+        write_ingest_log(run, connection, cursor)
+
+    def run(changes):
+        monkeypatch.setattr(watch_manager, "open_watcher", lambda path: ScriptedWatcher(changes))
+        start_run("scan")
+        assert watch_manager.watch_data(str(folder), bucket_options, connection, cursor, debounce=0, report=report) is None
+        return reports
+
+    return folder, run
+
+
+def ingest_log(cursor):
+    cursor.execute("SELECT source, kind, status FROM IngestLog ORDER BY id")
+    return [(source.rsplit("/", 1)[-1], kind, status) for source, kind, status in cursor.fetchall()]
+
+
+def test_cycles_reported_separately(follow, database):
+    connection, cursor = database
+    folder, run = follow
+    write_export(folder / "a.json", game_events(10))
+    write_export(folder / "b.json", game_events(20))
+
+    reports = run([{"a.json"}, set(), {"b.json"}])
+
+    assert [[file_stats.source.rsplit("/", 1)[-1] for file_stats in report.files] for report in reports] == [["a.json"], ["b.json"]]
+    assert ingest_log(cursor) == [("a.json", "bucket", "ok"), ("scan", "run", "ok"), ("b.json", "bucket", "ok"), ("scan", "run", "ok")]
+    assert activity_totals(cursor) == (12000.0, 1)
+
+
+def test_interrupted_file_rolled_back(follow, monkeypatch, database):
+    connection, cursor = database
+    folder, run = follow
+    write_export(folder / "a.json", game_events(10))
+    store_bucket_sessions = insert_manager.store_bucket_sessions
+
+    # CTRL+C received once the sessions of the file have been written, before its transaction is committed
+    def interrupted_store(*args, **kwargs):
+        store_bucket_sessions(*args, **kwargs)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(insert_manager, "store_bucket_sessions", interrupted_store)
+    reports = run([{"a.json"}])
+
+    assert len(reports) == 1
+    assert [file_stats.status for file_stats in reports[0].files] == ["aborted"]
+    assert ingest_log(cursor) == [("a.json", "bucket", "aborted"), ("scan", "run", "ok")]
+    assert activity_totals(cursor) == (0, 0)
+
+    cursor.execute("SELECT COUNT(*) FROM IngestManifest")
+    assert cursor.fetchone()[0] == 0
+    cursor.execute("SELECT COUNT(*) FROM IngestWatermark")
+    assert cursor.fetchone()[0] == 0